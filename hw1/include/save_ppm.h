@@ -1,7 +1,7 @@
 #ifndef SAVE_PPM_H
 #define SAVE_PPM_H
 
-// 將 raw RGB(A) 資料輸出為 PPM (P3 ASCII) 格式
+// 將 raw RGB(A) 資料輸出為二進位 PPM (P6) / PGM (P5) 格式，alpha 通道會被捨棄
 // filename: 輸出路徑
 // data:    像素資料緩衝 (每像素 channels 個 byte)
 // width:   圖寬
@@ -1,12 +1,138 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+ppm_to_jpg.py
 
+功能：
+  將資料夾中的 .ppm / .pgm 檔轉成 .jpg。
+  批次模式：資料夾只列舉一次，輸出比來源新的檔案直接略過；
+  每個檔案由行程池中的 worker 讀取與編碼，同時送出的工作數有上限。
+  二進位 PPM/PGM（P6/P5，src/save_ppm.cpp 的輸出）經由專案根目錄的 netpbm.py
+  只解析檔頭，像素以 np.memmap 直接映射，不經過完整解碼；
+  文字格式（P3/P2）與 16 位元檔案交給 Pillow。
+
+使用：
+  python ppm_to_jpg.py
+  python ppm_to_jpg.py output static --quality 90 --workers 8
+  python ppm_to_jpg.py output static --force
+
+參數：
+  input_dir     ppm 檔所在資料夾（預設 output）
+  output_dir    jpg 要存放的資料夾（預設 static）
+  --quality     輸出 jpg 的品質 1–95（預設 85）
+  --workers     行程數，0 表示使用全部 CPU（預設 0）
+  --force       不論輸出是否較新，一律重新轉換
+  --verbose     每個檔案轉換完成時輸出一行
+"""
 import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
 from PIL import Image
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from netpbm import read_netpbm
+
+def read_ppm(path: str):
+    """
+    讀取 PPM/PGM 為 uint8 陣列 (H, W, 3) 或 (H, W)
+
+    8 位元 P6/P5 以 netpbm.read_netpbm 映射為唯讀 np.memmap；其他情況交給 Pillow。
+    """
+    try:
+        arr = read_netpbm(path)
+        if arr.dtype == np.uint8:
+            return arr
+    except ValueError:
+        pass
+    with Image.open(path) as im:
+        return np.asarray(im.convert('RGB') if im.mode not in ('RGB', 'L') else im)
+
+def _convert_one(src_path: str, dst_path: str, quality: int):
+    """worker：轉換單一檔案，回傳 (src_path, dst_path, 錯誤訊息或 None)"""
+    try:
+        arr = read_ppm(src_path)
+        Image.fromarray(np.ascontiguousarray(arr)).save(dst_path, 'JPEG', quality=quality)
+        return src_path, dst_path, None
+    except Exception as exc:
+        return src_path, dst_path, f'{type(exc).__name__}: {exc}'
+
+def plan_conversions(input_dir: str, output_dir: str, force: bool = False):
+    """
+    列舉 input_dir 一次，回傳 (需轉換的 (src, dst) 清單, 略過數)
+
+    輸出檔存在且修改時間不早於來源者略過（force 為 True 時不略過）。
+    """
+    existing = {}
+    if not force and os.path.isdir(output_dir):
+        with os.scandir(output_dir) as it:
+            existing = {e.name: e.stat().st_mtime_ns for e in it if e.is_file()}
+
+    todo, skipped = [], 0
+    with os.scandir(input_dir) as it:
+        entries = sorted((e for e in it if e.is_file() and e.name.lower().endswith(('.ppm', '.pgm'))),
+                         key=lambda e: e.name)
+    for entry in entries:
+        dst_name = os.path.splitext(entry.name)[0] + '.jpg'
+        dst_mtime = existing.get(dst_name)
+        if dst_mtime is not None and dst_mtime >= entry.stat().st_mtime_ns:
+            skipped += 1
+            continue
+        todo.append((entry.path, os.path.join(output_dir, dst_name)))
+    return todo, skipped
+
+def batch_convert(input_dir: str, output_dir: str, quality: int = 85, workers: int = None,
+                  max_pending: int = None, force: bool = False, verbose: bool = False):
+    """
+    以行程池批次轉換；同時送出的工作數不超過 max_pending（預設 4 × workers）。
+
+    參數:
+    - input_dir / output_dir: 輸入與輸出資料夾
+    - quality: 輸出 jpg 的品質 (1–95)
+    - workers: 行程數，None 表示 os.cpu_count()
+    - force: 不略過已是最新的輸出
+    - verbose: 每個檔案完成時輸出一行
+
+    回傳:
+    - (轉換數, 略過數, 失敗清單 [(src_path, 錯誤訊息)])
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    todo, skipped = plan_conversions(input_dir, output_dir, force)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    converted, failed = 0, []
+    if not todo:
+        return converted, skipped, failed
+
+    pending = set()
+
+    def drain(block):
+        nonlocal converted, pending
+        done, pending = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for fut in done:
+            src_path, dst_path, error = fut.result()
+            if error is None:
+                converted += 1
+                if verbose:
+                    print(f'已轉換：{src_path} → {dst_path}')
+            else:
+                failed.append((src_path, error))
+                print(f'轉換失敗：{src_path}（{error}）')
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+        for src_path, dst_path in todo:
+            while len(pending) >= max_pending:
+                drain(block=True)
+            pending.add(pool.submit(_convert_one, src_path, dst_path, quality))
+        while pending:
+            drain(block=True)
+    return converted, skipped, failed
+
 def convert_ppm_to_jpg(input_dir: str, output_dir: str, quality: int = 85):
     """
-    將 input_dir 中所有 .ppm 檔轉成 .jpg，並存到 output_dir。
+    將 input_dir 中所有 .ppm 檔轉成 .jpg，並存到 output_dir（單一行程、逐檔處理）。
 
     參數:
     - input_dir: ppm 檔所在資料夾 (e.g. "img")
@@ -16,23 +142,27 @@ def convert_ppm_to_jpg(input_dir: str, output_dir: str, quality: int = 85):
     # 若輸出資料夾不存在就建立
     os.makedirs(output_dir, exist_ok=True)
 
-    # 遍歷所有檔案
-    for fname in os.listdir(input_dir):
-        if fname.lower().endswith('.ppm'):
-            src_path = os.path.join(input_dir, fname)
-            dst_name = os.path.splitext(fname)[0] + '.jpg'
-            dst_path = os.path.join(output_dir, dst_name)
+    for src_path, dst_path in plan_conversions(input_dir, output_dir, force=True)[0]:
+        _, _, error = _convert_one(src_path, dst_path, quality)
+        if error is None:
+            print(f'已轉換：{src_path} → {dst_path}')
+        else:
+            print(f'轉換失敗：{src_path}（{error}）')
 
-            # 開啟 PPM，轉為 RGB，再存為 JPEG
-            with Image.open(src_path) as im:
-                rgb = im.convert('RGB')
-                rgb.save(dst_path, 'JPEG', quality=quality)
+def main():
+    parser = argparse.ArgumentParser(description='將 PPM/PGM 批次轉成 JPEG')
+    parser.add_argument('input_dir', nargs='?', default='output', help='ppm 檔所在資料夾 (預設 output)')
+    parser.add_argument('output_dir', nargs='?', default='static', help='jpg 輸出資料夾 (預設 static)')
+    parser.add_argument('--quality', type=int, default=85, help='JPEG 品質 (預設 85)')
+    parser.add_argument('--workers', type=int, default=0, help='行程數，0 表示使用全部 CPU')
+    parser.add_argument('--force', action='store_true', help='一律重新轉換')
+    parser.add_argument('--verbose', action='store_true', help='每個檔案完成時輸出一行')
+    args = parser.parse_args()
 
-            print(f'已轉換：{src_path} → {dst_path}')
+    converted, skipped, failed = batch_convert(args.input_dir, args.output_dir, args.quality,
+                                               args.workers or None, force=args.force,
+                                               verbose=args.verbose)
+    print(f'完成！轉換 {converted} 個，略過 {skipped} 個（已是最新），失敗 {len(failed)} 個')
 
 if __name__ == '__main__':
-    # 定義輸入/輸出資料夾
-    input_folder = 'output'
-    output_folder = 'static'
-
-    convert_ppm_to_jpg(input_folder, output_folder)
+    main()
@@ -1,7 +1,7 @@
 #include "save_ppm.h"
 #include <fstream>
 #include <iostream>
-#include <algorithm> // for std::min
+#include <vector>
 
 bool save_PPM(const char* filename,
               const unsigned char* data,
@@ -9,32 +9,35 @@ bool save_PPM(const char* filename,
               int height,
               int channels)
 {
-    std::ofstream ofs(filename);
+    std::ofstream ofs(filename, std::ios::binary);
     if (!ofs) {
         std::cerr << "Error: 無法寫入檔案 " << filename << std::endl;
         return false;
     }
 
-    // 只支援灰階 (channels=1) 或 RGB (channels=3)
-    if (channels == 1) {
-        ofs << "P2\n";
-    } else {
-        ofs << "P3\n";
-    }
+    // 灰階 (channels<3) 輸出 P5，彩色輸出 P6；多餘的通道 (例如 alpha) 捨棄
+    int outChannels = (channels >= 3) ? 3 : 1;
+    ofs << (outChannels == 1 ? "P5\n" : "P6\n");
     ofs << width << " " << height << "\n255\n";
 
-    int pixelCount = width * height * channels;
-    for (int i = 0; i < pixelCount; ++i) {
-        int v = static_cast<int>(data[i]);
-        v = std::min(v, 255);
-        ofs << v;
-        if ((i + 1) % channels != 0) {
-            ofs << " ";
-        } else {
-            ofs << "\n";
+    size_t pixelCount = static_cast<size_t>(width) * height;
+    if (channels == outChannels) {
+        // 通道數相符：像素緩衝直接一次寫出
+        ofs.write(reinterpret_cast<const char*>(data), pixelCount * channels);
+    } else {
+        // 逐列取出前 outChannels 個通道再寫出
+        std::vector<unsigned char> row(static_cast<size_t>(width) * outChannels);
+        for (int y = 0; y < height; ++y) {
+            const unsigned char* src = data + static_cast<size_t>(y) * width * channels;
+            for (int x = 0; x < width; ++x) {
+                for (int c = 0; c < outChannels; ++c) {
+                    row[x * outChannels + c] = src[x * channels + c];
+                }
+            }
+            ofs.write(reinterpret_cast<const char*>(row.data()), row.size());
         }
     }
 
     ofs.close();
-    return true;
+    return static_cast<bool>(ofs);
 }
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+stack.py
+
+功能：
+  多張同場景 JPEG 的平均值 / 中位數合併（去噪），Python 串流版本。
+  影像逐張讀入、讀完即丟，記憶體與影像張數無關：
+    - 平均值：uint32 累加，最後 int(sum / n + 0.5)，與 src/avg.cpp 相同
+    - 中位數：
+        histogram  每個像素-通道一個 256 格直方圖（單次讀取，計數型別依張數選 uint8/uint16/uint32）
+        radix      兩次讀取：先以高 4 位元的 16 格直方圖找出中位數所在區段，
+                   再對該區段的低 4 位元建 16 格直方圖；結果與 histogram 相同，記憶體約 1/8
+        approx     常數記憶體的近似中位數（Frugal-1U：估計值每張往樣本方向移動 1）
+      取排序後第 n // 2 個值（偶數張時為中間偏右），與 src/median.cpp 相同
+  結果直接存成 JPEG 或 PNG，不經過 PPM。
+
+使用：
+  pip install pillow numpy
+  python stack.py mean 100
+  python stack.py median 140 --method radix --format png
+  python stack.py median 140 --img-dir img --output-dir static
+
+參數：
+  mode          mean 或 median
+  count         影像張數，讀取 <img-dir>/img1.jpg … img<count>.jpg
+  --img-dir     輸入資料夾（預設 img）
+  --output-dir  輸出資料夾（預設 static），檔名為 avg_result_<N> / median_result_<N>
+  --format      jpg 或 png（預設 jpg）
+  --quality     JPEG 品質（預設 95）
+  --method      中位數演算法：histogram、radix、approx（預設 histogram）
+"""
+import os
+import argparse
+import numpy as np
+from PIL import Image
+
+# 中位數演算法
+METHODS = ('histogram', 'radix', 'approx')
+
+# 更新直方圖時每次處理的元素數，限制索引暫存陣列大小
+_CHUNK_ELEMS = 1 << 22
+
+def frame_paths(img_dir: str, count: int):
+    """回傳 <img_dir>/img1.jpg … img<count>.jpg"""
+    return [os.path.join(img_dir, f'img{i}.jpg') for i in range(1, count + 1)]
+
+def load_frame(path: str):
+    """讀取單張影像為 uint8 陣列（RGB 或灰階），失敗時回傳 None"""
+    try:
+        with Image.open(path) as im:
+            if im.mode not in ('RGB', 'L'):
+                im = im.convert('RGB')
+            return np.asarray(im)
+    except (OSError, ValueError):
+        return None
+
+def iter_frames(paths, shape=None):
+    """
+    逐張讀取影像；讀取失敗或尺寸與第一張（或指定的 shape）不符者跳過並警告。
+    產生 (path, frame)。
+    """
+    for path in paths:
+        frame = load_frame(path)
+        if frame is None:
+            print(f'讀取失敗，跳過 {path}')
+            continue
+        if shape is None:
+            shape = frame.shape
+        elif frame.shape != shape:
+            print(f'警告：尺寸不符，跳過 {path}')
+            continue
+        yield path, frame
+
+def stack_mean(paths):
+    """
+    串流平均值合併
+    回傳 (result uint8, 有效張數)
+    """
+    total = None
+    n = 0
+    for _, frame in iter_frames(paths):
+        if total is None:
+            total = np.zeros(frame.shape, dtype=np.uint32)
+        total += frame
+        n += 1
+    if n == 0:
+        raise ValueError('沒有可用的圖片進行平均運算。')
+    # 與 avg.cpp 相同的單精度運算：int(float(sum) / n + 0.5f)
+    avg = (total.astype(np.float32) / np.float32(n) + np.float32(0.5)).astype(np.int32)
+    return np.minimum(avg, 255).astype(np.uint8), n
+
+def _count_dtype(n: int):
+    """能容納 n 次計數的最小無號整數型別"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+def _accumulate(hist, values, select=None):
+    """
+    hist: (B, P) 直方圖（每一格連續存放，找中位數時逐格循序讀取）
+    values: (P,) 各元素的格號
+    select: (P,) bool，只累加為 True 的元素
+    """
+    B, P = hist.shape
+    flat = hist.reshape(-1)
+    for start in range(0, P, _CHUNK_ELEMS):
+        stop = min(start + _CHUNK_ELEMS, P)
+        idx = values[start:stop].astype(np.int64) * P + np.arange(start, stop, dtype=np.int64)
+        if select is not None:
+            idx = idx[select[start:stop]]
+        flat[idx] += 1
+
+def _select_rank(hist, rank):
+    """
+    回傳每個元素第一個累計數 > rank 的格號，以及該格之前的累計數
+    rank 可為純量或 (P,) 陣列
+
+    累計數單調遞增，所以格號 = 累計數 <= rank 的格數，
+    之前的累計數 = 這些格的計數和；逐格只需比較與相加，不需遮罩索引。
+    依元素分塊處理，讓暫存留在快取內，且塊內全部找到後即可提前結束。
+    """
+    B, P = hist.shape
+    result = np.zeros(P, dtype=np.uint8)
+    below = np.zeros(P, dtype=np.uint32)
+    block = 1 << 16
+    for start in range(0, P, block):
+        stop = min(start + block, P)
+        r = rank[start:stop] if np.ndim(rank) else rank
+        running = np.zeros(stop - start, dtype=np.uint32)
+        res = result[start:stop]
+        blw = below[start:stop]
+        for b in range(B):
+            h = hist[b, start:stop]
+            running += h
+            le = running <= r
+            if not le.any():
+                break
+            res += le
+            blw += h * le
+    return result, below
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+def _median_histogram(paths):
+    frames = iter_frames(paths)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError('沒有可用的圖片進行中位數運算。')
+    shape = first[1].shape
+    hist = np.zeros((256, first[1].size), dtype=_count_dtype(len(paths)))
+    n = 0
+    for _, frame in _chain_first(first, frames):
+        _accumulate(hist, frame.reshape(-1))
+        n += 1
+    med, _ = _select_rank(hist, n // 2)
+    return med.reshape(shape), n
+
+def _median_radix(paths):
+    while True:
+        frames = iter_frames(paths)
+        first = next(frames, None)
+        if first is None:
+            raise ValueError('沒有可用的圖片進行中位數運算。')
+        shape = first[1].shape
+        hist = np.zeros((16, first[1].size), dtype=_count_dtype(len(paths)))
+
+        # 第一次：高 4 位元
+        used = []
+        for path, frame in _chain_first(first, frames):
+            _accumulate(hist, frame.reshape(-1) >> 4)
+            used.append(path)
+        n = len(used)
+        high, below = _select_rank(hist, n // 2)
+        rank = n // 2 - below
+
+        # 第二次：只統計高 4 位元落在中位數區段者的低 4 位元（同樣檢查讀取與尺寸）
+        hist[...] = 0
+        used_again = []
+        for path, frame in iter_frames(used, shape):
+            values = frame.reshape(-1)
+            _accumulate(hist, values & 15, select=(values >> 4) == high)
+            used_again.append(path)
+        if len(used_again) == n:
+            low, _ = _select_rank(hist, rank)
+            return ((high << 4) | low).reshape(shape), n
+
+        # 兩次之間有影像無法讀取或尺寸改變：第一次的計數已包含它，只能以剩下的影像重算
+        print(f'警告：第二次讀取時少了 {n - len(used_again)} 張，以剩下的 {len(used_again)} 張重新計算')
+        paths = used_again
+
+def _median_approx(paths):
+    est = None
+    n = 0
+    for _, frame in iter_frames(paths):
+        if est is None:
+            est = frame.astype(np.int16)
+        else:
+            est += np.sign(frame.astype(np.int16) - est).astype(np.int16)
+        n += 1
+    if n == 0:
+        raise ValueError('沒有可用的圖片進行中位數運算。')
+    return est.astype(np.uint8), n
+
+def stack_median(paths, method='histogram'):
+    """
+    串流中位數合併
+    method: 'histogram'、'radix' 或 'approx'（見模組說明）
+    回傳 (result uint8, 有效張數)
+    """
+    if method == 'histogram':
+        return _median_histogram(paths)
+    elif method == 'radix':
+        return _median_radix(paths)
+    elif method == 'approx':
+        return _median_approx(paths)
+    raise ValueError(f'未知的 method：{method}')
+
+def save_result(arr: np.ndarray, path: str, quality: int = 95):
+    """依副檔名存成 JPEG 或 PNG"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    ext = os.path.splitext(path)[1].lower()
+    im = Image.fromarray(arr)
+    if ext in ('.jpg', '.jpeg'):
+        im.save(path, 'JPEG', quality=quality)
+    else:
+        im.save(path, 'PNG')
+
+def main():
+    parser = argparse.ArgumentParser(description='多張影像平均值 / 中位數合併（串流）')
+    parser.add_argument('mode', choices=('mean', 'median'), help='合併方式')
+    parser.add_argument('count', type=int, help='影像張數')
+    parser.add_argument('--img-dir', default='img', help='輸入資料夾 (預設 img)')
+    parser.add_argument('--output-dir', default='static', help='輸出資料夾 (預設 static)')
+    parser.add_argument('--format', choices=('jpg', 'png'), default='jpg', help='輸出格式 (預設 jpg)')
+    parser.add_argument('--quality', type=int, default=95, help='JPEG 品質 (預設 95)')
+    parser.add_argument('--method', choices=METHODS, default='histogram',
+                        help='中位數演算法 (預設 histogram)')
+    args = parser.parse_args()
+    if args.count <= 0:
+        raise SystemExit('圖片數量必須大於 0。')
+
+    paths = frame_paths(args.img_dir, args.count)
+    if args.mode == 'mean':
+        result, n = stack_mean(paths)
+        name = f'avg_result_{n}.{args.format}'
+    else:
+        result, n = stack_median(paths, args.method)
+        name = f'median_result_{n}.{args.format}'
+
+    out_path = os.path.join(args.output_dir, name)
+    save_result(result, out_path, args.quality)
+    print(f'完成！結果存入 {out_path}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""stack.py：串流中位數 / 平均值與一次載入全部影像的結果相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import stack
+
+
+@pytest.fixture
+def frames(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(7):
+        path = str(tmp_path / f'img{i + 1}.png')
+        Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def _sorted_median(paths):
+    arr = np.stack([np.asarray(Image.open(p)) for p in paths])
+    return np.sort(arr, axis=0)[(len(paths)) // 2]
+
+
+@pytest.mark.parametrize('count', [6, 7])
+@pytest.mark.parametrize('method', ['histogram', 'radix'])
+def test_median_matches_sort(frames, method, count):
+    result, n = stack.stack_median(frames[:count], method)
+    assert n == count
+    assert np.array_equal(result, _sorted_median(frames[:count]))
+
+
+def test_mean(frames):
+    result, n = stack.stack_mean(frames)
+    total = np.stack([np.asarray(Image.open(p)) for p in frames]).astype(np.float32).sum(axis=0)
+    assert n == 7
+    assert np.array_equal(result, (total / np.float32(7) + np.float32(0.5)).astype(np.uint8))
+
+
+def test_unreadable_and_mismatched_frames_are_skipped(frames, tmp_path):
+    bad = str(tmp_path / 'bad.png')
+    with open(bad, 'wb') as f:
+        f.write(b'not an image')
+    small = str(tmp_path / 'small.png')
+    Image.new('RGB', (5, 5)).save(small)
+    for method in ('histogram', 'radix'):
+        result, n = stack.stack_median(frames[:3] + [bad, small] + frames[3:], method)
+        assert n == 7
+        assert np.array_equal(result, _sorted_median(frames))
+
+
+def test_radix_recomputes_when_frames_change_between_passes(frames, monkeypatch):
+    load_frame = stack.load_frame
+    calls = {}
+
+    def flaky(path):
+        calls[path] = calls.get(path, 0) + 1
+        if calls[path] >= 2 and path == frames[2]:
+            return None
+        if calls[path] >= 2 and path == frames[4]:
+            return np.zeros((5, 5, 3), dtype=np.uint8)
+        return load_frame(path)
+
+    monkeypatch.setattr(stack, 'load_frame', flaky)
+    result, n = stack.stack_median(frames, 'radix')
+    rest = [p for k, p in enumerate(frames) if k not in (2, 4)]
+    assert n == len(rest)
+    assert np.array_equal(result, _sorted_median(rest))
@@ -1,5 +1,11 @@
+import tempfile
 import cv2
 import numpy as np
+from functools import lru_cache
+
+# 定點羽化權重：1.0 以 WEIGHT_ONE 表示
+WEIGHT_BITS = 8
+WEIGHT_ONE = 1 << WEIGHT_BITS
 
 def create_weight_map(mask, blur_radius=21):
     """
@@ -44,6 +50,54 @@ def feather_blend(base_img, warped_img, mask, blur_radius=21):
     return blended.astype(np.uint8)
 
 
+@lru_cache(maxsize=16)
+def source_weight_map(height, width, blur_radius=21):
+    """
+    在來源影像自身座標系建立定點羽化權重圖，同尺寸的影像共用快取。
+
+    以常數 0 作為邊界對全 1 遮罩做高斯模糊，權重在影像邊緣向內漸減；
+    之後與影像一起 warp 到畫布，不必在畫布上重新模糊。
+
+    參數:
+    - height, width (int): 來源影像大小
+    - blur_radius (int): 高斯模糊半徑，須為奇數
+
+    回傳:
+    - weight (ndarray): uint16，範圍 [0, WEIGHT_ONE]，唯讀
+    """
+    ones = np.ones((height, width), dtype=np.float32)
+    weight = cv2.GaussianBlur(ones, (blur_radius, blur_radius), 0, borderType=cv2.BORDER_CONSTANT)
+    weight = np.floor(weight / (weight.max() + 1e-8) * WEIGHT_ONE + 0.5).astype(np.uint16)
+    weight.setflags(write=False)
+    return weight
+
+
+def feather_blend_fixed(base_img, warped_img, weight, out=None):
+    """
+    以定點整數運算進行羽化混合：
+      out = (base * (ONE - w) + warp * w + ONE/2) >> WEIGHT_BITS
+    中間值最大 255 * 256 + 128，全程在 uint16 內完成。
+
+    參數:
+    - base_img, warped_img (ndarray): uint8 影像
+    - weight (ndarray): 已 warp 的定點權重圖，uint16，範圍 [0, WEIGHT_ONE]
+    - out (ndarray or None): 輸出緩衝（可與 base_img 相同）
+
+    回傳:
+    - blended (ndarray): uint8
+    """
+    w = weight[..., np.newaxis] if base_img.ndim == 3 else weight
+    acc = base_img.astype(np.uint16)
+    acc *= WEIGHT_ONE - w
+    acc += warped_img * w
+    acc += WEIGHT_ONE // 2
+    acc >>= WEIGHT_BITS
+    if out is None:
+        return acc.astype(np.uint8)
+    np.copyto(out, acc, casting='unsafe')
+    return out
+
+
 def multiband_blend(img1, img2, mask, num_levels=5):
     """
     使用多頻帶金字塔（Laplacian Pyramid）進行混合。
@@ -98,14 +152,130 @@ def multiband_blend(img1, img2, mask, num_levels=5):
     return np.clip(blended, 0, 255).astype(np.uint8)
 
 
+def _pyr_up_rows(src, dst_size, r0, r1):
+    """
+    回傳 cv2.pyrUp(src, dstsize=dst_size)[r0:r1]，只讀取並放大所需的 src 列。
+
+    pyrUp 的 5 點核心使輸出第 y 列只依賴輸入第 y//2 ± 2 列，
+    取帶狀範圍外多 2 列計算後捨去邊緣，結果與整張放大相同。
+    """
+    dst_w, dst_h = dst_size
+    s0 = max(0, r0 // 2 - 2)
+    s1 = min(src.shape[0], (r1 + 1) // 2 + 2)
+    strip_h = 2 * (s1 - s0) if s1 < src.shape[0] else dst_h - 2 * s0
+    up = cv2.pyrUp(np.asarray(src[s0:s1]), dstsize=(dst_w, strip_h))
+    return up[r0 - 2 * s0:r1 - 2 * s0]
+
+
+class MultibandAccumulator:
+    """
+    Burt–Adelson 累加式多頻帶混合。
+
+    對整張畫布維護每一層的加權 Laplacian 和 sum_k 與權重和 weight_k：
+      sum_k    += L_k(影像) * G_k(權重)
+      weight_k += G_k(權重)
+    每張影像只在自己的 roi 內建一次金字塔並累加，最後一次還原：
+      band_k = sum_k / weight_k，由最粗層逐層 pyrUp 後就地加回。
+    roi 左上角須對齊 2**num_levels（見 blend_context），各層位置與全畫布一致。
+
+    各層緩衝約為畫布的 1.33 × (C + 1) × 4 倍位元組。指定 temp_dir 時改放在該資料夾中
+    自動刪除的暫存檔（np.memmap），還原時依 tile_rows 逐帶處理，
+    常駐記憶體不再與畫布大小成正比（搭配 memmap 畫布後端使用）。
+    """
+
+    def __init__(self, height, width, channels=3, num_levels=5, temp_dir=None, tile_rows=1024):
+        self.num_levels = num_levels
+        self.tile_rows = max(1, int(tile_rows)) if temp_dir is not None else max(1, height)
+        self.sums, self.weights = [], []
+        self._files = []
+        h, w = height, width
+        for _ in range(num_levels + 1):
+            self.sums.append(self._alloc((h, w, channels), temp_dir))
+            self.weights.append(self._alloc((h, w), temp_dir))
+            h, w = (h + 1) // 2, (w + 1) // 2
+
+    def _alloc(self, shape, temp_dir):
+        if temp_dir is None:
+            return np.zeros(shape, dtype=np.float32)
+        # 新建暫存檔為稀疏檔，未寫入的區域讀出為 0
+        f = tempfile.TemporaryFile(dir=temp_dir)
+        f.truncate(max(1, int(np.prod(shape)) * 4))
+        self._files.append(f)
+        return np.memmap(f, dtype=np.float32, mode='r+', shape=shape)
+
+    def _bands(self, height):
+        for r0 in range(0, height, self.tile_rows):
+            yield r0, min(r0 + self.tile_rows, height)
+
+    def add(self, warped_roi, mask_roi, roi):
+        """
+        累加一張影像。
+
+        參數:
+        - warped_roi (ndarray): roi 範圍內的變換後影像
+        - mask_roi (ndarray): roi 範圍內的遮罩或權重，255 表示完全屬於該影像
+        - roi (tuple of int): (x0, y0, x1, y1)
+        """
+        x0, y0 = roi[0], roi[1]
+        G = warped_roi.astype(np.float32)
+        GM = mask_roi.astype(np.float32) / 255.0
+        for k in range(self.num_levels + 1):
+            if k < self.num_levels:
+                G_next = cv2.pyrDown(G)
+                L = cv2.subtract(G, cv2.pyrUp(G_next, dstsize=(G.shape[1], G.shape[0])))
+            else:
+                G_next, L = None, G
+            ys, xs = y0 >> k, x0 >> k
+            h = min(L.shape[0], self.weights[k].shape[0] - ys)
+            w = min(L.shape[1], self.weights[k].shape[1] - xs)
+            gm = GM[:h, :w]
+            self.sums[k][ys:ys + h, xs:xs + w] += L[:h, :w] * gm[..., np.newaxis]
+            self.weights[k][ys:ys + h, xs:xs + w] += gm
+            G = G_next
+            if k < self.num_levels:
+                GM = cv2.pyrDown(GM)
+
+    def collapse(self, out=None):
+        """
+        正規化各層並由最粗層就地還原（逐帶處理），累加緩衝在還原後即釋放。
+
+        參數:
+        - out (ndarray or None): uint8 輸出緩衝（例如全景畫布）
+
+        回傳:
+        - blended (ndarray): uint8
+        """
+        for S, W in zip(self.sums, self.weights):
+            for r0, r1 in self._bands(S.shape[0]):
+                np.maximum(W[r0:r1], 1e-8, out=W[r0:r1])
+                S[r0:r1] /= W[r0:r1, :, np.newaxis]
+        for k in range(self.num_levels - 1, -1, -1):
+            size = (self.sums[k].shape[1], self.sums[k].shape[0])
+            for r0, r1 in self._bands(size[1]):
+                self.sums[k][r0:r1] += _pyr_up_rows(self.sums[k + 1], size, r0, r1)
+            self.sums[k + 1] = self.weights[k + 1] = None
+        S = self.sums[0]
+        if out is None:
+            out = np.empty(S.shape, dtype=np.uint8)
+        for r0, r1 in self._bands(S.shape[0]):
+            band = np.clip(S[r0:r1], 0, 255, out=S[r0:r1])
+            np.copyto(out[r0:r1], band, casting='unsafe')
+        self.sums = self.weights = None
+        for f in self._files:
+            f.close()
+        self._files = []
+        return out
+
+
 def blend_images(base_img, warped_img, mask, method='feather', **kwargs):
     """
     通用混合介面。
 
     參數:
     - base_img, warped_img (ndarray): 要混合的影像
-    - mask (ndarray): 二值遮罩，255 表示 warped_img 區域
-    - method (str): 'feather' 或 'multiband'
+    - mask (ndarray): 二值遮罩，255 表示 warped_img 區域；
+      'feather_fixed' 時為已 warp 的定點權重圖（見 source_weight_map）
+    - method (str): 'feather'、'feather_fixed' 或 'multiband'
     - kwargs: 傳給對應混合方法的參數
 
     回傳:
@@ -114,9 +284,98 @@ def blend_images(base_img, warped_img, mask, method='feather', **kwargs):
     method = method.lower()
     if method == 'feather':
         return feather_blend(base_img, warped_img, mask, **kwargs)
+    elif method == 'feather_fixed':
+        return feather_blend_fixed(base_img, warped_img, mask)
     elif method == 'multiband':
         # 將 mask 轉為 0/1
         m = (mask.astype(np.float32) / 255.0)
         return multiband_blend(base_img, warped_img, m, **kwargs)
     else:
         raise ValueError(f"Unknown blend method: {method}")
+
+
+
+def blend_context(method='feather', blur_radius=21, num_levels=5, **kwargs):
+    """
+    回傳混合方法在影像外框外需要的額外範圍。
+
+    參數:
+    - method (str): 'feather'、'feather_fixed' 或 'multiband'
+    - blur_radius, num_levels: 對應混合方法的參數
+
+    回傳:
+    - margin (int): 外框四周需額外涵蓋的像素數
+    - align (int): ROI 左上角需對齊的倍數（金字塔各層取樣位置與全畫布一致）
+    """
+    method = method.lower()
+    if method == 'feather':
+        # 權重圖非零範圍 = 遮罩外擴 r，計算該範圍的模糊還需再外擴 r
+        return 2 * (blur_radius // 2), 1
+    elif method == 'feather_fixed':
+        # 權重圖隨影像一起 warp，不會超出影像外框
+        return 0, 1
+    elif method == 'multiband':
+        return 2 ** (num_levels + 2), 2 ** num_levels
+    else:
+        raise ValueError(f"Unknown blend method: {method}")
+
+
+def blend_images_tiled(canvas, warped_roi, mask_roi, roi, method='feather', tile_size=512, **kwargs):
+    """
+    只在 roi 範圍內將 warped_roi 混合進 canvas（就地修改）。
+
+    feather 的權重圖只依賴 roi 內的遮罩，浮點運算逐塊 (tile) 進行，
+    暫存記憶體只與一個 tile 大小相關；feather_fixed 直接使用隨影像 warp 的
+    定點權重圖，逐塊以整數運算混合；multiband 的金字塔不具局部性，
+    直接對整個 roi 執行。
+
+    參數:
+    - canvas (ndarray): 全景畫布，uint8
+    - warped_roi (ndarray): roi 範圍內的變換後影像
+    - mask_roi (ndarray): roi 範圍內的二值遮罩，255 表示 warped_roi 區域；
+      feather_fixed 時為 roi 範圍內的定點權重圖
+    - roi (tuple of int): (x0, y0, x1, y1)
+    - method (str): 'feather'、'feather_fixed' 或 'multiband'
+    - tile_size (int): tile 邊長
+    - kwargs: 傳給對應混合方法的參數
+
+    回傳:
+    - canvas (ndarray)
+    """
+    x0, y0, x1, y1 = roi
+    method = method.lower()
+    if method == 'feather':
+        weight = create_weight_map(mask_roi, kwargs.get('blur_radius', 21))
+        h, w = weight.shape
+        for ty in range(0, h, tile_size):
+            for tx in range(0, w, tile_size):
+                sy = slice(ty, min(ty + tile_size, h))
+                sx = slice(tx, min(tx + tile_size, w))
+                base = canvas[y0 + sy.start:y0 + sy.stop, x0 + sx.start:x0 + sx.stop]
+                wt = weight[sy, sx, np.newaxis]
+                # 權重全為 0 或全為 1 的 tile 不需混合
+                if not wt.any():
+                    continue
+                if (wt == 1).all():
+                    base[...] = warped_roi[sy, sx]
+                    continue
+                blended = base.astype(np.float32) * (1 - wt) + warped_roi[sy, sx].astype(np.float32) * wt
+                base[...] = blended.astype(np.uint8)
+    elif method == 'feather_fixed':
+        h, w = mask_roi.shape
+        for ty in range(0, h, tile_size):
+            for tx in range(0, w, tile_size):
+                sy = slice(ty, min(ty + tile_size, h))
+                sx = slice(tx, min(tx + tile_size, w))
+                base = canvas[y0 + sy.start:y0 + sy.stop, x0 + sx.start:x0 + sx.stop]
+                wt = mask_roi[sy, sx]
+                if not wt.any():
+                    continue
+                if (wt == WEIGHT_ONE).all():
+                    base[...] = warped_roi[sy, sx]
+                    continue
+                feather_blend_fixed(base, warped_roi[sy, sx], wt, out=base)
+    else:
+        canvas[y0:y1, x0:x1] = blend_images(canvas[y0:y1, x0:x1], warped_roi, mask_roi,
+                                            method=method, **kwargs)
+    return canvas
@@ -0,0 +1,106 @@
+import os
+import mmap
+import tempfile
+import numpy as np
+
+# 可用的畫布後端
+BACKENDS = ('memory', 'memmap')
+
+
+class PanoramaCanvas:
+    """
+    全景畫布：影像 (H, W, 3) 與覆蓋遮罩 (H, W)，皆為 uint8。
+
+    - memory：一般 ndarray，最後以 cv2.imwrite 一次寫出
+    - memmap：影像直接寫在磁碟上的 .npy 檔（np.lib.format.open_memmap），
+      遮罩放在自動刪除的暫存檔；畫布依 tile_rows 切成水平帶，
+      當某一帶不會再被後續影像觸及時立即 flush 並釋放其分頁，
+      常駐記憶體只與目前處理中的影像範圍相關，可輸出大於實體記憶體的全景圖。
+    """
+
+    def __init__(self, height, width, channels=3, backend='memory', path=None, tile_rows=1024):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown canvas backend: {backend}")
+        self.height, self.width = height, width
+        self.backend = backend
+        self.path = path
+        self.tile_rows = max(1, int(tile_rows))
+        self._last = None
+
+        if backend == 'memory':
+            self.image = np.zeros((height, width, channels), dtype=np.uint8)
+            self.mask = np.zeros((height, width), dtype=np.uint8)
+            self._mask_file = None
+        else:
+            if path is None:
+                raise ValueError("memmap 後端需要指定輸出路徑 (.npy)")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # 新建檔案為稀疏檔，未寫入的區域讀出為 0
+            self.image = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                                   shape=(height, width, channels))
+            self._mask_file = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+            self._mask_file.truncate(max(1, height * width))
+            self.mask = np.memmap(self._mask_file, dtype=np.uint8, mode='r+', shape=(height, width))
+
+    @property
+    def n_bands(self):
+        return -(-self.height // self.tile_rows)
+
+    def band_of(self, y):
+        """回傳第 y 列所屬的水平帶編號"""
+        return y // self.tile_rows
+
+    def plan(self, rois):
+        """
+        依各影像的 roi (x0, y0, x1, y1)（依混合順序），記錄每一帶最後被哪張影像觸及。
+        未被觸及的帶記為 -1，於第一次 finish 時即可釋放。
+        """
+        last = np.full(self.n_bands, -1, dtype=int)
+        for idx, (x0, y0, x1, y1) in enumerate(rois):
+            if x1 > x0 and y1 > y0:
+                last[self.band_of(y0):self.band_of(y1 - 1) + 1] = idx
+        self._last = last
+        self._released = np.zeros(self.n_bands, dtype=bool)
+
+    def finish(self, idx):
+        """
+        第 idx 張影像混合完成：將之後不會再被觸及的水平帶寫回磁碟並釋放分頁。
+        memory 後端不做任何事。
+        """
+        if self.backend != 'memmap' or self._last is None:
+            return
+        ready = np.flatnonzero((self._last <= idx) & ~self._released)
+        for band in ready:
+            r0 = band * self.tile_rows
+            r1 = min(r0 + self.tile_rows, self.height)
+            for arr in (self.image, self.mask):
+                self._release_rows(arr, r0, r1)
+        self._released[ready] = True
+
+    @staticmethod
+    def _release_rows(arr, r0, r1):
+        mm = getattr(arr, '_mmap', None)
+        if mm is None:
+            return
+        row_bytes = arr.strides[0]
+        # np.memmap 從對齊 ALLOCATIONGRANULARITY 的位置開始映射
+        base = arr.offset % mmap.ALLOCATIONGRANULARITY
+        start = base + r0 * row_bytes
+        stop = base + r1 * row_bytes
+        # 只處理整頁，邊界分頁留給下一帶
+        start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+        stop = stop // mmap.PAGESIZE * mmap.PAGESIZE
+        if stop <= start:
+            return
+        mm.flush(start, stop - start)
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+            mm.madvise(mmap.MADV_DONTNEED, start, stop - start)
+
+    def close(self):
+        """寫回剩餘資料並關閉暫存遮罩"""
+        if self.backend == 'memmap':
+            self.image.flush()
+            self.mask = None
+            if self._mask_file is not None:
+                self._mask_file.close()
+                self._mask_file = None
@@ -1,4 +1,16 @@
+import os
+import json
+import hashlib
+import tempfile
+import zipfile
 import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from loader import preprocess_image, iter_images
+
+# 行程內已建立的偵測器，key 為 (name, params JSON)
+_DETECTOR_CACHE = {}
 
 
 def get_feature_detector(name='ORB', **kwargs):
@@ -48,3 +60,212 @@ def detect_and_compute(detector, image):
 
     keypoints, descriptors = detector.detectAndCompute(gray, None)
     return keypoints, descriptors
+
+
+def detect_coarse_features(img, scale, name='ORB', params=None, full_shape=None):
+    """
+    在縮小 scale 倍的灰階影像上偵測特徵，供階層式匹配估計粗略仿射矩陣。
+
+    參數:
+    - img (ndarray): 原解析度影像，或已以 IMREAD_REDUCED_* 縮小解碼的影像
+    - full_shape (tuple or None): img 已縮小解碼時，原影像的 (H, W)
+
+    回傳:
+    - keypoints (ndarray): keypoints_to_array 格式，縮小影像座標
+    - descriptors (ndarray)
+    """
+    h, w = full_shape[:2] if full_shape is not None else img.shape[:2]
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    small = preprocess_image(img, to_gray=True, resize=size)
+    keypoints, descriptors = detect_and_compute(_cached_detector(name, params), small)
+    return keypoints_to_array(keypoints), descriptors
+
+
+def keypoints_to_array(keypoints):
+    """
+    將 cv2.KeyPoint 列表轉為可序列化的陣列。
+
+    回傳:
+    - arr (ndarray): shape=(N,7) float32，各欄為 x, y, size, angle, response, octave, class_id
+    """
+    arr = np.empty((len(keypoints), 7), dtype=np.float32)
+    for i, kp in enumerate(keypoints):
+        arr[i] = (kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id)
+    return arr
+
+
+def array_to_keypoints(arr):
+    """
+    將 keypoints_to_array 的結果轉回 cv2.KeyPoint 列表。
+    """
+    return [
+        cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response),
+                     int(octave), int(class_id))
+        for x, y, size, angle, response, octave, class_id in arr
+    ]
+
+
+def feature_cache_key(image_bytes, name, params, proxy_scale=1.0):
+    """
+    以影像檔內容雜湊 + 偵測器種類與參數（及代理影像比例）產生快取鍵值。
+    proxy_scale 為 1 時與未加入此參數前的鍵值相同，既有快取仍可使用。
+    """
+    h = hashlib.sha256(image_bytes)
+    h.update(name.upper().encode())
+    h.update(json.dumps(params or {}, sort_keys=True).encode())
+    if proxy_scale != 1.0:
+        h.update(f'proxy_scale={float(proxy_scale)!r}'.encode())
+    return h.hexdigest()
+
+
+def proxy_size(shape, proxy_scale):
+    """代理影像的 (width, height)；proxy_scale >= 1 時回傳 None（使用原解析度）"""
+    if proxy_scale >= 1.0:
+        return None
+    h, w = shape[:2]
+    return max(1, int(round(w * proxy_scale))), max(1, int(round(h * proxy_scale)))
+
+
+def scale_keypoints(kp_arr, sx, sy):
+    """
+    將縮小影像上的關鍵點換回原解析度（以像素中心對齊：x = (x_s + 0.5) * sx - 0.5）。
+    sx, sy 為原影像與縮小影像的寬、高比。
+    """
+    out = kp_arr.copy()
+    out[:, 0] = (kp_arr[:, 0] + 0.5) * sx - 0.5
+    out[:, 1] = (kp_arr[:, 1] + 0.5) * sy - 0.5
+    out[:, 2] = kp_arr[:, 2] * 0.5 * (sx + sy)
+    return out
+
+
+def _cached_detector(name, params):
+    """每個行程對同一組設定只建立一次偵測器"""
+    key = (name.upper(), json.dumps(params or {}, sort_keys=True))
+    detector = _DETECTOR_CACHE.get(key)
+    if detector is None:
+        detector = _DETECTOR_CACHE[key] = get_feature_detector(name, **(params or {}))
+    return detector
+
+
+def _features_from_image(img, name, params, proxy_scale=1.0):
+    """
+    轉灰階並偵測特徵，回傳 (keypoint 陣列, 描述子, 影像 (H, W))。
+    proxy_scale < 1 時在縮小的灰階代理影像上偵測，關鍵點座標換回原解析度。
+    """
+    size = proxy_size(img.shape, proxy_scale)
+    gray = preprocess_image(img, to_gray=True, resize=size)
+    keypoints, descriptors = detect_and_compute(_cached_detector(name, params), gray)
+    kp_arr = keypoints_to_array(keypoints)
+    if size is not None:
+        kp_arr = scale_keypoints(kp_arr, img.shape[1] / size[0], img.shape[0] / size[1])
+    return kp_arr, descriptors, img.shape[:2]
+
+
+def _extract_worker(path, name, params, proxy_scale=1.0):
+    """
+    子行程：讀取影像、轉灰階並偵測特徵。
+    回傳可 pickle 的 (keypoint 陣列, 描述子, 影像 (H, W))；影像無法讀取時回傳 None。
+    """
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    return _features_from_image(img, name, params, proxy_scale)
+
+
+def _load_cached(cache_path):
+    """讀取快取；檔案截斷或損毀時回傳 None，視為未命中（重新計算後會覆寫）"""
+    try:
+        with np.load(cache_path) as data:
+            kp_arr = data['keypoints']
+            des = data['descriptors']
+            # 舊版快取沒有影像尺寸
+            shape = tuple(int(v) for v in data['shape']) if 'shape' in data else None
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        print(f"警告: 特徵快取損毀，將重新計算 {cache_path}: {e}")
+        return None
+    return kp_arr, (des if des.size else None), shape
+
+
+def _save_cached(cache_path, kp_arr, des, shape):
+    # 先寫入唯一的暫存檔再改名，避免中斷時留下不完整的快取，
+    # 多個行程同時快取同一張影像時也不會互相改名掉對方的暫存檔
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, keypoints=kp_arr,
+                     descriptors=des if des is not None else np.zeros((0, 0), dtype=np.uint8),
+                     shape=np.asarray(shape, dtype=np.int64))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # 快取寫入失敗不影響拼接結果
+        print(f"警告: 無法寫入特徵快取 {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def extract_features(paths, name='ORB', params=None, workers=1, cache_dir=None, as_arrays=False,
+                     prefetch=4, return_shapes=False, skip_unreadable=False, proxy_scale=1.0):
+    """
+    對多張影像平行偵測特徵，並可使用磁碟快取。
+
+    參數:
+    - paths (list of str): 影像檔路徑
+    - name (str), params (dict): 特徵偵測器種類與參數（同設定檔 feature: 區段）
+    - workers (int or None): 行程數，1 表示在目前行程執行，None 表示 os.cpu_count()
+    - cache_dir (str or None): 快取資料夾，None 表示不使用快取
+    - as_arrays (bool): True 時關鍵點維持 keypoints_to_array 的陣列格式，不轉回 cv2.KeyPoint
+    - prefetch (int): workers 為 1 時，偵測目前影像的同時在背景預先解碼的影像數（見 loader.iter_images）
+    - return_shapes (bool): True 時每個結果另含影像 (H, W)，呼叫端不必為了尺寸再解碼一次
+    - skip_unreadable (bool): True 時無法讀取的影像結果為 None，否則丟出 IOError
+    - proxy_scale (float): < 1 時在縮小的灰階代理影像上偵測（偵測成本約為 proxy_scale 的平方），
+      關鍵點座標仍為原解析度；快取鍵值包含此比例
+
+    回傳:
+    - features (list of (keypoints, descriptors) 或 (keypoints, descriptors, shape)): 與 paths 同順序
+    """
+    params = params or {}
+    results = [None] * len(paths)
+    cache_paths = [None] * len(paths)
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for i, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                key = feature_cache_key(f.read(), name, params, proxy_scale)
+            cache_paths[i] = os.path.join(cache_dir, key + '.npz')
+            if os.path.isfile(cache_paths[i]):
+                cached = _load_cached(cache_paths[i])
+                if cached is not None and (cached[2] is not None or not return_shapes):
+                    results[i] = cached
+
+    todo = [i for i in range(len(paths)) if results[i] is None]
+    if todo:
+        if workers == 1 or len(todo) == 1:
+            # 在目前行程偵測，下一張影像同時在背景執行緒解碼
+            computed = [None if img is None else _features_from_image(img, name, params, proxy_scale)
+                        for _, img in iter_images([paths[i] for i in todo], prefetch)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                computed = list(pool.map(_extract_worker, [paths[i] for i in todo],
+                                         [name] * len(todo), [params] * len(todo),
+                                         [proxy_scale] * len(todo)))
+        for i, result in zip(todo, computed):
+            if result is None:
+                if not skip_unreadable:
+                    raise IOError(f"無法載入影像: {paths[i]}")
+                continue
+            results[i] = result
+            if cache_paths[i] is not None:
+                _save_cached(cache_paths[i], *result)
+
+    out = []
+    for result in results:
+        if result is None:
+            out.append(None)
+            continue
+        kp_arr, des, shape = result
+        kp = kp_arr if as_arrays else array_to_keypoints(kp_arr)
+        out.append((kp, des, shape) if return_shapes else (kp, des))
+    return out
@@ -1,17 +1,60 @@
 import os
 import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+# 縮小解碼倍率對應的 imread 旗標（JPEG 在解碼時即以 DCT 縮放，比讀入後再縮小快得多）
+_REDUCED_FLAGS = {
+    (1, False): cv2.IMREAD_COLOR,
+    (2, False): cv2.IMREAD_REDUCED_COLOR_2,
+    (4, False): cv2.IMREAD_REDUCED_COLOR_4,
+    (8, False): cv2.IMREAD_REDUCED_COLOR_8,
+    (1, True): cv2.IMREAD_GRAYSCALE,
+    (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
 
-def load_images_from_dir(directory, extensions=None):
+
+def reduce_factor(scale):
+    """
+    回傳不超過 1 / scale 的最大縮小解碼倍率（1、2、4 或 8）。
+    例如 scale=0.25 → 4；scale=0.3 → 2（之後再以 resize 補足剩餘的縮放）。
+    """
+    for factor in (8, 4, 2):
+        if factor * scale <= 1.0 + 1e-9:
+            return factor
+    return 1
+
+
+def read_image(path, reduce=1, gray=False):
+    """
+    以 cv2.imread 讀取單張影像，可直接解碼成 1/reduce 大小。
+
+    參數:
+    - path (str): 影像路徑
+    - reduce (int): 縮小解碼倍率，1、2、4 或 8
+    - gray (bool): 是否直接解碼為灰階
+
+    回傳:
+    - img (ndarray or None): 讀取失敗時為 None
     """
-    從指定資料夾載入所有影像。
+    flags = _REDUCED_FLAGS.get((reduce, bool(gray)))
+    if flags is None:
+        raise ValueError(f"reduce 必須為 1、2、4 或 8，收到 {reduce}")
+    return cv2.imread(path, flags)
+
+
+def list_image_files(directory, extensions=None):
+    """
+    列出資料夾中指定副檔名的影像路徑（依檔名排序）。
 
     參數:
     - directory (str): 影像資料夾路徑
     - extensions (list of str): 副檔名列表，預設 ['.jpg', '.jpeg', '.png', '.bmp']
 
     回傳:
-    - images (dict): key 為檔名，value 為 cv2 讀取的影像陣列
+    - paths (list of str)
     """
     if extensions is None:
         extensions = ['.jpg', '.jpeg', '.png', '.bmp']
@@ -19,16 +62,71 @@ def load_images_from_dir(directory, extensions=None):
     if not os.path.isdir(directory):
         raise ValueError(f"'{directory}' 不是有效的資料夾路徑")
 
+    return [os.path.join(directory, fname) for fname in sorted(os.listdir(directory))
+            if os.path.splitext(fname)[1].lower() in extensions]
+
+
+def iter_images(paths, prefetch=4, workers=None, reduce=1, gray=False):
+    """
+    以執行緒池預先解碼，依 paths 順序逐張產生影像（cv2.imread 解碼時會釋放 GIL）。
+    同時解碼或等待取用的影像最多 prefetch 張，呼叫端處理第 i 張時，
+    第 i+1 … i+prefetch 張已在背景解碼；記憶體只與 prefetch 有關，與影像總數無關。
+
+    參數:
+    - paths (list of str): 影像路徑（產生順序即此順序）
+    - prefetch (int): 預先解碼的影像數，0 表示不預取（逐張同步讀取）
+    - workers (int or None): 解碼執行緒數，None 表示 min(prefetch, CPU 數)
+    - reduce (int), gray (bool): 同 read_image
+
+    產生:
+    - (path, img): 讀取失敗時 img 為 None，由呼叫端決定略過或報錯
+    """
+    if prefetch <= 0:
+        for path in paths:
+            yield path, read_image(path, reduce, gray)
+        return
+
+    workers = workers or min(prefetch, os.cpu_count() or 1)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    it = iter(paths)
+    try:
+        for path in it:
+            pending.append((path, pool.submit(read_image, path, reduce, gray)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            path, fut = pending.popleft()
+            img = fut.result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(read_image, nxt, reduce, gray)))
+            yield path, img
+    finally:
+        # 呼叫端提前結束時取消尚未開始的解碼
+        for _, fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=True)
+
+
+def load_images_from_dir(directory, extensions=None, prefetch=4):
+    """
+    從指定資料夾載入所有影像（以 iter_images 平行解碼）。
+
+    參數:
+    - directory (str): 影像資料夾路徑
+    - extensions (list of str): 副檔名列表，預設 ['.jpg', '.jpeg', '.png', '.bmp']
+    - prefetch (int): 同 iter_images
+
+    回傳:
+    - images (dict): key 為檔名，value 為 cv2 讀取的影像陣列
+    """
     images = {}
-    for fname in sorted(os.listdir(directory)):
-        ext = os.path.splitext(fname)[1].lower()
-        if ext in extensions:
-            path = os.path.join(directory, fname)
-            img = cv2.imread(path)
-            if img is None:
-                print(f"警告: 無法讀取影像 {path}")
-                continue
-            images[fname] = img
+    for path, img in iter_images(list_image_files(directory, extensions), prefetch):
+        if img is None:
+            print(f"警告: 無法讀取影像 {path}")
+            continue
+        images[os.path.basename(path)] = img
     return images
 
 
@@ -1,17 +1,93 @@
 import cv2
+import threading
+import numpy as np
+from collections import OrderedDict, namedtuple
+
+# 每個位元組的位元數，用於向量化 Hamming 距離
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(axis=1).astype(np.int32)
+
+
+# 陣列形式的匹配結果：query / train 索引與距離，皆依距離由小到大排序
+Matches = namedtuple('Matches', ['query_idx', 'train_idx', 'distance'])
+
+
+def _pad_knn(idx, dist, k):
+    """將 knn 結果補齊為 k 欄，並把無效鄰居統一為 idx=-1、dist=inf"""
+    idx = np.asarray(idx, dtype=np.int64)
+    dist = np.asarray(dist, dtype=np.float32)
+    # 已是 (N, k) 者不再 reshape：N 為 0 時 reshape(0, -1) 無法推得欄數
+    if idx.ndim != 2:
+        idx = idx.reshape(len(idx), -1)
+        dist = dist.reshape(len(dist), -1)
+    if idx.shape[1] < k:
+        pad = k - idx.shape[1]
+        idx = np.hstack([idx, np.full((len(idx), pad), -1, dtype=np.int64)])
+        dist = np.hstack([dist, np.full((len(dist), pad), np.inf, dtype=np.float32)])
+    dist[idx < 0] = np.inf
+    idx[~np.isfinite(dist)] = -1
+    return idx, dist
+
+
+class LSHMatcher:
+    """
+    以 FLANN LSH（algorithm=6）匹配二進位描述子（ORB/BRISK/AKAZE）。
+
+    介面與 cv2.DescriptorMatcher 的 knnMatch / match 相同。train 描述子的索引
+    依陣列物件身分快取（保留參考，避免 id 被重複使用），同一張影像與多個鄰居
+    匹配時只建一次索引；建立索引時加鎖，可在多個執行緒間共用。
+    """
+    thread_safe = True
+
+    def __init__(self, table_number=6, key_size=12, multi_probe_level=1, checks=32, cache_size=16):
+        self.index_params = {'algorithm': 6, 'table_number': table_number,
+                             'key_size': key_size, 'multi_probe_level': multi_probe_level}
+        self.search_params = {'checks': checks}
+        self.cache_size = cache_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index_for(self, des):
+        key = id(des)
+        with self._lock:
+            entry = self._indexes.get(key)
+            if entry is not None and entry[0] is des:
+                self._indexes.move_to_end(key)
+                return entry[1]
+            index = cv2.flann_Index(des, self.index_params)
+            self._indexes[key] = (des, index)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+            return index
+
+    def knn_arrays(self, des1, des2, k=2):
+        """回傳 (idx, dist)，shape=(N1,k)；鄰居不足時 idx 為 -1、dist 為 inf"""
+        index = self._index_for(des2)
+        idx, dist = index.knnSearch(des1, min(k, len(des2)), params=self.search_params)
+        return _pad_knn(idx, dist, k)
+
+    def knnMatch(self, des1, des2, k=2):
+        idx, dist = self.knn_arrays(des1, des2, k)
+        return [
+            [cv2.DMatch(q, int(t), float(d)) for t, d in zip(idx[q], dist[q]) if t >= 0]
+            for q in range(len(des1))
+        ]
+
+    def match(self, des1, des2):
+        return [m[0] for m in self.knnMatch(des1, des2, k=1) if m]
 
 
 def create_matcher(matcher_type='BF', norm_type=cv2.NORM_HAMMING, cross_check=False,
-                   flann_index_params=None, flann_search_params=None):
+                   flann_index_params=None, flann_search_params=None, lsh_params=None):
     """
     建立特徵匹配器。
 
     參數:
-    - matcher_type (str): 'BF' 或 'FLANN'
+    - matcher_type (str): 'BF'、'FLANN' 或 'LSH'（二進位描述子，見 LSHMatcher）
     - norm_type: BFMatcher 使用的距離度量，預設 NORM_HAMMING
     - cross_check (bool): BFMatcher 是否啟用交叉檢查
     - flann_index_params (dict): FLANN 的 index 參數
     - flann_search_params (dict): FLANN 的 search 參數
+    - lsh_params (dict): LSHMatcher 的參數（table_number, key_size, multi_probe_level, checks）
 
     回傳:
     - matcher (cv2.DescriptorMatcher)
@@ -26,11 +102,97 @@ def create_matcher(matcher_type='BF', norm_type=cv2.NORM_HAMMING, cross_check=Fa
         if flann_search_params is None:
             flann_search_params = {'checks': 50}
         return cv2.FlannBasedMatcher(flann_index_params, flann_search_params)
+    elif matcher_type.upper() == 'LSH':
+        return LSHMatcher(**(lsh_params or {}))
     else:
         raise ValueError(f"Unknown matcher_type: {matcher_type}")
 
 
-def match_descriptors(matcher, des1, des2, ratio_test=True, ratio=0.75, top_k=None):
+def knn_match_arrays(matcher, des1, des2, k=2, norm_type=cv2.NORM_HAMMING):
+    """
+    以陣列形式取得每個 query 的 k 個最近鄰，不建立 DMatch 物件。
+
+    BFMatcher 直接使用 cv2.batchDistance（結果與 knnMatch 相同），
+    LSHMatcher 使用其索引查詢，其他匹配器則轉換 knnMatch 的結果。
+
+    回傳:
+    - idx (ndarray): shape=(N1,k) int64，鄰居不足時為 -1
+    - dist (ndarray): shape=(N1,k) float32，鄰居不足時為 inf
+    """
+    if des1 is None or des2 is None or len(des1) == 0 or len(des2) == 0:
+        n = 0 if des1 is None else len(des1)
+        return _pad_knn(np.zeros((n, 0)), np.zeros((n, 0)), k)
+    if isinstance(matcher, LSHMatcher):
+        return matcher.knn_arrays(des1, des2, k)
+    if isinstance(matcher, cv2.BFMatcher):
+        dist, idx = cv2.batchDistance(des1, des2, -1, normType=norm_type, K=min(k, len(des2)))
+        return _pad_knn(idx, dist, k)
+    idx = np.full((len(des1), k), -1, dtype=np.int64)
+    dist = np.full((len(des1), k), np.inf, dtype=np.float32)
+    for q, row in enumerate(matcher.knnMatch(des1, des2, k=k)):
+        for n, m in enumerate(row[:k]):
+            idx[q, n], dist[q, n] = m.trainIdx, m.distance
+    return idx, dist
+
+
+def select_matches(idx, dist, ratio_test=True, ratio=0.75, top_k=None):
+    """
+    由 knn 陣列挑選匹配：向量化 ratio test，並以 argpartition 取前 K 筆。
+
+    參數:
+    - idx, dist (ndarray): knn_match_arrays 的結果
+    - ratio_test (bool), ratio (float), top_k (int or None): 同 match_descriptors
+
+    回傳:
+    - matches (Matches): 依距離排序
+    """
+    if ratio_test:
+        # 鄰居不足兩個時 dist[:, 1] 為 inf，視為無法做 ratio test 而捨棄
+        keep = (idx[:, 1] >= 0) & (dist[:, 0] < ratio * dist[:, 1])
+    else:
+        keep = idx[:, 0] >= 0
+    q = np.flatnonzero(keep)
+    t = idx[keep, 0]
+    d = dist[keep, 0]
+    if top_k is not None and len(d) > top_k:
+        # argpartition 找出第 K 小的距離；與其相同者依 query 順序補滿，
+        # 結果與「穩定排序後取前 K 筆」一致
+        kth = np.partition(d, top_k - 1)[top_k - 1]
+        less = np.flatnonzero(d < kth)
+        ties = np.flatnonzero(d == kth)[:top_k - len(less)]
+        sel = np.sort(np.concatenate([less, ties]))
+        order = sel[np.argsort(d[sel], kind='stable')]
+    else:
+        order = np.argsort(d, kind='stable')
+    return Matches(q[order], t[order], d[order])
+
+
+def match_descriptors_array(matcher, des1, des2, ratio_test=True, ratio=0.75, top_k=None,
+                            norm_type=cv2.NORM_HAMMING):
+    """
+    match_descriptors 的陣列版本，回傳 Matches 而非 DMatch 列表。
+
+    不使用 ratio test 時改用 matcher.match（保留 BFMatcher 的 cross check 設定）。
+    """
+    if not ratio_test:
+        raw = matcher.match(des1, des2) if des1 is not None and des2 is not None else []
+        idx = np.array([[m.trainIdx] for m in raw], dtype=np.int64).reshape(-1, 1)
+        dist = np.array([[m.distance] for m in raw], dtype=np.float32).reshape(-1, 1)
+        matches = select_matches(idx, dist, ratio_test=False, top_k=top_k)
+        q = np.array([m.queryIdx for m in raw], dtype=np.int64)
+        return matches._replace(query_idx=q[matches.query_idx]) if len(q) else matches
+    idx, dist = knn_match_arrays(matcher, des1, des2, k=2, norm_type=norm_type)
+    return select_matches(idx, dist, ratio_test, ratio, top_k)
+
+
+def matches_to_dmatch(matches):
+    """將 Matches 轉回 cv2.DMatch 列表（供繪圖或舊介面使用）"""
+    return [cv2.DMatch(int(q), int(t), float(d))
+            for q, t, d in zip(matches.query_idx, matches.train_idx, matches.distance)]
+
+
+def match_descriptors(matcher, des1, des2, ratio_test=True, ratio=0.75, top_k=None,
+                      norm_type=cv2.NORM_HAMMING):
     """
     執行描述子匹配，並可選用 Lowe's ratio test 和取前 K 筆。
 
@@ -40,23 +202,113 @@ def match_descriptors(matcher, des1, des2, ratio_test=True, ratio=0.75, top_k=No
     - ratio_test (bool): 是否使用 ratio test
     - ratio (float): ratio test 閾值
     - top_k (int or None): 取最優前 K 筆匹配，None 表示不限制
+    - norm_type: BFMatcher 的距離度量（陣列化 knn 使用）
 
     回傳:
     - matches (list of cv2.DMatch)
     """
-    if ratio_test:
-        # 使用 KNN 匹配 (k=2) 進行 ratio test
-        raw_matches = matcher.knnMatch(des1, des2, k=2)
-        good = []
-        for m, n in raw_matches:
-            if m.distance < ratio * n.distance:
-                good.append(m)
-        matches = sorted(good, key=lambda x: x.distance)
-    else:
-        # 直接匹配並依距離排序
-        matches = matcher.match(des1, des2)
-        matches = sorted(matches, key=lambda x: x.distance)
+    return matches_to_dmatch(
+        match_descriptors_array(matcher, des1, des2, ratio_test, ratio, top_k, norm_type)
+    )
+
+
+def gated_candidates(query_pts, train_pts, radius):
+    """
+    以網格雜湊找出所有距離不超過 radius 的 (query, train) 點對。
+
+    參數:
+    - query_pts (ndarray): shape=(Nq,2)
+    - train_pts (ndarray): shape=(Nt,2)，已換算到 query 影像座標的預測位置
+    - radius (float): 空間閘門半徑
+
+    回傳:
+    - q_idx, t_idx (ndarray): 候選點對索引
+    """
+    K = 1 << 21
+    tc = np.floor(train_pts / radius).astype(np.int64)
+    qc = np.floor(query_pts / radius).astype(np.int64)
+    t_key = tc[:, 0] * K + tc[:, 1]
+    order = np.argsort(t_key, kind='stable')
+    sorted_key = t_key[order]
+
+    q_all, t_all = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            key = (qc[:, 0] + dx) * K + (qc[:, 1] + dy)
+            lo = np.searchsorted(sorted_key, key, side='left')
+            cnt = np.searchsorted(sorted_key, key, side='right') - lo
+            total = int(cnt.sum())
+            if total == 0:
+                continue
+            q = np.repeat(np.arange(len(query_pts)), cnt)
+            offs = np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            q_all.append(q)
+            t_all.append(order[np.repeat(lo, cnt) + offs])
+    if not q_all:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    q_idx = np.concatenate(q_all)
+    t_idx = np.concatenate(t_all)
+    d2 = ((query_pts[q_idx] - train_pts[t_idx]) ** 2).sum(axis=1)
+    keep = d2 <= radius * radius
+    return q_idx[keep], t_idx[keep]
+
+
+def descriptor_distances(des1, des2, q_idx, t_idx, norm_type=cv2.NORM_HAMMING):
+    """
+    只計算指定點對的描述子距離。
+
+    參數:
+    - des1, des2 (ndarray): 兩組描述子
+    - q_idx, t_idx (ndarray): 點對索引
+    - norm_type: cv2.NORM_HAMMING / NORM_HAMMING2 用於二進位描述子，其餘視為 L2
+
+    回傳:
+    - dist (ndarray): float32
+    """
+    if norm_type in (cv2.NORM_HAMMING, cv2.NORM_HAMMING2):
+        return _POPCOUNT[des1[q_idx] ^ des2[t_idx]].sum(axis=1).astype(np.float32)
+    diff = des1[q_idx].astype(np.float32) - des2[t_idx].astype(np.float32)
+    return np.sqrt((diff * diff).sum(axis=1))
+
+
+def match_descriptors_guided(des1, des2, pts1, pts2_pred, radius, norm_type=cv2.NORM_HAMMING,
+                             ratio_test=True, ratio=0.75, top_k=None):
+    """
+    以預測位置限制候選集合的描述子匹配（階層式匹配的細層）。
+
+    每個 query 只與預測位置落在 radius 內的 train 描述子比較；
+    ratio test 只在候選集合內進行，候選僅一個時視為通過。
+
+    參數:
+    - des1, des2: 兩組描述子（query / train）
+    - pts1 (ndarray): shape=(N1,2) query 關鍵點座標
+    - pts2_pred (ndarray): shape=(N2,2) train 關鍵點經粗略仿射映射後的預測座標
+    - radius (float): 空間閘門半徑
+    - 其餘參數同 match_descriptors
+
+    回傳:
+    - matches (Matches)
+    """
+    q_idx, t_idx = gated_candidates(np.asarray(pts1, dtype=np.float64),
+                                    np.asarray(pts2_pred, dtype=np.float64), radius)
+    if len(q_idx) == 0:
+        return select_matches(np.zeros((0, 2), dtype=np.int64), np.zeros((0, 2), dtype=np.float32))
+    dist = descriptor_distances(des1, des2, q_idx, t_idx, norm_type)
+
+    # 依 (query, 距離) 排序，取每個 query 的最近與次近，整理成 knn 陣列
+    order = np.lexsort((dist, q_idx))
+    q_idx, t_idx, dist = q_idx[order], t_idx[order], dist[order]
+    first = np.flatnonzero(np.r_[True, q_idx[1:] != q_idx[:-1]])
+    has_second = np.r_[first[1:], len(q_idx)] - first > 1
+    idx = np.full((len(first), 2), -1, dtype=np.int64)
+    knn_dist = np.full((len(first), 2), np.inf, dtype=np.float32)
+    idx[:, 0], knn_dist[:, 0] = t_idx[first], dist[first]
+    idx[has_second, 1] = t_idx[first[has_second] + 1]
+    knn_dist[has_second, 1] = dist[first[has_second] + 1]
+    # 候選僅一個時視為通過 ratio test
+    idx[~has_second, 1] = 0
 
-    if top_k is not None and len(matches) > top_k:
-        matches = matches[:top_k]
-    return matches
+    matches = select_matches(idx, knn_dist, ratio_test, ratio, top_k)
+    return matches._replace(query_idx=q_idx[first][matches.query_idx])
@@ -0,0 +1,192 @@
+import os
+import cv2
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def thumbnail_descriptor(img, size=32):
+    """
+    以縮圖建立廉價的全域描述子，用來挑選可能重疊的影像對。
+
+    參數:
+    - img (ndarray): BGR 或灰階影像
+    - size (int): 縮圖邊長
+
+    回傳:
+    - desc (ndarray): shape=(size*size,) float32，零均值、單位長度
+    """
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    thumb -= thumb.mean()
+    norm = np.linalg.norm(thumb)
+    return (thumb / norm if norm > 0 else thumb).ravel()
+
+
+def propose_pairs(descriptors, neighbors=4, window=1):
+    """
+    依全域描述子提出候選影像對。
+
+    以 FLANN KD-tree 找每張影像的 neighbors 個最近鄰（次平方時間），
+    另外加入檔名順序上相距 window 以內的影像對作為先驗。
+
+    參數:
+    - descriptors (ndarray): shape=(N,D) float32
+    - neighbors (int): 每張影像的最近鄰數
+    - window (int): 依序相鄰的影像對範圍，0 表示不加入
+
+    回傳:
+    - pairs (list of (i, j)): i < j，已排序且不重複
+    """
+    descriptors = np.ascontiguousarray(descriptors, dtype=np.float32)
+    N = descriptors.shape[0]
+    pairs = set()
+    for i in range(N):
+        for d in range(1, window + 1):
+            if i + d < N:
+                pairs.add((i, i + d))
+
+    k = min(neighbors + 1, N)
+    if k > 1:
+        index = cv2.flann_Index(descriptors, {'algorithm': 1, 'trees': 4})
+        idx, _ = index.knnSearch(descriptors, k, params={'checks': 64})
+        for i, row in enumerate(idx):
+            for j in row:
+                j = int(j)
+                if 0 <= j < N and j != i:
+                    pairs.add((min(i, j), max(i, j)))
+    return sorted(pairs)
+
+
+def match_pairs(pairs, align_fn, workers=None):
+    """
+    以執行緒池平行對齊候選影像對（OpenCV 匹配時會釋放 GIL）。
+
+    參數:
+    - pairs (list of (i, j))
+    - align_fn (callable): align_fn(i, j) 回傳 (pts_i, pts_j) 內點對應點，失敗時回傳 None
+    - workers (int or None): 執行緒數，None 表示 os.cpu_count()
+
+    回傳:
+    - results (list of (i, j, pts_i, pts_j)): 只包含成功的影像對
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        aligned = list(pool.map(lambda p: align_fn(*p), pairs))
+    return [(i, j, res[0], res[1]) for (i, j), res in zip(pairs, aligned) if res is not None]
+
+
+def connected_component(n_images, edges, start):
+    """回傳包含 start 的連通分量（集合）"""
+    adj = [[] for _ in range(n_images)]
+    for i, j in edges:
+        adj[i].append(j)
+        adj[j].append(i)
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        u = queue.popleft()
+        for v in adj[u]:
+            if v not in seen:
+                seen.add(v)
+                queue.append(v)
+    return seen
+
+
+def choose_reference(n_images, edges):
+    """
+    選擇基準影像：優先使用第 0 張，若其不在最大連通分量中，
+    則改用最大連通分量中度數最高的影像。
+    """
+    remaining = set(range(n_images))
+    best = set()
+    while remaining:
+        comp = connected_component(n_images, edges, min(remaining))
+        remaining -= comp
+        if len(comp) > len(best):
+            best = comp
+    if 0 in best:
+        return 0, best
+    degree = np.zeros(n_images, dtype=int)
+    for i, j in edges:
+        degree[i] += 1
+        degree[j] += 1
+    ref = max(best, key=lambda k: degree[k])
+    return ref, best
+
+
+def solve_global_affines(n_images, pair_results, reference=0, max_points=200, scale=1.0):
+    """
+    以線性最小二乘同時求解所有影像到基準影像座標系的仿射矩陣。
+
+    每組內點對應 (p_i, p_j) 貢獻殘差 A_j p_j - A_i p_i，基準影像固定為單位矩陣。
+    仿射矩陣兩列參數的設計矩陣相同，只需組一個 3N×3N 的區塊稀疏正規方程，
+    各影像對只填入 (i,i)、(j,j)、(i,j)、(j,i) 四個 3×3 區塊（scipy.sparse，COO 轉 CSC），
+    以稀疏 LU（spsolve）兩個右式一次求解；記憶體與影像對數成正比，不需 N×N 的稠密矩陣。
+
+    參數:
+    - n_images (int)
+    - pair_results (list of (i, j, pts_i, pts_j)): pts_j 對應到 pts_i 的內點座標
+    - reference (int): 基準影像索引
+    - max_points (int): 每組影像對最多使用的對應點數（均勻抽樣）
+    - scale (float): 座標正規化尺度（通常取影像最大邊長），改善數值條件
+
+    回傳:
+    - transforms (list): 每張影像的 3x3 矩陣（映射到基準影像座標），未連通者為 None
+    """
+    edges = [(i, j) for i, j, _, _ in pair_results]
+    component = connected_component(n_images, edges, reference)
+
+    # 基準影像固定：A_ref 的兩列參數為 (1,0,0)、(0,1,0)
+    X_ref = np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+    unknown = sorted(component - {reference})
+    transforms = [None] * n_images
+    transforms[reference] = np.eye(3)
+    if not unknown:
+        return transforms
+
+    # 未知影像在正規方程中的區塊索引；基準影像的區塊移到右式
+    index = {k: n for n, k in enumerate(unknown)}
+    rows, cols, vals = [], [], []
+    rhs = np.zeros((3 * len(unknown), 2))
+    block_r, block_c = np.divmod(np.arange(9), 3)
+
+    def add_block(a, b, block):
+        if a not in index:
+            return
+        if b in index:
+            rows.append(3 * index[a] + block_r)
+            cols.append(3 * index[b] + block_c)
+            vals.append(block.ravel())
+        elif b == reference:
+            rhs[3 * index[a]:3 * index[a] + 3] -= block @ X_ref
+
+    for i, j, pts_i, pts_j in pair_results:
+        if i not in component:
+            continue
+        if len(pts_i) > max_points:
+            sel = np.linspace(0, len(pts_i) - 1, max_points).astype(int)
+            pts_i, pts_j = pts_i[sel], pts_j[sel]
+        P_i = np.hstack([np.asarray(pts_i, dtype=np.float64) / scale, np.ones((len(pts_i), 1))])
+        P_j = np.hstack([np.asarray(pts_j, dtype=np.float64) / scale, np.ones((len(pts_j), 1))])
+        add_block(i, i, P_i.T @ P_i)
+        add_block(j, j, P_j.T @ P_j)
+        add_block(i, j, -P_i.T @ P_j)
+        add_block(j, i, -P_j.T @ P_i)
+
+    # COO 重複的 (row, col) 轉成 CSC 時自動相加
+    size = 3 * len(unknown)
+    H_uu = sparse.coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(size, size)).tocsc()
+    X = spsolve(H_uu, rhs).reshape(size, 2)
+
+    for n, k in enumerate(unknown):
+        A = X[3 * n:3 * n + 3].T          # shape=(2,3)，正規化座標下的仿射矩陣
+        T = np.eye(3)
+        T[:2, :2] = A[:, :2]
+        T[:2, 2] = A[:, 2] * scale        # 平移換回像素單位
+        transforms[k] = T
+    return transforms
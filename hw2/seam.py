@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+# 非重疊區域的成本，讓接縫盡量留在重疊區內
+OUTSIDE_COST = 1e6
+
+
+def find_seam(cost):
+    """
+    以動態規劃找出由上到下、累積成本最小的接縫（8 連通）。
+
+    參數:
+    - cost (ndarray): shape=(H,W) float32 成本圖
+
+    回傳:
+    - seam (ndarray): shape=(H,) int，每列接縫所在的行
+    """
+    h, w = cost.shape
+    acc = cost[0].astype(np.float64)
+    back = np.zeros((h, w), dtype=np.int8)
+    cols = np.arange(w)
+    inf = np.full(1, np.inf)
+    for y in range(1, h):
+        cand = np.stack([np.concatenate([inf, acc[:-1]]), acc, np.concatenate([acc[1:], inf])])
+        k = np.argmin(cand, axis=0)
+        back[y] = k - 1
+        acc = cost[y] + cand[k, cols]
+    seam = np.empty(h, dtype=int)
+    seam[-1] = int(np.argmin(acc))
+    for y in range(h - 1, 0, -1):
+        seam[y - 1] = seam[y] + back[y, seam[y]]
+    return seam
+
+
+def _gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def seam_ownership(base_img, warped_img, base_mask, warp_mask, scale=0.25):
+    """
+    在重疊區估計接縫，決定每個像素屬於既有全景或新影像。
+
+    接縫在縮小 scale 倍的重疊區外框上以動態規劃求出，成本為兩影像灰階差的絕對值，
+    再內插回原解析度。重疊區外框較寬時改找由左到右的接縫。
+    新影像取接縫上靠近其獨有區域的一側。
+
+    參數:
+    - base_img, warped_img (ndarray): roi 範圍內的既有全景與新影像
+    - base_mask, warp_mask (ndarray): roi 範圍內兩者的覆蓋遮罩（非 0 為有效）
+    - scale (float): 求接縫時的縮小比例
+
+    回傳:
+    - own (ndarray): uint8，255 表示該像素由新影像負責
+    """
+    base_on = base_mask > 0
+    warp_on = warp_mask > 0
+    overlap = base_on & warp_on
+    own = np.where(warp_on, 255, 0).astype(np.uint8)
+    if not overlap.any():
+        return own
+
+    ys, xs = np.nonzero(overlap)
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    vertical = (y1 - y0) >= (x1 - x0)
+
+    # 判斷新影像位於接縫哪一側：比較兩者獨有區域的重心
+    axis_idx = 1 if vertical else 0
+    warp_only = np.nonzero(warp_on & ~base_on)[axis_idx]
+    base_only = np.nonzero(base_on & ~warp_on)[axis_idx]
+    if len(warp_only) == 0 or len(base_only) == 0:
+        return own
+    warp_after = warp_only.mean() > base_only.mean()
+
+    # 縮小重疊區外框並計算成本
+    box = (slice(y0, y1), slice(x0, x1))
+    diff = cv2.absdiff(_gray(base_img[box]), _gray(warped_img[box])).astype(np.float32)
+    diff[~overlap[box]] = OUTSIDE_COST
+    if not vertical:
+        diff = diff.T
+    H, W = diff.shape
+    h, w = max(1, int(round(H * scale))), max(1, int(round(W * scale)))
+    small = cv2.resize(diff, (w, h), interpolation=cv2.INTER_AREA)
+    seam_small = find_seam(small)
+
+    # 接縫內插回原解析度（以像素中心對齊）
+    rows = (np.arange(H) + 0.5) * h / H - 0.5
+    seam = (np.interp(rows, np.arange(h), seam_small) + 0.5) * W / w - 0.5
+
+    side = np.arange(W)[np.newaxis, :] >= seam[:, np.newaxis]
+    if not warp_after:
+        side = ~side
+    if not vertical:
+        side = side.T
+    own_box = own[box]
+    own_box[overlap[box] & ~side] = 0
+    return own
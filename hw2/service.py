@@ -0,0 +1,245 @@
+"""
+批次拼接服務（常駐模式）。
+
+從 stdin（每行一個 JSON）或佇列資料夾（每個工作一個 .json 檔）讀取工作，
+以有上限的行程池並行拼接。每個 worker 行程只 import 一次 cv2、
+每個設定檔只解析一次，偵測器與匹配器依設定在行程內重用。
+每完成一個工作即在 stdout 輸出一行 JSON（含耗時）。
+
+工作格式:
+  {"id": "job-1", "input": "input", "output": "output/pano.jpg",
+   "config": "settings.yaml", "overrides": {"blend": {"method": "feather_fixed"}}}
+  config 省略時使用 --config；overrides 以遞迴方式覆蓋設定。
+
+使用:
+  python service.py --config settings.yaml --workers 4 < jobs.jsonl
+  python service.py --config settings.yaml --queue queue/ [--once]
+
+佇列資料夾中的 <name>.json 會先改名為 <name>.json.working 取得工作，
+完成後寫出 <name>.result.json 並將工作檔改名為 .done 或 .failed。
+"""
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import argparse
+import threading
+import contextlib
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from stitcher import stitch_with_config
+
+
+def deep_merge(base, overrides):
+    """回傳將 overrides 遞迴覆蓋到 base 的新 dict（不修改 base）"""
+    merged = copy.deepcopy(base)
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+@lru_cache(maxsize=32)
+def _load_config(path, mtime):
+    with open(path, 'r') as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_config(path):
+    """解析設定檔，同一檔案（未修改時）在行程內只解析一次"""
+    return _load_config(os.path.abspath(path), os.path.getmtime(path))
+
+
+def run_job(job, default_config):
+    """
+    worker 行程：執行單一拼接工作。
+
+    特徵偵測固定在 worker 行程內執行（feature.workers = 1），避免巢狀行程池；
+    stitcher 的進度訊息導向 stderr，stdout 只留給工作結果。
+
+    回傳:
+    - result (dict): id、status、seconds，失敗時另含 error
+    """
+    start = time.perf_counter()
+    result = {'id': job.get('id'), 'input': job.get('input'), 'output': job.get('output')}
+    try:
+        cfg = deep_merge(load_config(job.get('config') or default_config), job.get('overrides'))
+        cfg.setdefault('feature', {})['workers'] = 1
+        with contextlib.redirect_stdout(sys.stderr):
+            stitch_with_config(cfg, job['input'], job['output'])
+        result['status'] = 'ok'
+    except Exception as exc:
+        result['status'] = 'error'
+        result['error'] = f"{type(exc).__name__}: {exc}"
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    result['pid'] = os.getpid()
+    return result
+
+
+def _invalid_job(job_id, exc):
+    """無法解析的工作：直接以失敗結果回報，不送進行程池"""
+    return {'id': job_id, 'status': 'error', 'error': f"{type(exc).__name__}: {exc}", 'seconds': 0.0}
+
+
+def _parse_job(text, job_id):
+    job = json.loads(text)
+    if not isinstance(job, dict):
+        raise ValueError(f"工作必須是 JSON 物件，收到 {type(job).__name__}")
+    job.setdefault('id', job_id)
+    return job
+
+
+def iter_stdin_jobs(stream):
+    """逐行讀取 JSON 工作，空行略過；格式錯誤的行回報為失敗的工作"""
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = _parse_job(line, f'stdin-{n}')
+        except ValueError as exc:
+            job = _invalid_job(f'stdin-{n}', exc)
+        yield job, None
+
+
+def iter_queue_jobs(queue_dir, poll=1.0, once=False):
+    """
+    輪詢佇列資料夾，以改名方式取得 <name>.json 工作。
+    once 為 True 時，佇列清空即結束；無法讀取或解析的工作檔回報為失敗（改名為 .failed）。
+    """
+    while True:
+        names = sorted(n for n in os.listdir(queue_dir) if n.endswith('.json') and not n.endswith('.result.json'))
+        claimed = False
+        for name in names:
+            path = os.path.join(queue_dir, name)
+            working = path + '.working'
+            try:
+                os.rename(path, working)
+            except OSError:
+                # 已被其他服務行程取走
+                continue
+            claimed = True
+            job_id = name[:-len('.json')]
+            try:
+                with open(working, 'r') as f:
+                    job = _parse_job(f.read(), job_id)
+            except (OSError, ValueError) as exc:
+                job = _invalid_job(job_id, exc)
+            yield job, working
+        if not claimed:
+            if once:
+                return
+            time.sleep(poll)
+
+
+def _finish_queue_job(working, result):
+    base = working[:-len('.json.working')]
+    with open(base + '.result.json', 'w') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(working, base + ('.json.done' if result['status'] == 'ok' else '.json.failed'))
+
+
+def _feed_jobs(jobs, inbox, slots):
+    """
+    讀取執行緒：每取得一個空位才向 jobs 要下一個工作，放進 inbox。
+    stdin 的 readline 與佇列輪詢都在這裡阻塞，不會延誤主迴圈回報已完成的工作；
+    佇列模式下已取走但尚未完成的工作也不會超過空位數。
+    """
+    try:
+        for item in jobs:
+            inbox.put(('job', item))
+            slots.acquire()
+    except Exception as exc:
+        inbox.put(('error', exc))
+    inbox.put(('end', None))
+
+
+def serve(jobs, default_config, workers=None, max_pending=None):
+    """
+    以有上限的行程池執行工作；同時送出的工作數不超過 max_pending（預設 2 × workers）。
+
+    工作由背景執行緒讀取，完成的工作透過 future 的 callback 通知主迴圈，
+    因此輸入阻塞或佇列閒置時，已完成工作的結果仍會立即寫出。
+
+    參數:
+    - jobs (iterable of (job, working_path)): iter_stdin_jobs / iter_queue_jobs 的結果
+    - default_config (str): 工作未指定 config 時使用的設定檔
+    - workers (int or None): 行程數，None 表示 os.cpu_count()
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    pending = {}
+    n_ok = n_failed = 0
+    inbox = queue.Queue()
+    # 第一個工作不需空位即可讀取，之後每讀一個工作佔用一個空位
+    slots = threading.Semaphore(max_pending - 1)
+    reader = threading.Thread(target=_feed_jobs, args=(jobs, inbox, slots), daemon=True)
+
+    def report(result, working):
+        nonlocal n_ok, n_failed
+        if working is not None:
+            _finish_queue_job(working, result)
+        if result['status'] == 'ok':
+            n_ok += 1
+        else:
+            n_failed += 1
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+        slots.release()
+
+    reading, reader_error = True, None
+    # 讀取執行緒可能正阻塞在 stdin.readline 並持有其鎖，fork 出的 worker 關閉 stdin 時會卡住，
+    # 因此 worker 改以 spawn 啟動（每個 worker 仍只 import 一次）
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        reader.start()
+        while reading or pending:
+            kind, value = inbox.get()
+            if kind == 'job':
+                job, working = value
+                if job.get('status') == 'error':
+                    report(job, working)
+                    continue
+                fut = pool.submit(run_job, job, default_config)
+                pending[fut] = (job, working, time.perf_counter())
+                fut.add_done_callback(lambda f: inbox.put(('done', f)))
+            elif kind == 'done':
+                job, working, submitted = pending.pop(value)
+                try:
+                    result = value.result()
+                except Exception as exc:
+                    # worker 行程異常結束等情況
+                    result = _invalid_job(job.get('id'), exc)
+                    result.update(input=job.get('input'), output=job.get('output'))
+                result['wall_seconds'] = round(time.perf_counter() - submitted, 3)
+                report(result, working)
+            elif kind == 'error':
+                reader_error = value
+            else:
+                reading = False
+    if reader_error is not None:
+        raise reader_error
+    return n_ok, n_failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='批次全景拼接服務')
+    parser.add_argument('--config', required=True, help='預設設定檔路徑 (YAML)')
+    parser.add_argument('--workers', type=int, default=0, help='行程數，0 表示使用全部 CPU')
+    parser.add_argument('--queue', help='佇列資料夾；省略時從 stdin 讀取 JSON lines')
+    parser.add_argument('--poll', type=float, default=1.0, help='佇列輪詢間隔（秒）')
+    parser.add_argument('--once', action='store_true', help='佇列清空後即結束')
+    args = parser.parse_args()
+
+    if args.queue:
+        job_iter = iter_queue_jobs(args.queue, args.poll, args.once)
+    else:
+        job_iter = iter_stdin_jobs(sys.stdin)
+    n_ok, n_failed = serve(job_iter, args.config, args.workers or None)
+    print(f"完成 {n_ok} 個工作，失敗 {n_failed} 個", file=sys.stderr)
@@ -1,96 +1,370 @@
 import os
+import sys
 import cv2
+import json
 import yaml
 import numpy as np
 import argparse
+import threading
 
-from loader import load_images_from_dir, preprocess_image
-from feature import get_feature_detector, detect_and_compute
-from matcher import create_matcher, match_descriptors
-from transformer import estimate_affine_transform
-from blender import blend_images
+from loader import list_image_files, iter_images, reduce_factor
+from feature import extract_features, detect_coarse_features
+from matcher import create_matcher, match_descriptors_array, match_descriptors_guided
+from transformer import estimate_affine_matches, projected_roi, warp_image_roi, refine_affine_patches
+from blender import blend_context, blend_images_tiled, source_weight_map, MultibandAccumulator
+from canvas import PanoramaCanvas
+from seam import seam_ownership
+from pairing import (thumbnail_descriptor, propose_pairs, match_pairs,
+                     choose_reference, solve_global_affines)
 
 
-def stitch_images(config_path, input_dir, output_path):
-    # 讀取設定檔
-    with open(config_path, 'r') as f:
-        cfg = yaml.safe_load(f)
+def match_hierarchical(feat_i, feat_j, coarse_i, coarse_j, matcher, match_cfg, ransac_cfg,
+                       norm_type=cv2.NORM_HAMMING):
+    """
+    階層式匹配：先以縮小影像的特徵估算粗略仿射矩陣，
+    再將影像 j 的關鍵點映射到影像 i，只在 gate_radius 內的候選中匹配。
 
-    # 建立特徵偵測器
-    feat_cfg = cfg.get('feature', {})
-    detector = get_feature_detector(
-        feat_cfg.get('type', 'ORB'),
-        **feat_cfg.get('params', {})
-    )
+    參數:
+    - feat_i, feat_j, coarse_i, coarse_j: (關鍵點陣列, 描述子)，關鍵點為 keypoints_to_array 格式
 
-    # 建立描述子匹配器
-    matcher_cfg = cfg.get('matcher', {})
-    norm_type = getattr(cv2, matcher_cfg.get('params', {}).get('norm_type', 'NORM_HAMMING'))
-    cross_check = matcher_cfg.get('params', {}).get('cross_check', False)
-    matcher = create_matcher(
-        matcher_cfg.get('type', 'BF'),
-        norm_type,
-        cross_check,
-        **matcher_cfg.get('flann', {})
+    回傳:
+    - matches (Matches or None): 粗略估算失敗時為 None（改用完整匹配）
+    """
+    kp_i, des_i = feat_i
+    kp_j, des_j = feat_j
+    kp_ci, des_ci = coarse_i
+    kp_cj, des_cj = coarse_j
+    if des_ci is None or des_cj is None or des_i is None or des_j is None:
+        return None
+    scale = match_cfg.get('coarse_scale', 0.25)
+    coarse_matches = match_descriptors_array(
+        matcher, des_ci, des_cj,
+        ratio_test=match_cfg.get('ratio_test', True),
+        ratio=match_cfg.get('ratio', 0.75),
+        norm_type=norm_type
     )
+    if len(coarse_matches.query_idx) < 3:
+        return None
+    M_small, mask = estimate_affine_matches(
+        kp_ci[:, :2], kp_cj[:, :2], coarse_matches,
+        ransac_thresh=max(1.0, ransac_cfg.get('thresh', 5.0) * scale),
+        max_iters=ransac_cfg.get('max_iters', 2000),
+        method=ransac_cfg.get('method', 'batched'),
+        confidence=ransac_cfg.get('confidence', 0.99)
+    )
+    if M_small is None or int(mask.sum()) < match_cfg.get('coarse_min_inliers', 8):
+        return None
 
-    # 其他參數
-    match_cfg = cfg.get('match', {})
-    ransac_cfg = cfg.get('ransac', {})
-    blend_cfg = cfg.get('blend', {})
-    blend_method = blend_cfg.get('method', 'feather')
-    blend_params = blend_cfg.get('params', {})
-
-    # 載入影像
-    images_dict = load_images_from_dir(input_dir)
-    if len(images_dict) < 2:
-        raise ValueError("至少需要兩張影像進行拼接。")
-    keys = sorted(images_dict.keys())
-    imgs = [images_dict[k] for k in keys]
+    # 縮小影像座標 x_s = (x + 0.5) * scale - 0.5，換回原解析度：M = C^-1 M_s C
+    C = np.array([[scale, 0, 0.5 * scale - 0.5], [0, scale, 0.5 * scale - 0.5], [0, 0, 1]])
+    M = np.linalg.inv(C) @ np.vstack([M_small, [0, 0, 1]]) @ C
+    pred_j = kp_j[:, :2].astype(np.float64) @ M[:2, :2].T + M[:2, 2]
+    return match_descriptors_guided(
+        des_i, des_j, kp_i[:, :2], pred_j,
+        radius=match_cfg.get('gate_radius', 30),
+        norm_type=norm_type,
+        ratio_test=match_cfg.get('ratio_test', True),
+        ratio=match_cfg.get('ratio', 0.75),
+        top_k=match_cfg.get('top_k', None)
+    )
 
-    # 預先偵測第一張影像特徵
-    gray_prev = preprocess_image(imgs[0], to_gray=True)
-    kp_prev, des_prev = detect_and_compute(detector, gray_prev)
 
-    # 儲存每張影像至基準影像的合成仿射矩陣 (3x3)
-    transforms = [np.eye(3)]
+def align_pair(feat_i, feat_j, matcher, match_cfg, ransac_cfg, coarse=None, norm_type=cv2.NORM_HAMMING):
+    """
+    匹配兩張影像的描述子並以 RANSAC 估算仿射矩陣（影像 j 映射到影像 i）。
 
-    # 依序估算仿射矩陣並串接
-    for idx in range(1, len(imgs)):
-        gray_cur = preprocess_image(imgs[idx], to_gray=True)
-        kp_cur, des_cur = detect_and_compute(detector, gray_cur)
+    參數:
+    - feat_i, feat_j: (關鍵點陣列, 描述子)，關鍵點為 keypoints_to_array 格式
+    - coarse (tuple or None): (coarse_i, coarse_j) 縮小影像的特徵，提供時使用階層式匹配
 
-        # 匹配描述子
-        matches = match_descriptors(
-            matcher, des_prev, des_cur,
+    回傳:
+    - M23 (ndarray or None): 2x3 仿射矩陣，匹配點不足或估算失敗時為 None
+    - matches (Matches)
+    - inlier_mask (ndarray or None)
+    """
+    kp_i, des_i = feat_i
+    kp_j, des_j = feat_j
+    matches = None
+    if coarse is not None:
+        matches = match_hierarchical(feat_i, feat_j, coarse[0], coarse[1],
+                                     matcher, match_cfg, ransac_cfg, norm_type)
+    if matches is None:
+        matches = match_descriptors_array(
+            matcher, des_i, des_j,
             ratio_test=match_cfg.get('ratio_test', True),
             ratio=match_cfg.get('ratio', 0.75),
-            top_k=match_cfg.get('top_k', None)
-        )
-        if len(matches) < 3:
-            raise RuntimeError(f"影像 '{keys[idx-1]}' 與 '{keys[idx]}' 匹配點不足：{len(matches)} < 3")
-
-        # 估算仿射矩陣 (2x3)
-        M23, inlier_mask = estimate_affine_transform(
-            kp_prev, kp_cur, matches,
-            ransac_thresh=ransac_cfg.get('thresh', 5.0),
-            max_iters=ransac_cfg.get('max_iters', 2000)
+            top_k=match_cfg.get('top_k', None),
+            norm_type=norm_type
         )
+    if len(matches.query_idx) < 3:
+        return None, matches, None
+    M23, inlier_mask = estimate_affine_matches(
+        kp_i[:, :2], kp_j[:, :2], matches,
+        ransac_thresh=ransac_cfg.get('thresh', 5.0),
+        max_iters=ransac_cfg.get('max_iters', 2000),
+        method=ransac_cfg.get('method', 'batched'),
+        confidence=ransac_cfg.get('confidence', 0.99)
+    )
+    return M23, matches, inlier_mask
+
+
+def estimate_transforms_sequential(keys, features, matcher, match_cfg, ransac_cfg,
+                                   coarse=None, norm_type=cv2.NORM_HAMMING, refine=None):
+    """
+    依檔名順序兩兩估算仿射矩陣，並串接到第一張影像坐標系。
+    refine: 可選的 refine(i, j, M23) → M23，串接前修正每組相鄰影像的仿射（見 make_pair_refiner）
+    """
+    transforms = [np.eye(3)]
+    for idx in range(1, len(features)):
+        pair_coarse = (coarse[idx - 1], coarse[idx]) if coarse is not None else None
+        M23, matches, _ = align_pair(features[idx - 1], features[idx], matcher, match_cfg, ransac_cfg,
+                                     pair_coarse, norm_type)
+        n_matches = len(matches.query_idx)
+        if n_matches < 3:
+            raise RuntimeError(f"影像 '{keys[idx-1]}' 與 '{keys[idx]}' 匹配點不足：{n_matches} < 3")
         if M23 is None:
             raise RuntimeError(f"影像 '{keys[idx-1]}' 與 '{keys[idx]}' 仿射估算失敗。")
+        if refine is not None:
+            M23 = refine(idx - 1, idx, M23)
 
         # 轉為 3x3
         M3 = np.vstack([M23, [0, 0, 1]])
         # 串接到第一張影像坐標系
         transforms.append(M3 @ transforms[-1])
+    return transforms
+
+
+def make_pair_refiner(paths, refine_cfg, search, prefetch=4, decode_workers=None):
+    """
+    sequential 模式的相鄰影像對修正：影像依序串流解碼，同時只保留相鄰兩張原解析度影像，
+    以 refine_affine_patches 在原解析度局部區塊上修正仿射。
+
+    回傳:
+    - refine (callable): refine(i, j, M23) → M23，需依 (0, 1)、(1, 2)… 的順序呼叫
+    """
+    stream = enumerate(iter_images(paths, prefetch, decode_workers))
+    held = {}
+
+    def refine(i, j, M23):
+        while j not in held:
+            idx, (path, img) = next(stream)
+            if img is None:
+                raise IOError(f"無法載入影像: {path}")
+            held[idx] = img
+        for k in [k for k in held if k < i]:
+            del held[k]
+        M_refined, _ = refine_affine_patches(
+            held[i], held[j], M23,
+            patch=refine_cfg.get('patch', 64),
+            search=search,
+            max_patches=refine_cfg.get('max_patches', 16),
+            min_score=refine_cfg.get('min_score', 0.7)
+        )
+        return M_refined
+    return refine
+
+
+def estimate_transforms_graph(thumbs, shapes, keys, features, make_matcher, match_cfg, ransac_cfg, pair_cfg,
+                              coarse=None, norm_type=cv2.NORM_HAMMING):
+    """
+    以縮圖描述子（thumbnail_descriptor）挑選候選影像對，平行匹配後建立匹配圖，
+    再以全域最小二乘一次求出所有仿射矩陣。
+    shapes 為各影像的 (H, W)。不在基準影像連通分量中的影像回傳 None。
+    """
+    pairs = propose_pairs(np.stack(thumbs), pair_cfg.get('neighbors', 4), pair_cfg.get('window', 1))
+    min_inliers = pair_cfg.get('min_inliers', 15)
+
+    # cv2 匹配器不保證可跨執行緒共用，每個執行緒各建一個；
+    # 可共用者（LSHMatcher）則共用，讓各執行緒重用同一份 train 索引
+    shared = make_matcher()
+    local = threading.local()
+
+    def align(i, j):
+        if not hasattr(local, 'matcher'):
+            local.matcher = shared if getattr(shared, 'thread_safe', False) else make_matcher()
+        pair_coarse = (coarse[i], coarse[j]) if coarse is not None else None
+        try:
+            M23, matches, mask = align_pair(features[i], features[j], local.matcher, match_cfg, ransac_cfg,
+                                            pair_coarse, norm_type)
+        except (ValueError, RuntimeError) as e:
+            # 退化的候選影像對（例如對應點全部共線）只捨棄該對，不中斷整個匹配圖
+            print(f"警告：影像對 '{keys[i]}'–'{keys[j]}' 無法對齊，已略過（{e}）", file=sys.stderr)
+            return None
+        if M23 is None or int(mask.sum()) < min_inliers:
+            return None
+        ok = mask.ravel().astype(bool)
+        pts_i = features[i][0][matches.query_idx[ok], :2]
+        pts_j = features[j][0][matches.train_idx[ok], :2]
+        return pts_i, pts_j
+
+    results = match_pairs(pairs, align, pair_cfg.get('workers', 0) or None)
+    print(f"候選影像對 {len(pairs)} 組，成功對齊 {len(results)} 組")
+
+    reference, _ = choose_reference(len(features), [(i, j) for i, j, _, _ in results])
+    scale = max(max(shape[:2]) for shape in shapes)
+    transforms = solve_global_affines(len(features), results, reference,
+                                      max_points=pair_cfg.get('max_points', 200), scale=scale)
+    for idx, T in enumerate(transforms):
+        if T is None:
+            print(f"警告：影像 '{keys[idx]}' 與基準影像 '{keys[reference]}' 不連通，已略過。")
+    return transforms
+
+
+# 行程內已建立的匹配器，key 為 matcher 設定 JSON（服務模式下跨工作重用）
+_MATCHER_CACHE = {}
 
-        # 更新基準特徵
-        kp_prev, des_prev = kp_cur, des_cur
+
+def matcher_factory(matcher_cfg):
+    """
+    依設定檔 matcher: 區段回傳 (建立匹配器的函式, norm_type)。
+    """
+    norm_type = getattr(cv2, matcher_cfg.get('params', {}).get('norm_type', 'NORM_HAMMING'))
+    cross_check = matcher_cfg.get('params', {}).get('cross_check', False)
+
+    def make_matcher():
+        return create_matcher(
+            matcher_cfg.get('type', 'BF'),
+            norm_type,
+            cross_check,
+            lsh_params=matcher_cfg.get('lsh'),
+            **matcher_cfg.get('flann', {})
+        )
+    return make_matcher, norm_type
+
+
+def get_matcher(matcher_cfg):
+    """同一組設定在行程內只建立一次匹配器"""
+    key = json.dumps(matcher_cfg, sort_keys=True)
+    matcher = _MATCHER_CACHE.get(key)
+    if matcher is None:
+        matcher = _MATCHER_CACHE[key] = matcher_factory(matcher_cfg)[0]()
+    return matcher
+
+
+def stitch_images(config_path, input_dir, output_path):
+    # 讀取設定檔
+    with open(config_path, 'r') as f:
+        cfg = yaml.safe_load(f)
+    stitch_with_config(cfg, input_dir, output_path)
+
+
+def stitch_with_config(cfg, input_dir, output_path):
+    """
+    以已解析的設定 dict 執行拼接（stitch_images 與服務模式共用）。
+    """
+    # 特徵偵測設定
+    feat_cfg = cfg.get('feature', {})
+
+    # 描述子匹配器（同設定重用；graph 模式下不可共用者每個執行緒各建一個）
+    matcher_cfg = cfg.get('matcher', {})
+    make_matcher, norm_type = matcher_factory(matcher_cfg)
+
+    # 其他參數
+    match_cfg = cfg.get('match', {})
+    ransac_cfg = cfg.get('ransac', {})
+    blend_cfg = cfg.get('blend', {})
+    blend_method = blend_cfg.get('method', 'feather').lower()
+    blend_params = blend_cfg.get('params', {})
+
+    # 影像依檔名排序；全解析度影像只在需要時以執行緒池預先解碼、逐張取用，不再全部留在記憶體
+    loader_cfg = cfg.get('loader', {})
+    prefetch = loader_cfg.get('prefetch', 4)
+    decode_workers = loader_cfg.get('workers', 0) or None
+    paths = list_image_files(input_dir)
+
+    # 平行偵測所有影像特徵（命中快取者直接讀取），同時取得影像尺寸；
+    # 關鍵點以陣列形式一路傳到 RANSAC
+    # proxy_scale < 1 時在縮小的灰階代理影像上偵測，關鍵點換回原解析度座標，
+    # 之後的匹配、RANSAC 與仿射矩陣都在原解析度座標系（等同在代理影像上估算後以 S^-1 M S 換回）
+    proxy_scale = feat_cfg.get('proxy_scale', 1.0)
+    if proxy_scale < 1.0:
+        # ransac.thresh 以原解析度像素計，至少為代理影像上的 1 像素
+        ransac_cfg = dict(ransac_cfg, thresh=max(ransac_cfg.get('thresh', 5.0), 1.0 / proxy_scale))
+    results = extract_features(
+        paths,
+        feat_cfg.get('type', 'ORB'),
+        feat_cfg.get('params', {}),
+        workers=feat_cfg.get('workers', 1) or None,
+        cache_dir=feat_cfg.get('cache_dir'),
+        as_arrays=True,
+        prefetch=prefetch,
+        return_shapes=True,
+        skip_unreadable=True,
+        proxy_scale=proxy_scale
+    )
+    for path, result in zip(paths, results):
+        if result is None:
+            print(f"警告: 無法讀取影像 {path}")
+    paths = [path for path, result in zip(paths, results) if result is not None]
+    results = [result for result in results if result is not None]
+    if len(paths) < 2:
+        raise ValueError("至少需要兩張影像進行拼接。")
+    keys = [os.path.basename(path) for path in paths]
+    features = [(kp, des) for kp, des, _ in results]
+    shapes = [shape for _, _, shape in results]
+
+    # 估算每張影像至基準影像的仿射矩陣 (3x3)
+    pair_cfg = cfg.get('pairing', {})
+    pair_mode = pair_cfg.get('mode', 'sequential')
+    # 階層式匹配：先在縮小影像上偵測特徵，估算粗略仿射以限制細層匹配的候選
+    # graph 模式：以縮圖描述子挑選候選影像對
+    # 兩者都只需要縮小影像，reduced_decode 開啟時直接以 IMREAD_REDUCED_* 解碼成較小的影像
+    use_coarse = match_cfg.get('hierarchical', False)
+    use_thumbs = pair_mode == 'graph'
+    coarse = thumbs = None
+    if use_coarse or use_thumbs:
+        coarse_scale = match_cfg.get('coarse_scale', 0.25)
+        thumb_size = pair_cfg.get('thumb_size', 32)
+        coarse_params = dict(feat_cfg.get('params', {}))
+        if 'nfeatures' in coarse_params:
+            coarse_params['nfeatures'] = match_cfg.get('coarse_features', 500)
+        reduce = 1
+        if loader_cfg.get('reduced_decode', False):
+            # 縮小倍率以兩者中需要較高解析度者為準
+            needed = [coarse_scale] if use_coarse else []
+            if use_thumbs:
+                needed.append(max(thumb_size / min(shape) for shape in shapes))
+            reduce = reduce_factor(max(needed))
+        coarse, thumbs = [], []
+        for (path, img), shape in zip(iter_images(paths, prefetch, decode_workers, reduce), shapes):
+            if img is None:
+                raise IOError(f"無法載入影像: {path}")
+            if use_coarse:
+                coarse.append(detect_coarse_features(img, coarse_scale, feat_cfg.get('type', 'ORB'),
+                                                     coarse_params, full_shape=shape))
+            if use_thumbs:
+                thumbs.append(thumbnail_descriptor(img, thumb_size))
+        coarse = coarse or None
+
+    # 原解析度局部修正（只在使用代理影像時有意義）
+    refine_cfg = cfg.get('refine', {})
+    use_refine = refine_cfg.get('enabled', False) and proxy_scale < 1.0
+    if use_refine and pair_mode != 'sequential':
+        print("refine 只支援 sequential 模式，已略過。")
+        use_refine = False
+
+    if pair_mode == 'sequential':
+        matcher = get_matcher(matcher_cfg)
+        refine = None
+        if use_refine:
+            # 搜尋半徑預設涵蓋代理影像上 2 像素的誤差
+            search = refine_cfg.get('search', 0) or int(np.ceil(2.0 / proxy_scale))
+            refine = make_pair_refiner(paths, refine_cfg, search, prefetch, decode_workers)
+        transforms = estimate_transforms_sequential(keys, features, matcher, match_cfg, ransac_cfg,
+                                                    coarse, norm_type, refine)
+    elif pair_mode == 'graph':
+        transforms = estimate_transforms_graph(thumbs, shapes, keys, features, make_matcher,
+                                               match_cfg, ransac_cfg, pair_cfg, coarse, norm_type)
+        kept = [idx for idx, T in enumerate(transforms) if T is not None]
+        paths = [paths[idx] for idx in kept]
+        shapes = [shapes[idx] for idx in kept]
+        transforms = [transforms[idx] for idx in kept]
+    else:
+        raise ValueError(f"Unknown pairing mode: {pair_mode}")
 
     # 計算所有影像投影後的外框
     all_corners = []
-    for img, T in zip(imgs, transforms):
-        h, w = img.shape[:2]
+    for (h, w), T in zip(shapes, transforms):
         corners = np.array([[0, 0, 1], [w, 0, 1], [w, h, 1], [0, h, 1]]).T
         proj = T @ corners
         proj = proj[:2] / proj[2]
@@ -106,39 +380,117 @@ def stitch_images(config_path, input_dir, output_path):
     out_w = int(np.ceil(max_x - min_x))
     out_h = int(np.ceil(max_y - min_y))
 
-    # 建立空白畫布
-    panorama = np.zeros((out_h, out_w, 3), dtype=np.uint8)
-    panorama_mask = np.zeros((out_h, out_w), dtype=np.uint8)
-
-    # 依序 Warp 與混合
-    for idx, img in enumerate(imgs):
-        T = offset @ transforms[idx]
-        M = T[:2]
-        warp = cv2.warpAffine(
-            img, M, (out_w, out_h),
-            flags=cv2.INTER_LINEAR,
-            borderMode=cv2.BORDER_CONSTANT,
-            borderValue=0
-        )
-        mask = cv2.warpAffine(
-            np.ones((img.shape[0], img.shape[1]), dtype=np.uint8) * 255,
-            M, (out_w, out_h)
-        )
-        if idx == 0:
-            panorama = warp
-            panorama_mask = mask
-        else:
-            panorama = blend_images(
-                panorama, warp, mask,
-                method=blend_method,
-                **blend_params
-            )
-            # 更新 mask
-            panorama_mask = np.where(mask > 0, 255, panorama_mask).astype(np.uint8)
+    # 建立畫布（memory 或磁碟上的 memmap）
+    out_cfg = cfg.get('output', {})
+    backend = out_cfg.get('backend', 'memory')
+    raw_path = output_path if output_path.endswith('.npy') else os.path.splitext(output_path)[0] + '.npy'
+    canvas = PanoramaCanvas(out_h, out_w, 3, backend,
+                            path=raw_path if backend == 'memmap' else None,
+                            tile_rows=out_cfg.get('tile_rows', 1024))
+    panorama, panorama_mask = canvas.image, canvas.mask
+    # 接縫：只在接縫附近 band 像素內混合（multiband 已以互不重疊的遮罩累加，不另找接縫）
+    seam_cfg = cfg.get('seam', {})
+    use_seam = seam_cfg.get('enabled', False) and blend_method in ('feather', 'feather_fixed')
+    seam_band = seam_cfg.get('band', 15)
+    if use_seam and blend_method == 'feather':
+        blend_params = dict(blend_params, blur_radius=seam_band)
+    margin, align = blend_context(blend_method, **blend_params)
+    tile_size = blend_cfg.get('tile_size', 512)
+
+    # 每張影像投影外框（含混合所需邊界）
+    warp_Ms, rois = [], []
+    for (h, w), T in zip(shapes, transforms):
+        M = (offset @ T)[:2]
+        x0, y0, x1, y1 = projected_roi(M, w, h, (out_w, out_h), margin)
+        warp_Ms.append(M)
+        x1 = min(out_w, -(-x1 // align) * align)
+        y1 = min(out_h, -(-y1 // align) * align)
+        rois.append((x0 - x0 % align, y0 - y0 % align, x1, y1))
+    canvas.plan(rois)
+
+    # multiband：所有影像累加到各層加權和，最後一次還原
+    # （memmap 後端時各層緩衝也放在輸出資料夾的暫存檔，逐帶還原）
+    accumulator = None
+    if blend_method == 'multiband':
+        accumulator = MultibandAccumulator(
+            out_h, out_w, 3, blend_params.get('num_levels', 5),
+            temp_dir=os.path.dirname(os.path.abspath(raw_path)) if backend == 'memmap' else None,
+            tile_rows=out_cfg.get('tile_rows', 1024))
+
+    # 依序 Warp 與混合，只處理 roi 內的區域；不再被觸及的水平帶立即寫回並釋放
+    # （multiband 需等全部累加後才還原，畫布於最後一次寫出）
+    # 影像依處理順序在背景預先解碼，同時留在記憶體的只有目前這張與預取中的幾張
+    order = range(len(paths))[::-1] if accumulator is not None else range(len(paths))
+    stream = iter_images([paths[idx] for idx in order], prefetch, decode_workers)
+    for idx, (path, img) in zip(order, stream):
+        if img is None:
+            raise IOError(f"無法載入影像: {path}")
+        M, roi = warp_Ms[idx], rois[idx]
+        x0, y0, x1, y1 = roi
+        if x1 > x0 and y1 > y0:
+            warp = warp_image_roi(img, M, roi)
+            if blend_method == 'feather_fixed':
+                # 定點權重圖在來源影像座標系計算（同尺寸共用快取），隨影像一起 warp
+                mask = warp_image_roi(
+                    source_weight_map(img.shape[0], img.shape[1], blend_params.get('blur_radius', 21)),
+                    M, roi
+                )
+            else:
+                mask = warp_image_roi(
+                    np.ones((img.shape[0], img.shape[1]), dtype=np.uint8) * 255,
+                    M, roi
+                )
+            region = panorama_mask[y0:y1, x0:x1]
+            if accumulator is not None:
+                # 反向累加：只取尚未被後面影像覆蓋的部分，等同逐張覆蓋的結果，各遮罩互不重疊
+                accumulator.add(warp, np.where(region > 0, 0, mask).astype(np.uint8), roi)
+                region[...] = np.where(mask > 0, 255, region)
+            elif idx == 0:
+                panorama[y0:y1, x0:x1] = warp
+                region[...] = np.where(mask > 0, 255, 0)
+            else:
+                blend_mask = mask
+                if use_seam:
+                    own = seam_ownership(panorama[y0:y1, x0:x1], warp, region, mask,
+                                         scale=seam_cfg.get('scale', 0.25))
+                    if blend_method == 'feather_fixed':
+                        soft = cv2.GaussianBlur(own, (seam_band, seam_band), 0)
+                        blend_mask = ((mask.astype(np.uint32) * soft + 127) // 255).astype(np.uint16)
+                    else:
+                        blend_mask = own
+                blend_images_tiled(
+                    panorama, warp, blend_mask, roi,
+                    method=blend_method,
+                    tile_size=tile_size,
+                    **blend_params
+                )
+                # 更新 mask
+                region[...] = np.where(mask > 0, 255, region)
+        if accumulator is None:
+            canvas.finish(idx)
+
+    if accumulator is not None:
+        accumulator.collapse(out=panorama)
+        accumulator = None
 
     # 儲存結果
+    canvas.close()
+    if backend == 'memmap':
+        print(f"原始畫布 (.npy, {out_h}x{out_w}x3) 儲存至：{raw_path}")
+        if output_path == raw_path:
+            print(f"拼接完成，結果儲存至：{output_path}")
+            return
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    cv2.imwrite(output_path, panorama)
+    if output_path.endswith('.npy'):
+        np.save(output_path, panorama)
+    else:
+        # 路徑無法寫入時 imwrite 回傳 False，副檔名不支援時丟出 cv2.error
+        try:
+            ok = cv2.imwrite(output_path, panorama)
+        except cv2.error as e:
+            raise IOError(f"無法寫出影像（副檔名不支援）：{output_path}") from e
+        if not ok:
+            raise IOError(f"無法寫出影像：{output_path}")
     print(f"拼接完成，結果儲存至：{output_path}")
 
 
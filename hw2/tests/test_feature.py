@@ -0,0 +1,58 @@
+"""feature.py：特徵快取的寫入與損毀檔案的復原"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from feature import extract_features
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (160, 200, 3), dtype=np.uint8), (5, 5), 0)
+    path = str(tmp_path / 'img.png')
+    cv2.imwrite(path, img)
+    return path
+
+
+def _extract(path, cache_dir):
+    return extract_features([path], 'ORB', {'nfeatures': 200}, workers=1, cache_dir=cache_dir,
+                            as_arrays=True, return_shapes=True)[0]
+
+
+def test_cache_hit_matches_fresh(image_path, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    fresh = _extract(image_path, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    cached = _extract(image_path, cache_dir)
+    assert np.array_equal(fresh[0], cached[0]) and np.array_equal(fresh[1], cached[1])
+    assert cached[2] == (160, 200)
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'garbage', 'empty', 'missing_key'])
+def test_corrupt_cache_is_recomputed(image_path, tmp_path, damage):
+    cache_dir = str(tmp_path / 'cache')
+    fresh = _extract(image_path, cache_dir)
+    (entry,) = os.listdir(cache_dir)
+    entry = os.path.join(cache_dir, entry)
+    if damage == 'truncate':
+        with open(entry, 'r+b') as f:
+            f.truncate(os.path.getsize(entry) // 2)
+    elif damage == 'garbage':
+        with open(entry, 'wb') as f:
+            f.write(b'not a zip file' * 10)
+    elif damage == 'empty':
+        open(entry, 'wb').close()
+    else:
+        np.savez(entry, keypoints=np.zeros((0, 7)))
+
+    recovered = _extract(image_path, cache_dir)
+    assert np.array_equal(fresh[0], recovered[0]) and np.array_equal(fresh[1], recovered[1])
+    # 損毀的項目已被覆寫，且沒有留下暫存檔
+    assert os.listdir(cache_dir) == [os.path.basename(entry)]
+    with np.load(entry) as data:
+        assert np.array_equal(data['keypoints'], fresh[0])
@@ -0,0 +1,85 @@
+"""matcher.py：陣列版 ratio test 與 top-k 與原本 DMatch 列表的結果相同"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from matcher import create_matcher, match_descriptors_array, select_matches
+from transformer import estimate_affine_matches, estimate_affine_transform
+
+
+def _reference(matcher, des1, des2, ratio_test, ratio, top_k):
+    """原本以 knnMatch / match 與 sorted 實作的版本"""
+    if ratio_test:
+        good = [m for m, n in matcher.knnMatch(des1, des2, k=2) if m.distance < ratio * n.distance]
+    else:
+        good = matcher.match(des1, des2)
+    matches = sorted(good, key=lambda x: x.distance)
+    if top_k is not None and len(matches) > top_k:
+        matches = matches[:top_k]
+    return [(m.queryIdx, m.trainIdx, m.distance) for m in matches]
+
+
+def _descriptors(seed, n1=300, n2=350):
+    """des1 的一部分是 des2 翻轉少量位元後的結果，其餘為隨機描述子"""
+    rng = np.random.default_rng(seed)
+    des2 = rng.integers(0, 256, (n2, 32), dtype=np.uint8)
+    des1 = rng.integers(0, 256, (n1, 32), dtype=np.uint8)
+    src = rng.choice(n2, n1 // 2, replace=False)
+    flips = np.packbits(rng.random((n1 // 2, 256)) < 0.05, axis=1)
+    des1[:n1 // 2] = des2[src] ^ flips
+    return des1, des2
+
+
+def _as_tuples(matches):
+    return list(zip(matches.query_idx.tolist(), matches.train_idx.tolist(), matches.distance.tolist()))
+
+
+@pytest.mark.parametrize('ratio_test', [True, False])
+@pytest.mark.parametrize('top_k', [None, 50, 149])
+def test_bf_matches_reference(ratio_test, top_k):
+    des1, des2 = _descriptors(0)
+    matcher = create_matcher('BF', cv2.NORM_HAMMING)
+    got = _as_tuples(match_descriptors_array(matcher, des1, des2, ratio_test, 0.75, top_k))
+    assert got == _reference(matcher, des1, des2, ratio_test, 0.75, top_k)
+
+
+def test_top_k_ties_keep_query_order():
+    idx = np.array([[0, 1], [1, 2], [2, 3], [3, 4], [4, 5]])
+    dist = np.array([[5, 99], [3, 99], [5, 99], [5, 99], [1, 99]], dtype=np.float32)
+    m = select_matches(idx, dist, ratio_test=True, top_k=3)
+    assert m.query_idx.tolist() == [4, 1, 0]
+
+
+def test_missing_second_neighbour_is_dropped():
+    idx = np.array([[0, -1], [1, 2]])
+    dist = np.array([[1, np.inf], [1, 10]], dtype=np.float32)
+    assert select_matches(idx, dist).query_idx.tolist() == [1]
+    assert select_matches(idx, dist, ratio_test=False).query_idx.tolist() == [0, 1]
+
+
+def test_empty_descriptors():
+    matcher = create_matcher('BF', cv2.NORM_HAMMING)
+    m = match_descriptors_array(matcher, np.zeros((0, 32), np.uint8), _descriptors(1)[1])
+    assert len(m.query_idx) == 0
+
+
+def test_array_ransac_matches_keypoint_ransac():
+    rng = np.random.default_rng(3)
+    pts1 = rng.uniform(0, 500, (120, 2)).astype(np.float32)
+    pts2 = (pts1 + [40.0, -7.0]).astype(np.float32)
+    des1, des2 = _descriptors(4, 120, 120)
+    matcher = create_matcher('BF', cv2.NORM_HAMMING)
+    matches = match_descriptors_array(matcher, des1, des2)
+    kp1 = [cv2.KeyPoint(float(x), float(y), 1) for x, y in pts1]
+    kp2 = [cv2.KeyPoint(float(x), float(y), 1) for x, y in pts2]
+    dmatches = [cv2.DMatch(int(q), int(t), float(d)) for q, t, d in _as_tuples(matches)]
+    np.random.seed(5)
+    M_a, mask_a = estimate_affine_matches(pts1, pts2, matches)
+    np.random.seed(5)
+    M_k, mask_k = estimate_affine_transform(kp1, kp2, dmatches)
+    np.testing.assert_array_equal(M_a, M_k)
+    np.testing.assert_array_equal(mask_a, mask_k)
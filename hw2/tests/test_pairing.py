@@ -0,0 +1,113 @@
+"""pairing.py / stitcher.estimate_transforms_graph：匹配圖的建立與全域仿射求解"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import stitcher
+from matcher import Matches
+from pairing import propose_pairs, solve_global_affines
+
+# 各影像相對基準影像（第 0 張）的平移
+OFFSETS = [(0.0, 0.0), (300.0, 10.0), (610.0, -5.0), (900.0, 20.0)]
+
+
+def _affine(dx, dy, angle=0.0):
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, -s, dx], [s, c, dy], [0.0, 0.0, 1.0]])
+
+
+def _dense_solve(n_images, pair_results, reference, scale):
+    """以稠密正規方程求解，作為稀疏版本的對照"""
+    H = np.zeros((3 * n_images, 3 * n_images))
+    for i, j, pts_i, pts_j in pair_results:
+        P_i = np.hstack([pts_i / scale, np.ones((len(pts_i), 1))])
+        P_j = np.hstack([pts_j / scale, np.ones((len(pts_j), 1))])
+        si, sj = slice(3 * i, 3 * i + 3), slice(3 * j, 3 * j + 3)
+        H[si, si] += P_i.T @ P_i
+        H[sj, sj] += P_j.T @ P_j
+        H[si, sj] -= P_i.T @ P_j
+        H[sj, si] -= P_j.T @ P_i
+    X_ref = np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+    unknown = [k for k in range(n_images) if k != reference]
+    cols = np.concatenate([np.arange(3 * k, 3 * k + 3) for k in unknown])
+    ref_cols = np.arange(3 * reference, 3 * reference + 3)
+    X = np.linalg.solve(H[np.ix_(cols, cols)], -H[np.ix_(cols, ref_cols)] @ X_ref)
+    return {k: X[3 * n:3 * n + 3].T for n, k in enumerate(unknown)}
+
+
+def _pair_results(transforms, pairs, seed, noise=0.2):
+    """由各影像到基準座標的真值 transforms 產生帶雜訊的對應點"""
+    rng = np.random.default_rng(seed)
+    results = []
+    for i, j in pairs:
+        world = rng.uniform(0, 400, (40, 2)) + transforms[i][:2, 2]
+        pts = []
+        for k in (i, j):
+            inv = np.linalg.inv(transforms[k])
+            pts.append(world @ inv[:2, :2].T + inv[:2, 2] + rng.normal(0, noise, world.shape))
+        results.append((i, j, pts[0], pts[1]))
+    return results
+
+
+@pytest.mark.parametrize('reference', [0, 2])
+def test_sparse_solve_matches_dense(reference):
+    truth = [_affine(dx, dy, 0.01 * k) for k, (dx, dy) in enumerate(OFFSETS)]
+    pairs = [(0, 1), (1, 2), (2, 3), (0, 2), (1, 3)]
+    results = _pair_results(truth, pairs, seed=reference)
+    transforms = solve_global_affines(len(truth), results, reference, max_points=1000, scale=1000.0)
+    dense = _dense_solve(len(truth), results, reference, 1000.0)
+    np.testing.assert_allclose(transforms[reference], np.eye(3))
+    for k, A in dense.items():
+        np.testing.assert_allclose(transforms[k][:2, :2], A[:, :2], atol=1e-9)
+        np.testing.assert_allclose(transforms[k][:2, 2], A[:, 2] * 1000.0, atol=1e-6)
+    # 以第 0 張為基準時應接近真值
+    if reference == 0:
+        for k, T in enumerate(transforms):
+            np.testing.assert_allclose(T, truth[k], atol=0.5)
+
+
+def test_disconnected_images_are_none():
+    truth = [_affine(dx, dy) for dx, dy in OFFSETS]
+    results = _pair_results(truth, [(0, 1), (2, 3)], seed=1)
+    transforms = solve_global_affines(4, results, 0, scale=1000.0)
+    assert transforms[2] is None and transforms[3] is None
+    np.testing.assert_allclose(transforms[1], truth[1], atol=0.5)
+
+
+def test_propose_pairs_window_only():
+    desc = np.random.default_rng(0).random((5, 16)).astype(np.float32)
+    assert propose_pairs(desc, neighbors=0, window=2) == [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (2, 4), (3, 4)]
+
+
+def test_failing_pair_is_dropped(monkeypatch, capsys):
+    truth = [_affine(dx, dy) for dx, dy in OFFSETS]
+    rng = np.random.default_rng(2)
+    world = rng.uniform(0, 1500, (200, 2))
+    features = []
+    for T in truth:
+        inv = np.linalg.inv(T)
+        features.append((world @ inv[:2, :2].T + inv[:2, 2], None))
+
+    def fake_align_pair(feat_i, feat_j, matcher, match_cfg, ransac_cfg, coarse, norm_type):
+        i = next(k for k, f in enumerate(features) if f is feat_i)
+        j = next(k for k, f in enumerate(features) if f is feat_j)
+        if (i, j) == (0, 1):
+            raise RuntimeError("RANSAC 無法估算出有效模型。")
+        n = len(world)
+        matches = Matches(np.arange(n), np.arange(n), np.zeros(n, dtype=np.float32))
+        return np.eye(3)[:2], matches, np.ones(n, dtype=np.uint8)
+
+    monkeypatch.setattr(stitcher, 'align_pair', fake_align_pair)
+    thumbs = [np.random.default_rng(k).random(16).astype(np.float32) for k in range(4)]
+    shapes = [(400, 400)] * 4
+    transforms = stitcher.estimate_transforms_graph(
+        thumbs, shapes, ['a', 'b', 'c', 'd'], features, lambda: None, {}, {},
+        {'neighbors': 0, 'window': 2, 'min_inliers': 15, 'workers': 2})
+    err = capsys.readouterr().err
+    assert "'a'–'b'" in err
+    # (0,1) 被捨棄後仍經由 (0,2)、(1,2) 連通
+    for k, T in enumerate(transforms):
+        np.testing.assert_allclose(T, truth[k], atol=1e-6)
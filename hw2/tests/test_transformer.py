@@ -0,0 +1,80 @@
+"""transformer.py：批次 RANSAC 與逐次 lstsq 參考實作找出相同的模型與內點"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from transformer import (estimate_affine_ransac, ransac_iterations, solve_affine_batch,
+                         solve_affine_lstsq)
+
+M_TRUE = np.array([[0.98, -0.17, 35.0],
+                   [0.15, 1.02, -12.0]])
+
+
+def _correspondences(n, outlier_ratio, seed, noise=0.3):
+    rng = np.random.default_rng(seed)
+    src = rng.uniform(0, 640, (n, 2))
+    dst = src @ M_TRUE[:, :2].T + M_TRUE[:, 2] + rng.normal(0, noise, (n, 2))
+    outliers = rng.random(n) < outlier_ratio
+    dst[outliers] = rng.uniform(0, 640, (outliers.sum(), 2))
+    return src, dst, ~outliers
+
+
+def test_solve_affine_batch_matches_lstsq():
+    rng = np.random.default_rng(0)
+    src3 = rng.uniform(0, 100, (50, 3, 2))
+    dst3 = rng.uniform(0, 100, (50, 3, 2))
+    M, valid = solve_affine_batch(src3, dst3)
+    assert valid.all()
+    for b in range(50):
+        np.testing.assert_allclose(M[b], solve_affine_lstsq(src3[b], dst3[b]), atol=1e-8)
+
+
+def test_solve_affine_batch_flags_collinear():
+    src3 = np.array([[[0, 0], [1, 1], [2, 2]], [[0, 0], [1, 0], [0, 1]]], dtype=np.float64)
+    _, valid = solve_affine_batch(src3, src3)
+    assert valid.tolist() == [False, True]
+
+
+@pytest.mark.parametrize('outlier_ratio', [0.0, 0.3, 0.6])
+def test_batched_matches_reference(outlier_ratio):
+    src, dst, truth = _correspondences(300, outlier_ratio, seed=int(outlier_ratio * 10))
+    np.random.seed(1)
+    M_b, mask_b = estimate_affine_ransac(src, dst, ransac_thresh=3.0, method='batched')
+    np.random.seed(1)
+    M_r, mask_r = estimate_affine_ransac(src, dst, ransac_thresh=3.0, max_iters=5000, method='reference')
+    np.testing.assert_allclose(M_b, M_TRUE, atol=0.5)
+    np.testing.assert_allclose(M_b, M_r, atol=1e-6)
+    assert np.array_equal(mask_b, mask_r)
+    assert mask_b.dtype == np.uint8
+    # 真正的內點幾乎全被找到，外點不被收入
+    assert mask_b[truth].mean() > 0.98
+    assert not (mask_b.astype(bool) & ~truth).any()
+
+
+def test_adaptive_termination_stops_early(monkeypatch):
+    import transformer
+    src, dst, _ = _correspondences(200, 0.1, seed=3)
+    calls = []
+    original = transformer.solve_affine_batch
+    monkeypatch.setattr(transformer, 'solve_affine_batch',
+                        lambda s, d: calls.append(len(s)) or original(s, d))
+    np.random.seed(2)
+    estimate_affine_ransac(src, dst, max_iters=2000, method='batched')
+    assert sum(calls) < 2000
+
+
+def test_degenerate_input_raises():
+    pts = np.column_stack([np.arange(10.0), np.arange(10.0)])
+    with pytest.raises(RuntimeError):
+        estimate_affine_ransac(pts, pts, method='batched')
+    with pytest.raises(ValueError):
+        estimate_affine_ransac(pts[:2], pts[:2])
+
+
+def test_ransac_iterations():
+    assert ransac_iterations(0.0, 0.99) == np.inf
+    assert ransac_iterations(1.0, 0.99) == 0
+    assert ransac_iterations(0.5, 0.99) > ransac_iterations(0.8, 0.99)
@@ -1,13 +1,147 @@
 import cv2
 import numpy as np
 
-def estimate_affine_ransac(src_pts, dst_pts, ransac_thresh=5.0, max_iters=2000):
+# 批次 RANSAC 每個區塊同時評分的假設數
+RANSAC_BLOCK = 256
+
+
+def solve_affine_lstsq(p_src, p_dst):
+    """
+    以最小二乘求解 p_src → p_dst 的 2x3 仿射矩陣（k>=3 對點）。
+    兩列參數共用同一設計矩陣 [x y 1]，一次求解兩個右式。
+    """
+    A = np.hstack([p_src, np.ones((p_src.shape[0], 1))])   # shape=(k,3)
+    x, *_ = np.linalg.lstsq(A, p_dst, rcond=None)          # shape=(3,2)
+    return x.T
+
+
+def solve_affine_batch(src3, dst3, eps=1e-9):
+    """
+    以封閉解一次求解多組 3 點仿射矩陣。
+
+    參數:
+    - src3, dst3 (ndarray): shape=(B,3,2) 的最小樣本
+
+    回傳:
+    - M (ndarray): shape=(B,2,3)
+    - valid (ndarray): shape=(B,)，三點共線（行列式趨近 0）者為 False
+    """
+    B = src3.shape[0]
+    S = np.concatenate([src3, np.ones((B, 3, 1))], axis=2)  # 每列 [x y 1]
+    r0, r1, r2 = S[:, 0], S[:, 1], S[:, 2]
+    # 3x3 反矩陣 = 伴隨矩陣 / 行列式，伴隨矩陣的各行為列向量的外積
+    c0 = np.cross(r1, r2)
+    c1 = np.cross(r2, r0)
+    c2 = np.cross(r0, r1)
+    det = np.einsum('bi,bi->b', r0, c0)
+    valid = np.abs(det) > eps
+    det = np.where(valid, det, 1.0)
+    S_inv = np.stack([c0, c1, c2], axis=2) / det[:, None, None]
+    # S @ M^T = D → M^T = S^-1 @ D
+    M = np.matmul(S_inv, dst3).transpose(0, 2, 1)
+    return M, valid
+
+
+def ransac_iterations(inlier_ratio, confidence, sample_size=3):
+    """
+    依目前的內點比例與信心水準計算所需的 RANSAC 迭代次數。
+    """
+    if inlier_ratio <= 0:
+        return np.inf
+    if inlier_ratio >= 1:
+        return 0
+    p_good = inlier_ratio ** sample_size
+    return np.log(1 - confidence) / np.log(1 - p_good)
+
+
+def _draw_samples(N, count):
+    """抽出 count 組互不重複的 3 點索引，shape=(count,3)"""
+    idx = np.random.randint(0, N, size=(count, 3))
+    dup = (idx[:, 0] == idx[:, 1]) | (idx[:, 0] == idx[:, 2]) | (idx[:, 1] == idx[:, 2])
+    while dup.any():
+        idx[dup] = np.random.randint(0, N, size=(dup.sum(), 3))
+        dup = (idx[:, 0] == idx[:, 1]) | (idx[:, 0] == idx[:, 2]) | (idx[:, 1] == idx[:, 2])
+    return idx
+
+
+def estimate_affine_ransac_batched(src_pts, dst_pts, ransac_thresh=5.0, max_iters=2000,
+                                   confidence=0.99):
+    """
+    批次 RANSAC：一次抽出所有最小樣本，以封閉解求出 3 點仿射矩陣，
+    並以單次批次矩陣乘法對整個區塊的假設計算內點。
+    每個區塊後依目前最佳內點比例與 confidence 更新所需迭代次數，足夠即停止。
+
+    回傳:
+      M   : (2,3) 仿射矩陣
+      mask: (N,) 內點標記 1/0
+    """
+    N = src_pts.shape[0]
+    if N < 3:
+        raise ValueError("至少需要 3 對點才能估算仿射變換。")
+
+    src = np.asarray(src_pts, dtype=np.float64)
+    dst = np.asarray(dst_pts, dtype=np.float64)
+    src_h = np.hstack([src, np.ones((N, 1))]).T   # shape=(3,N)，只建一次
+    thresh_sq = ransac_thresh * ransac_thresh
+
+    samples = _draw_samples(N, max_iters)
+    best_M = None
+    best_inliers = np.zeros(N, dtype=bool)
+    best_count = 0
+    required = max_iters
+
+    done = 0
+    while done < min(required, max_iters):
+        block = samples[done:done + RANSAC_BLOCK]
+        done += block.shape[0]
+
+        M_cand, valid = solve_affine_batch(src[block], dst[block])
+        if not valid.any():
+            continue
+        M_cand = M_cand[valid]
+
+        # (B,2,3) @ (3,N) → (B,2,N)，一次算出整個區塊的重投影
+        proj = M_cand @ src_h
+        diff = proj - dst.T
+        errs_sq = np.einsum('bkn,bkn->bn', diff, diff)
+        inliers = errs_sq < thresh_sq
+        counts = inliers.sum(axis=1)
+
+        k = int(np.argmax(counts))
+        if counts[k] > best_count:
+            best_count = int(counts[k])
+            best_inliers = inliers[k]
+            best_M = M_cand[k]
+            required = ransac_iterations(best_count / N, confidence)
+
+    if best_M is None:
+        raise RuntimeError("RANSAC 無法估算出有效模型。")
+
+    # 用所有內點再做一次最小二乘擬合以精緻化矩陣
+    best_M = solve_affine_lstsq(src[best_inliers], dst[best_inliers])
+
+    return best_M, best_inliers.astype(np.uint8)
+
+
+def estimate_affine_ransac(src_pts, dst_pts, ransac_thresh=5.0, max_iters=2000,
+                           method='batched', confidence=0.99):
     """
     使用 RANSAC 從 src_pts → dst_pts 估算 2x3 仿射矩陣。
+
+    參數:
+    - method (str): 'batched'（預設，批次封閉解 + 自適應終止）或 'reference'（逐次 lstsq）
+    - confidence (float): batched 模式自適應終止的信心水準
+
     回傳:
       M   : (2,3) 仿射矩陣
       mask: (N,) 內點標記 1/0
     """
+    if method == 'batched':
+        return estimate_affine_ransac_batched(src_pts, dst_pts, ransac_thresh,
+                                              max_iters, confidence)
+    if method != 'reference':
+        raise ValueError(f"Unknown RANSAC method: {method}")
+
     N = src_pts.shape[0]
     if N < 3:
         raise ValueError("至少需要 3 對點才能估算仿射變換。")
@@ -69,7 +203,8 @@ def estimate_affine_ransac(src_pts, dst_pts, ransac_thresh=5.0, max_iters=2000):
     return best_M, best_inliers.astype(np.uint8)
 
 
-def estimate_affine_transform(kp1, kp2, matches, ransac_thresh=5.0, max_iters=2000):
+def estimate_affine_transform(kp1, kp2, matches, ransac_thresh=5.0, max_iters=2000,
+                              method='batched', confidence=0.99):
     """
     根據匹配的關鍵點估算仿射變換矩陣。
 
@@ -79,6 +214,8 @@ def estimate_affine_transform(kp1, kp2, matches, ransac_thresh=5.0, max_iters=20
     - matches (list of cv2.DMatch): 兩影像之間的匹配列表
     - ransac_thresh (float): RANSAC 重投影閾值，預設 5.0
     - max_iters (int): RANSAC 最大迭代次數，預設 2000
+    - method (str): RANSAC 實作，'batched' 或 'reference'
+    - confidence (float): batched 模式自適應終止的信心水準，預設 0.99
 
     回傳:
     - M (ndarray of shape (2,3)): 估算出的仿射矩陣
@@ -103,12 +240,38 @@ def estimate_affine_transform(kp1, kp2, matches, ransac_thresh=5.0, max_iters=20
     dst = dst_pts.reshape(-1, 2)
     M, mask = estimate_affine_ransac(src, dst,
                                     ransac_thresh=ransac_thresh,
-                                    max_iters=max_iters)
+                                    max_iters=max_iters,
+                                    method=method,
+                                    confidence=confidence)
 
     return M, mask
 
 
 
+def estimate_affine_matches(pts1, pts2, matches, ransac_thresh=5.0, max_iters=2000,
+                            method='batched', confidence=0.99):
+    """
+    estimate_affine_transform 的陣列版本：直接以索引取出關鍵點座標。
+
+    參數:
+    - pts1 (ndarray): shape=(N1,2) 參考影像的關鍵點座標
+    - pts2 (ndarray): shape=(N2,2) 待變換影像的關鍵點座標
+    - matches (matcher.Matches): query 對應 pts1、train 對應 pts2
+    - 其餘參數同 estimate_affine_transform
+
+    回傳:
+    - M (ndarray of shape (2,3)): 仿射矩陣（pts2 → pts1）
+    - mask (ndarray): 內點遮罩
+    """
+    src = np.asarray(pts2, dtype=np.float32)[matches.train_idx]
+    dst = np.asarray(pts1, dtype=np.float32)[matches.query_idx]
+    return estimate_affine_ransac(src, dst,
+                                  ransac_thresh=ransac_thresh,
+                                  max_iters=max_iters,
+                                  method=method,
+                                  confidence=confidence)
+
+
 def warp_image(img, M, output_shape, flags=cv2.INTER_LINEAR, border_mode=cv2.BORDER_CONSTANT, border_value=0):
     """
     對影像進行仿射變換。
@@ -135,6 +298,154 @@ def warp_image(img, M, output_shape, flags=cv2.INTER_LINEAR, border_mode=cv2.BOR
     return warped
 
 
+def projected_roi(M, width, height, canvas_size, margin=0):
+    """
+    計算影像四角經仿射變換後在畫布上的外框（含 margin），並裁切到畫布範圍內。
+
+    參數:
+    - M (ndarray of shape (2,3) or (3,3)): 仿射矩陣
+    - width, height (int): 原始影像大小
+    - canvas_size (tuple of int): 畫布 (width, height)
+    - margin (int): 外框四周額外保留的像素數
+
+    回傳:
+    - roi (tuple of int): (x0, y0, x1, y1)，半開區間；若與畫布無交集則寬或高為 0
+    """
+    corners = np.array([[0, 0, 1], [width, 0, 1], [width, height, 1], [0, height, 1]], dtype=np.float64).T
+    proj = np.asarray(M, dtype=np.float64)[:2] @ corners
+    # 多留 1 像素，涵蓋雙線性插值在邊緣產生的部分像素
+    x0 = int(np.floor(proj[0].min())) - 1 - margin
+    y0 = int(np.floor(proj[1].min())) - 1 - margin
+    x1 = int(np.ceil(proj[0].max())) + 1 + margin
+    y1 = int(np.ceil(proj[1].max())) + 1 + margin
+    out_w, out_h = canvas_size
+    x0, x1 = min(max(x0, 0), out_w), min(max(x1, 0), out_w)
+    y0, y1 = min(max(y0, 0), out_h), min(max(y1, 0), out_h)
+    return x0, y0, max(x0, x1), max(y0, y1)
+
+
+def warp_image_roi(img, M, roi, flags=cv2.INTER_LINEAR, border_mode=cv2.BORDER_CONSTANT, border_value=0):
+    """
+    只對畫布上的 roi 區域進行仿射變換。
+
+    將平移項減去 roi 左上角 (x0, y0)，輸出即為全畫布結果中 [y0:y1, x0:x1] 的部分，
+    不必配置整張畫布大小的緩衝。
+
+    參數:
+    - img (ndarray): 輸入影像
+    - M (ndarray of shape (2,3)): 影像到畫布的仿射矩陣
+    - roi (tuple of int): (x0, y0, x1, y1)
+
+    回傳:
+    - warped (ndarray): shape 為 (y1-y0, x1-x0, ...) 的影像
+    """
+    x0, y0, x1, y1 = roi
+    M_roi = np.array(M[:2], dtype=np.float64)
+    M_roi[:, 2] -= (x0, y0)
+    return warp_image(img, M_roi, (x1 - x0, y1 - y0), flags, border_mode, border_value)
+
+
+def _gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def _subpixel_peak(score, x, y):
+    """以拋物線擬合修正相關峰值位置（邊界上的峰值不修正）"""
+    dx = dy = 0.0
+    if 0 < x < score.shape[1] - 1:
+        l, c, r = score[y, x - 1], score[y, x], score[y, x + 1]
+        denom = l - 2 * c + r
+        if denom < 0:
+            dx = 0.5 * (l - r) / denom
+    if 0 < y < score.shape[0] - 1:
+        t, c, b = score[y - 1, x], score[y, x], score[y + 1, x]
+        denom = t - 2 * c + b
+        if denom < 0:
+            dy = 0.5 * (t - b) / denom
+    return x + dx, y + dy
+
+
+def refine_affine_patches(img_ref, img_mov, M, patch=64, search=8, max_patches=16, min_score=0.7):
+    """
+    以原解析度的局部區塊修正仿射矩陣（例如由縮小影像估得者）。
+
+    在 img_mov 挑選紋理最強、且依 M 映射後完整落在 img_ref 內的區塊，
+    將區塊依 M warp 到 img_ref 座標後，在預測位置 ±search 像素內以
+    cv2.matchTemplate（正規化相關）搜尋，峰值以拋物線擬合到次像素。
+    位移與中位數相差 2 像素以上者視為離群；剩餘區塊 ≥ 6 個且在兩個方向都分布超過
+    影像一半時，以最小二乘重新擬合仿射，否則（例如重疊區只是一條窄帶）只修正平移，
+    避免少量集中的區塊外插出錯誤的旋轉與縮放。
+
+    參數:
+    - img_ref, img_mov (ndarray): 原解析度影像（BGR 或灰階）
+    - M (ndarray of shape (2,3)): img_mov → img_ref 的仿射矩陣
+    - patch (int): 區塊邊長
+    - search (int): 搜尋半徑（像素），應不小於縮小估算的誤差（約 1 / proxy_scale）
+    - max_patches (int): 最多使用的區塊數
+    - min_score (float): 相關係數門檻
+
+    回傳:
+    - M_refined (ndarray of shape (2,3)): 可用區塊不足時回傳原本的 M
+    - n_used (int): 採用的區塊數
+    """
+    M = np.asarray(M, dtype=np.float64)[:2]
+    ref, mov = _gray(img_ref), _gray(img_mov)
+    h_ref, w_ref = ref.shape[:2]
+    h_mov, w_mov = mov.shape[:2]
+    half = patch // 2
+
+    # 候選區塊中心：img_mov 上的格點，映射後連同搜尋範圍須落在 img_ref 內
+    ys, xs = np.mgrid[half:h_mov - half:patch, half:w_mov - half:patch]
+    centers = np.stack([xs.ravel(), ys.ravel()], axis=1).astype(np.float64)
+    if len(centers) == 0:
+        return M, 0
+    mapped = centers @ M[:, :2].T + M[:, 2]
+    pad = half + search + 1
+    inside = ((mapped[:, 0] >= pad) & (mapped[:, 0] < w_ref - pad) &
+              (mapped[:, 1] >= pad) & (mapped[:, 1] < h_ref - pad))
+    centers, mapped = centers[inside], mapped[inside]
+    if len(centers) == 0:
+        return M, 0
+
+    # 依區塊內梯度能量挑選紋理最強者
+    gx = cv2.Sobel(mov, cv2.CV_32F, 1, 0)
+    gy = cv2.Sobel(mov, cv2.CV_32F, 0, 1)
+    energy = cv2.boxFilter(gx * gx + gy * gy, -1, (patch, patch), normalize=True)
+    strength = energy[centers[:, 1].astype(int), centers[:, 0].astype(int)]
+    order = np.argsort(-strength, kind='stable')[:max_patches]
+
+    src, dst = [], []
+    for k in order:
+        # 區塊左上角對齊到整數像素，warp 時把該點平移到原點
+        tx, ty = int(round(mapped[k, 0])) - half, int(round(mapped[k, 1])) - half
+        A = M.copy()
+        A[:, 2] -= (tx, ty)
+        template = cv2.warpAffine(mov, A, (patch, patch), flags=cv2.INTER_LINEAR)
+        window = ref[ty - search:ty + patch + search, tx - search:tx + patch + search]
+        score = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, peak, _, (px, py) = cv2.minMaxLoc(score)
+        if not np.isfinite(peak) or peak < min_score:
+            continue
+        px, py = _subpixel_peak(score, px, py)
+        src.append(centers[k])
+        dst.append(mapped[k] + (px - search, py - search))
+    if not src:
+        return M, 0
+
+    src, dst = np.array(src), np.array(dst)
+    shift = dst - (src @ M[:, :2].T + M[:, 2])
+    keep = np.linalg.norm(shift - np.median(shift, axis=0), axis=1) < 2.0
+    src, dst, shift = src[keep], dst[keep], shift[keep]
+    if len(src) == 0:
+        return M, 0
+    spread = np.ptp(src, axis=0)
+    if len(src) >= 6 and spread[0] >= 0.5 * w_mov and spread[1] >= 0.5 * h_mov:
+        return solve_affine_lstsq(src, dst), len(src)
+    refined = M.copy()
+    refined[:, 2] += np.median(shift, axis=0)
+    return refined, len(src)
+
+
 def compose_transforms(transforms):
     """
     將多個仿射矩陣依序相乘，生成合成矩陣。
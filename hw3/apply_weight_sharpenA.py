@@ -28,8 +28,11 @@ apply_weight_sharpenA.py
 """
 import sys
 import argparse
+import numpy as np
 from PIL import Image
 
+from image_io import open_image, save_image
+
 def parse_args():
     parser = argparse.ArgumentParser(description="融合一階邊緣權重與二階銳化影像")
     parser.add_argument('--original', required=True, help='原始彩色影像')
@@ -40,9 +43,9 @@ def parse_args():
 
 def load_images(orig_path, sharp_path, weight_path):
     # 讀取影像
-    orig = Image.open(orig_path).convert('RGB')
-    sharp = Image.open(sharp_path).convert('RGB')
-    wmap = Image.open(weight_path).convert('L')
+    orig = open_image(orig_path, 'RGB')
+    sharp = open_image(sharp_path, 'RGB')
+    wmap = open_image(weight_path, 'L')
     if orig.size != sharp.size or orig.size != wmap.size:
         raise ValueError('三張影像尺寸必須相同')
     return orig, sharp, wmap
@@ -74,11 +77,25 @@ def apply_weight_fusion(orig, sharp, wmap):
     return result
 
 
+def apply_weight_fusion_array(orig: np.ndarray, sharp: np.ndarray, wmap: np.ndarray, out=None):
+    """
+    NumPy 版：orig, sharp 為 (H, W, 3) uint8，wmap 為 (H, W) uint8 權重圖
+    result = orig * (1 - w) + sharp * w，w = wmap / 255.0（取整數部分）
+    out: 可重複使用的 (H, W, 3) uint8 輸出緩衝
+    """
+    w_val = (wmap / 255.0)[:, :, np.newaxis]
+    fused = orig * (1 - w_val)
+    fused += sharp * w_val
+    if out is None:
+        return fused.astype(np.uint8)
+    np.copyto(out, fused, casting='unsafe')
+    return out
+
 def main():
     args = parse_args()
     orig, sharp, wmap = load_images(args.original, args.sharpen, args.weight)
     result = apply_weight_fusion(orig, sharp, wmap)
-    result.save(args.output, format='PNG', quality=95)
+    save_image(result, args.output, format='PNG', quality=95)
     print(f'已完成加權融合，結果存為：{args.output}')
 
 if __name__ == '__main__':
@@ -31,9 +31,10 @@ apply_weight_sharpenB.py
 """
 import sys
 import argparse
+import numpy as np
 from PIL import Image
 
-print("TEst")
+from image_io import open_image, save_image
 
 def parse_args():
     parser = argparse.ArgumentParser(description="融合一階權重與二階邊緣圖 (resultB)")
@@ -45,9 +46,9 @@ def parse_args():
     return parser.parse_args()
 
 def load_images(orig_path, edge2_path, weight_path):
-    orig = Image.open(orig_path).convert('RGB')
-    edge2 = Image.open(edge2_path).convert('L')
-    weight = Image.open(weight_path).convert('L')
+    orig = open_image(orig_path, 'RGB')
+    edge2 = open_image(edge2_path, 'L')
+    weight = open_image(weight_path, 'L')
     if orig.size != edge2.size or orig.size != weight.size:
         raise ValueError('三張影像尺寸必須相同')
     return orig, edge2, weight
@@ -75,12 +76,26 @@ def apply_resultB(orig, edge2, weight, gamma):
 
     return result
 
+def apply_resultB_array(orig: np.ndarray, edge2: np.ndarray, weight: np.ndarray, gamma, out=None):
+    """
+    NumPy 版：orig 為 (H, W, 3) uint8，edge2、weight 為 (H, W) uint8
+    delta = int(gamma * w * e)，加回原圖並限制於 0~255
+    out: 可重複使用的 (H, W, 3) uint8 輸出緩衝
+    """
+    delta = np.trunc(gamma * (weight / 255.0) * edge2).astype(np.int32)
+    result = orig + delta[:, :, np.newaxis]
+    np.clip(result, 0, 255, out=result)
+    if out is None:
+        return result.astype(np.uint8)
+    np.copyto(out, result, casting='unsafe')
+    return out
+
 def main():
     print("Starting...")
     args = parse_args()
     orig, edge2, weight = load_images(args.original, args.edge2, args.weight)
     result = apply_resultB(orig, edge2, weight, args.gamma)
-    result.save(args.output, format='PNG', quality=95)
+    save_image(result, args.output, format='PNG', quality=95)
     print(f"已完成 resultB 融合，輸出：{args.output} (gamma={args.gamma})")
 
 if __name__ == '__main__':
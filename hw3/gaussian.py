@@ -7,18 +7,24 @@ gaussian.py
   1. 讀取一張 JPEG 影像（使用 Pillow）
   2. 以純 Python 生成 Gaussian kernel
   3. 對影像做卷積模糊（RGB 三通道）
+     - numpy 模式（預設）：邊界複製填充 + 位移切片累加，
+       kernel 可分離時改用兩次 1D 卷積（每像素 k² → 2k 次乘加）
+     - python 模式：原始四層迴圈實作，作為對照用的參考結果
   4. 將結果輸出為 JPEG
 
 使用：
-  pip install pillow
-  python gaussian.py input.jpg output.jpg --ksize 5 --sigma 1.0
+  pip install pillow numpy
+  python gaussian.py input.jpg output.jpg --ksize 5 --sigma 1.0 [--mode numpy|python]
   python gaussian.py /Users/young/Documents/nchu-2025-spring/DIP/hw3/output/edge1.png /Users/young/Documents/nchu-2025-spring/DIP/hw3/output/smooth1.png --ksize 5 --sigma 1.0
 """
 
 import sys
 import math
+import numpy as np
 from PIL import Image
 
+from image_io import open_image, save_image
+
 def make_gaussian_kernel(ksize: int, sigma: float):
     """
     生成 ksize×ksize 的 Gaussian kernel
@@ -45,9 +51,92 @@ def make_gaussian_kernel(ksize: int, sigma: float):
 
     return kernel
 
-def apply_gaussian(img: Image.Image, kernel):
+def split_separable_kernel(kernel, tol=1e-12):
+    """
+    檢查 2D kernel 是否可分離（秩為 1）
+    可分離時回傳 (col, row) 兩個 1D 權重，使 kernel[i][j] == col[i] * row[j]
+    否則回傳 None
+    """
+    k = np.asarray(kernel, dtype=np.float64)
+    total = k.sum()
+    if total == 0:
+        return None
+    col = k.sum(axis=1)
+    row = k.sum(axis=0) / total
+    if not np.allclose(np.outer(col, row), k, rtol=0.0, atol=tol):
+        return None
+    return col, row
+
+def _correlate_axis(arr, weights, axis):
+    """
+    沿單一軸做 1D 卷積（arr 已於該軸兩側各填充 len(weights)//2）
+    以位移切片累加，不做逐像素迴圈
+    """
+    ksize = len(weights)
+    n = arr.shape[axis] - (ksize - 1)
+    out = None
+    for t, weight in enumerate(weights):
+        index = [slice(None)] * arr.ndim
+        index[axis] = slice(t, t + n)
+        term = arr[tuple(index)] * weight
+        if out is None:
+            out = term
+        else:
+            out += term
+    return out
+
+def gaussian_blur_array(arr: np.ndarray, kernel, separable=None):
+    """
+    對 (H, W) 或 (H, W, C) 的 uint8 陣列做 Gaussian 卷積
+    邊界處理與純 Python 版相同（clamp 到邊緣），輸出四捨五入並限制 0~255
+    separable: None 表示自動偵測；True/False 強制使用或不使用 1D 分離卷積
+    回傳同尺寸的 uint8 陣列
+    """
+    ksize = len(kernel)
+    pad = ksize // 2
+    pad_width = [(pad, pad), (pad, pad)] + [(0, 0)] * (arr.ndim - 2)
+    padded = np.pad(arr.astype(np.float64), pad_width, mode='edge')
+
+    parts = split_separable_kernel(kernel) if separable is not False else None
+    if separable and parts is None:
+        raise ValueError("kernel 不可分離")
+
+    if parts is not None:
+        # 先垂直再水平：每像素 2k 次乘加
+        col, row = parts
+        acc = _correlate_axis(padded, col, axis=0)
+        acc = _correlate_axis(acc, row, axis=1)
+    else:
+        h, w = arr.shape[:2]
+        acc = np.zeros(padded[pad:pad + h, pad:pad + w].shape, dtype=np.float64)
+        for dy in range(ksize):
+            for dx in range(ksize):
+                weight = kernel[dy][dx]
+                if weight == 0:
+                    continue
+                acc += padded[dy:dy + h, dx:dx + w] * weight
+
+    # 四捨五入並限制 0~255（與 int(v + 0.5) 相同）
+    np.floor(acc + 0.5, out=acc)
+    np.clip(acc, 0, 255, out=acc)
+    return acc.astype(np.uint8)
+
+def apply_gaussian(img: Image.Image, kernel, mode='numpy'):
     """
     對 PIL RGB 影像做 Gaussian 卷積
+    mode: 'numpy'（預設，向量化）或 'python'（純 Python 參考實作）
+    回傳新的 PIL Image
+    """
+    if mode == 'python':
+        return apply_gaussian_reference(img, kernel)
+    if mode != 'numpy':
+        raise ValueError(f"未知的 mode：{mode}")
+    arr = np.asarray(img.convert('RGB'))
+    return Image.fromarray(gaussian_blur_array(arr, kernel), mode='RGB')
+
+def apply_gaussian_reference(img: Image.Image, kernel):
+    """
+    對 PIL RGB 影像做 Gaussian 卷積（純 Python 四層迴圈，作為對照組）
     回傳新的 PIL Image
     """
     w, h = img.size
@@ -83,7 +172,7 @@ def apply_gaussian(img: Image.Image, kernel):
 
 def main():
     if len(sys.argv) < 3:
-        print(f"用法：python {sys.argv[0]} input.jpg output.jpg [--ksize N] [--sigma S]")
+        print(f"用法：python {sys.argv[0]} input.jpg output.jpg [--ksize N] [--sigma S] [--mode numpy|python]")
         sys.exit(1)
 
     in_path  = sys.argv[1]
@@ -92,6 +181,7 @@ def main():
     # 預設參數
     ksize = 5
     sigma = 1.0
+    mode = 'numpy'
 
     # 簡單參數解析
     args = sys.argv[3:]
@@ -101,22 +191,28 @@ def main():
     if '--sigma' in args:
         idx = args.index('--sigma')
         sigma = float(args[idx+1])
+    if '--mode' in args:
+        idx = args.index('--mode')
+        mode = args[idx+1]
 
     if ksize % 2 == 0:
         print("錯誤：ksize 必須為奇數")
         sys.exit(1)
+    if mode not in ('numpy', 'python'):
+        print("錯誤：mode 必須為 numpy 或 python")
+        sys.exit(1)
 
     # 1. 讀影像並轉 RGB
-    img = Image.open(in_path).convert('RGB')
+    img = open_image(in_path, 'RGB')
 
     # 2. 生成 Gaussian kernel
     kernel = make_gaussian_kernel(ksize, sigma)
 
     # 3. 應用高斯模糊
-    blurred = apply_gaussian(img, kernel)
+    blurred = apply_gaussian(img, kernel, mode=mode)
 
     # 4. 存檔
-    blurred.save(out_path, format='JPEG')
+    save_image(blurred, out_path, format='JPEG')
     print(f"已完成高斯模糊，結果存為：{out_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+image_io.py
+
+功能：
+  hw3 各程式共用的影像讀寫。
+  .pgm / .ppm（二進位 P5/P6）經由專案根目錄的 netpbm.py 以 np.memmap 直接映射，
+  不解碼也不複製，可在各步驟之間傳遞未壓縮的中間結果；其他格式照舊交給 Pillow。
+"""
+import os
+import sys
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from netpbm import is_netpbm, read_netpbm, write_netpbm
+
+def _mapped(path: str, mode: str):
+    """二進位 8 位元 PGM/PPM 且通道數與 mode 相符時回傳 memmap，否則回傳 None"""
+    if not is_netpbm(path):
+        return None
+    try:
+        arr = read_netpbm(path)
+    except ValueError:
+        return None
+    if arr.dtype != np.uint8 or (arr.ndim == 2) != (mode == 'L'):
+        return None
+    return arr
+
+def load_array(path: str, mode: str = 'RGB'):
+    """
+    讀取影像為 uint8 陣列：mode 'RGB' 為 (H, W, 3)、'L' 為 (H, W)
+    二進位 PGM/PPM 且通道數相符時回傳唯讀 memmap
+    """
+    arr = _mapped(path, mode)
+    if arr is not None:
+        return arr
+    with Image.open(path) as im:
+        return np.asarray(im.convert(mode))
+
+def open_image(path: str, mode: str = 'RGB'):
+    """
+    讀取影像為 Pillow Image（mode 'RGB' 或 'L'）
+    二進位 PGM/PPM 且通道數相符時，Image 直接共用 memmap 的記憶體（唯讀）
+    """
+    arr = _mapped(path, mode)
+    if arr is not None:
+        h, w = arr.shape[:2]
+        return Image.frombuffer(mode, (w, h), arr, 'raw', mode, 0, 1)
+    return Image.open(path).convert(mode)
+
+def save_array(arr: np.ndarray, path: str, format: str = None, **params):
+    """
+    儲存 uint8 陣列；副檔名為 .pgm / .ppm 時寫成二進位 P5/P6，
+    否則以 Pillow 依 format（及 quality 等參數）編碼
+    """
+    if is_netpbm(path):
+        write_netpbm(path, arr)
+    else:
+        Image.fromarray(np.asarray(arr)).save(path, format=format, **params)
+
+def save_image(img, path: str, format: str = None, **params):
+    """儲存 Pillow Image；規則同 save_array"""
+    if is_netpbm(path):
+        write_netpbm(path, np.asarray(img))
+    else:
+        img.save(path, format=format, **params)
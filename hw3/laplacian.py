@@ -15,8 +15,11 @@ laplacian.py
 """
 
 import sys
+import numpy as np
 from PIL import Image
 
+from image_io import open_image, save_image
+
 # 3×3 Laplacian 四鄰域 Mask
 LAPLACIAN_KERNEL = [
     [ 0,  1,  0],
@@ -60,6 +63,37 @@ def laplacian_edge_detection(pixels, w, h, maxval=255):
             out[y][x] = min(maxval, val)
     return out
 
+def laplacian_array(gray: np.ndarray, maxval=255, normalize=True, out=None):
+    """
+    NumPy 版 Laplacian：gray 為 (H, W) 灰階陣列
+    結果與 laplacian_edge_detection + normalize_to_255 相同（邊界一像素為 0）
+    out: 可重複使用的 (H, W) uint8 輸出緩衝
+    回傳 (H, W) uint8 邊緣強度
+    """
+    p = gray.astype(np.int32)
+    h, w = p.shape
+    if out is None:
+        out = np.zeros((h, w), dtype=np.uint8)
+    else:
+        out.fill(0)
+    if h < 3 or w < 3:
+        return out
+
+    # 四鄰域：上 + 下 + 左 + 右 - 4×中心
+    s = p[:-2, 1:-1] + p[2:, 1:-1]
+    s += p[1:-1, :-2]
+    s += p[1:-1, 2:]
+    s -= 4 * p[1:-1, 1:-1]
+    np.abs(s, out=s)
+    np.minimum(s, maxval, out=s)
+
+    M = s.max()
+    if normalize and M != 0:
+        out[1:-1, 1:-1] = (s / M * 255).astype(np.uint8)
+    else:
+        out[1:-1, 1:-1] = s
+    return out
+
 def pixels_to_image(pixels, w, h):
     """把 2D list 轉回 Pillow 灰階 Image"""
     img = Image.new('L', (w, h))
@@ -76,7 +110,7 @@ def main():
     in_path, out_path = sys.argv[1], sys.argv[2]
 
     # 1. 讀影像並轉灰階
-    img = Image.open(in_path).convert('L')
+    img = open_image(in_path, 'L')
     w, h = img.size
 
     # 2. 灰階圖 → 2D list
@@ -91,7 +125,7 @@ def main():
     edge_img = pixels_to_image(edges, w, h)
 
     # 5. 存成 JPEG
-    edge_img.save(out_path, format='JPEG', quality=95)
+    save_image(edge_img, out_path, format='JPEG', quality=95)
     print(f"Laplacian 邊緣偵測完成，結果存為：{out_path}")
 
 if __name__ == '__main__':
@@ -21,8 +21,11 @@ laplacian_add.py
 """
 import sys
 import argparse
+import numpy as np
 from PIL import Image
 
+from image_io import open_image, save_image
+
 def parse_args():
     parser = argparse.ArgumentParser(description="將原圖與二階邊緣圖相加，生成銳化影像")
     parser.add_argument('--original', required=True, help='原始彩色影像路徑')
@@ -32,8 +35,8 @@ def parse_args():
 
 def load_images(orig_path, edge2_path):
     # 讀取原圖與邊緣圖
-    orig = Image.open(orig_path).convert('RGB')
-    edge = Image.open(edge2_path).convert('L')
+    orig = open_image(orig_path, 'RGB')
+    edge = open_image(edge2_path, 'L')
     if orig.size != edge.size:
         raise ValueError('原始影像和邊緣圖尺寸必須相同')
     return orig, edge
@@ -58,11 +61,24 @@ def add_laplacian(orig, edge):
             res_pix[x, y] = (nr, ng, nb)
     return result
 
+def add_laplacian_array(orig: np.ndarray, edge: np.ndarray, out=None):
+    """
+    NumPy 版：orig 為 (H, W, 3) uint8，edge 為 (H, W) uint8
+    以飽和加法 orig + min(edge, 255 - orig) 計算，全程不產生 int 暫存
+    out: 可重複使用的 (H, W, 3) uint8 輸出緩衝
+    """
+    if out is None:
+        out = np.empty_like(orig)
+    np.subtract(255, orig, out=out)
+    np.minimum(out, edge[:, :, np.newaxis], out=out)
+    np.add(out, orig, out=out)
+    return out
+
 def main():
     args = parse_args()
     orig, edge = load_images(args.original, args.edge2)
     result = add_laplacian(orig, edge)
-    result.save(args.output, format='JPEG', quality=95)
+    save_image(result, args.output, format='JPEG', quality=95)
     print(f'已輸出二階邊緣銳化影像：{args.output}')
 
 if __name__ == '__main__':
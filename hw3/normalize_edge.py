@@ -23,8 +23,11 @@ normalize_edge.py
   2D list of floats in [0.0,1.0]
 """
 import sys
+import numpy as np
 from PIL import Image
 
+from image_io import open_image, save_image
+
 def normalize_edge_map(input_path, output_path=None, threshold=0.0):
     """
     讀入灰階邊緣圖，做 min-max 正規化到 [0.0,1.0]，
@@ -33,7 +36,7 @@ def normalize_edge_map(input_path, output_path=None, threshold=0.0):
     回傳正規化的 2D list。
     """
     # 讀取並轉灰階
-    img = Image.open(input_path).convert('L')
+    img = open_image(input_path, 'L')
     w, h = img.size
     pix = img.load()
 
@@ -51,7 +54,7 @@ def normalize_edge_map(input_path, output_path=None, threshold=0.0):
 
     # 全圖相同 or 無輸出需求
     if denom == 0 and output_path:
-        Image.new('L', (w, h)).save(output_path)
+        save_image(Image.new('L', (w, h)), output_path)
         print(f"門檻化後全圖為零，已存全黑圖：{output_path}")
         return weight_map
     elif denom == 0:
@@ -76,11 +79,36 @@ def normalize_edge_map(input_path, output_path=None, threshold=0.0):
 
     # 儲存顯示影像
     if output_path:
-        out_img.save(output_path, format='PNG')
+        save_image(out_img, output_path, format='PNG')
         print(f"已存權重圖 (0~255) 到：{output_path}, threshold={threshold}")
 
     return weight_map
 
+def normalize_edge_array(edge: np.ndarray, threshold=0.0):
+    """
+    NumPy 版：edge 為 (H, W) 灰階邊緣陣列
+    做 min-max 正規化到 [0.0,1.0] 並移除小於 threshold 的弱邊緣
+    回傳 float64 權重矩陣（全圖相同時為全 0）
+    """
+    minv = int(edge.min())
+    maxv = int(edge.max())
+    denom = maxv - minv
+    if denom == 0:
+        return np.zeros(edge.shape, dtype=np.float64)
+    weight = (edge - np.float64(minv)) / denom
+    weight[weight < threshold] = 0.0
+    return weight
+
+def weight_to_uint8(weight: np.ndarray, out=None):
+    """
+    將 [0,1] 權重矩陣轉為顯示用 0~255 灰階（與 normalize_edge_map 存檔相同的四捨五入）
+    """
+    scaled = weight * 255 + 0.5
+    if out is None:
+        return scaled.astype(np.uint8)
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print(f"用法: python {sys.argv[0]} input_edge.png [output_weight.png] [threshold]")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pipeline.py
+
+功能：
+  將 hw3 的整條銳化流程在記憶體中一次跑完，不再把中間結果寫回磁碟：
+    sobel → gaussian → normalize_edge → laplacian → laplacian_add
+          → apply_weight_sharpenA / apply_weight_sharpenB
+  每個步驟都是 NumPy 陣列進、陣列出，階段之間重複使用輸出緩衝，
+  只有最終結果（resultA、resultB）與使用者指定的中間結果會被編碼存檔。
+
+使用：
+  pip install pillow numpy
+  python pipeline.py input.png output_dir [--ksize 5] [--sigma 1.0]
+                     [--threshold 0.0] [--gamma 1.0] [--save edge1 smooth1 ...]
+
+  python pipeline.py /Users/young/Documents/nchu-2025-spring/DIP/hw3/input/img.png /Users/young/Documents/nchu-2025-spring/DIP/hw3/output --threshold 0.2 --save edge1 edge2 weight
+
+參數：
+  input        原始彩色影像路徑（二進位 .ppm 直接映射，不解碼）
+  output_dir   輸出資料夾，結果存為 <名稱>.png
+  --ksize      Gaussian kernel 大小（奇數，預設 5）
+  --sigma      Gaussian 標準差（預設 1.0）
+  --threshold  權重圖門檻 (0.0~1.0，預設 0.0)
+  --gamma      resultB 邊緣加回強度（預設 1.0）
+  --save       額外要存檔的中間結果：edge1 smooth1 weight edge2 sharp2
+  --format     png（預設）或 netpbm（灰階 .pgm、彩色 .ppm，不壓縮）
+"""
+import os
+import argparse
+import numpy as np
+
+from image_io import load_array, save_array
+from sobel import sobel_gradients
+from gaussian import make_gaussian_kernel, gaussian_blur_array
+from normalize_edge import normalize_edge_array, weight_to_uint8
+from laplacian import laplacian_array
+from laplacian_add import add_laplacian_array
+from apply_weight_sharpenA import apply_weight_fusion_array
+from apply_weight_sharpenB import apply_resultB_array
+
+# 可額外輸出的中間結果
+INTERMEDIATES = ('edge1', 'smooth1', 'weight', 'edge2', 'sharp2')
+
+# 輸出格式：png，或 netpbm（灰階存 .pgm、彩色存 .ppm，不壓縮，可直接映射給下一階段）
+FORMATS = ('png', 'netpbm')
+
+def rgb_to_gray(rgb: np.ndarray, out=None):
+    """
+    RGB → 灰階，與 Pillow convert('L') 相同的定點公式：
+      L = (R*19595 + G*38470 + B*7471 + 0x8000) >> 16
+    """
+    acc = rgb[:, :, 0] * np.uint32(19595)
+    acc += rgb[:, :, 1] * np.uint32(38470)
+    acc += rgb[:, :, 2] * np.uint32(7471)
+    acc += 0x8000
+    acc >>= 16
+    if out is None:
+        return acc.astype(np.uint8)
+    np.copyto(out, acc, casting='unsafe')
+    return out
+
+def run_sharpen_pipeline(orig: np.ndarray, ksize=5, sigma=1.0, threshold=0.0,
+                         gamma=1.0, keep=()):
+    """
+    對 (H, W, 3) uint8 RGB 影像執行完整銳化流程
+    keep: 要一併回傳的中間結果名稱（見 INTERMEDIATES）
+    回傳 dict：固定包含 'resultA'、'resultB'，以及 keep 指定的中間結果
+    """
+    unknown = set(keep) - set(INTERMEDIATES)
+    if unknown:
+        raise ValueError(f"未知的中間結果：{sorted(unknown)}")
+    if ksize % 2 == 0:
+        raise ValueError("ksize 必須為奇數")
+
+    h, w = orig.shape[:2]
+    results = {}
+
+    # 灰階緩衝：sobel 與 laplacian 共用
+    gray = rgb_to_gray(orig)
+
+    # 1. 一階邊緣 (edge1)
+    edge1 = sobel_gradients(gray, maxval=255)
+    if 'edge1' in keep:
+        results['edge1'] = edge1
+
+    # 2. 平滑 (smooth1)
+    smooth1 = gaussian_blur_array(edge1, make_gaussian_kernel(ksize, sigma))
+    if 'smooth1' in keep:
+        results['smooth1'] = smooth1
+
+    # 3. 權重圖 (weight)，不需保留 edge1 時直接覆寫它的緩衝
+    weight_buf = None if 'edge1' in keep else edge1
+    weight = weight_to_uint8(normalize_edge_array(smooth1, threshold), out=weight_buf)
+    if 'weight' in keep:
+        results['weight'] = weight
+
+    # 4. 二階邊緣 (edge2)，不需保留 smooth1 時沿用它的緩衝
+    edge2_buf = None if 'smooth1' in keep else smooth1
+    edge2 = laplacian_array(gray, maxval=255, out=edge2_buf)
+    if 'edge2' in keep:
+        results['edge2'] = edge2
+
+    # 5. 二階銳化 (sharp2)
+    sharp2 = add_laplacian_array(orig, edge2)
+    if 'sharp2' in keep:
+        results['sharp2'] = sharp2
+
+    # 6. resultA
+    results['resultA'] = apply_weight_fusion_array(orig, sharp2, weight)
+
+    # 7. resultB，不需保留 sharp2 時寫回它的緩衝
+    result_b_buf = None if 'sharp2' in keep else sharp2
+    results['resultB'] = apply_resultB_array(orig, edge2, weight, gamma, out=result_b_buf)
+
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="hw3 銳化流程（記憶體內一次完成）")
+    parser.add_argument('input', help='原始彩色影像')
+    parser.add_argument('output_dir', help='輸出資料夾')
+    parser.add_argument('--ksize', type=int, default=5, help='Gaussian kernel 大小 (奇數，預設 5)')
+    parser.add_argument('--sigma', type=float, default=1.0, help='Gaussian 標準差 (預設 1.0)')
+    parser.add_argument('--threshold', type=float, default=0.0, help='權重圖門檻 (預設 0.0)')
+    parser.add_argument('--gamma', type=float, default=1.0, help='resultB 邊緣加回強度 (預設 1.0)')
+    parser.add_argument('--save', nargs='*', default=[], choices=INTERMEDIATES,
+                        help='額外存檔的中間結果')
+    parser.add_argument('--format', choices=FORMATS, default='png',
+                        help='輸出格式 (預設 png；netpbm 輸出 .pgm/.ppm)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.ksize % 2 == 0:
+        raise SystemExit("錯誤：ksize 必須為奇數")
+
+    orig = load_array(args.input, 'RGB')
+    results = run_sharpen_pipeline(
+        orig, ksize=args.ksize, sigma=args.sigma,
+        threshold=args.threshold, gamma=args.gamma, keep=args.save
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, arr in results.items():
+        if args.format == 'netpbm':
+            ext = 'pgm' if arr.ndim == 2 else 'ppm'
+        else:
+            ext = 'png'
+        out_path = os.path.join(args.output_dir, f'{name}.{ext}')
+        save_array(arr, out_path, format='PNG')
+        print(f'已存 {name}：{out_path}')
+
+if __name__ == '__main__':
+    main()
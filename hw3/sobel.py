@@ -8,14 +8,19 @@ python sobel.py /Users/young/Documents/nchu-2025-spring/DIP/hw3/input/img.png /U
 
 功能：
 1. 用 Pillow 讀入任意影像檔 (jpg/png/pgm...)
-2. 純 Python 實作 Sobel 邊緣偵測
+2. Sobel 邊緣偵測
+   - sobel_gradients：NumPy 陣列進出，一次計算 Gx/Gy（可同時回傳幅值與方向）
+   - sobel_edge_detection：純 Python 2D list 版本，作為對照用的參考實作
 3. 輸出為 JPEG（quality 可自訂）
 """
 
 import sys
 import math
+import numpy as np
 from PIL import Image
 
+from image_io import load_array, save_array
+
 # Sobel 核定義
 Gx = [
     [-1, 0, 1],
@@ -46,6 +51,42 @@ def sobel_edge_detection(pixels, w, h, maxval=255):
             output[y][x] = int(min(maxval, max(0, mag)))
     return output
 
+def sobel_gradients(gray: np.ndarray, maxval=255, return_all=False):
+    """
+    gray: (H, W) 灰階陣列
+    以共用的位移視圖一次算出 Gx 與 Gy：
+      垂直平滑 [1,2,1]ᵀ 後做水平差分 → Gx
+      水平平滑 [1,2,1]  後做垂直差分 → Gy
+    邊界一像素維持 0，與 sobel_edge_detection 結果相同
+
+    回傳：
+      return_all=False → (H, W) 邊緣強度 (0~maxval)；maxval ≤ 255 時為 uint8，≤ 65535 時為 uint16
+      return_all=True  → (gx, gy, magnitude, orientation)
+                         gx, gy 為 int32，magnitude 同上，
+                         orientation 為 float32 弧度 (arctan2(gy, gx))
+    """
+    p = gray.astype(np.int32)
+    h, w = p.shape
+    gx = np.zeros((h, w), dtype=np.int32)
+    gy = np.zeros((h, w), dtype=np.int32)
+    if h >= 3 and w >= 3:
+        top, mid, bot = p[:-2], p[1:-1], p[2:]
+        # 垂直平滑 (h-2, w)，再取左右兩欄差
+        smooth_v = top + 2 * mid + bot
+        gx[1:-1, 1:-1] = smooth_v[:, 2:] - smooth_v[:, :-2]
+        # 水平平滑 (h, w-2)，再取上下兩列差
+        smooth_h = p[:, :-2] + 2 * p[:, 1:-1] + p[:, 2:]
+        gy[1:-1, 1:-1] = smooth_h[:-2] - smooth_h[2:]
+
+    mag = np.hypot(gx, gy, dtype=np.float32)  # sqrt(gx^2+gy^2)
+    np.minimum(mag, maxval, out=mag)
+    # 依 maxval 選擇不會溢位繞回的整數型別（Netpbm 的 maxval 最大為 65535）
+    magnitude = mag.astype(np.uint8 if maxval <= 255 else np.uint16 if maxval <= 65535 else np.int32)
+    if not return_all:
+        return magnitude
+    orientation = np.arctan2(gy, gx, dtype=np.float32)
+    return gx, gy, magnitude, orientation
+
 def image_to_pixels(img):
     """
     把 Pillow 灰階 Image 轉成 2D list
@@ -73,21 +114,14 @@ def main():
     out_path = sys.argv[2]
     quality  = int(sys.argv[3]) if len(sys.argv) >= 4 else 95
 
-    # 1. 讀取並轉灰階
-    img = Image.open(in_path).convert('L')
-    w, h = img.size
-
-    # 2. 灰階影像→2D list
-    pixels = image_to_pixels(img)
-
-    # 3. Sobel 偵測
-    edges = sobel_edge_detection(pixels, w, h, maxval=255)
+    # 1. 讀取為灰階 NumPy 陣列（.pgm 直接映射，不解碼）
+    gray = load_array(in_path, 'L')
 
-    # 4. 2D list→Pillow Image
-    edge_img = pixels_to_image(edges, w, h)
+    # 2. Sobel 偵測
+    edges = sobel_gradients(gray, maxval=255)
 
-    # 5. 儲存為 JPEG
-    edge_img.save(out_path, format='JPEG', quality=quality)
+    # 3. 儲存為 JPEG（副檔名為 .pgm 時寫成 P5）
+    save_array(edges, out_path, format='JPEG', quality=quality)
     print(f'已完成 Sobel 偵測，結果存為：{out_path} (quality={quality})')
 
 if __name__ == '__main__':
@@ -0,0 +1,42 @@
+"""gaussian.py：numpy 模式（分離與非分離卷積）與純 Python 參考實作逐像素相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from gaussian import (apply_gaussian, apply_gaussian_reference, gaussian_blur_array,
+                      make_gaussian_kernel, split_separable_kernel)
+
+
+@pytest.fixture
+def rgb_image():
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (23, 31, 3), dtype=np.uint8), mode='RGB')
+
+
+@pytest.mark.parametrize('ksize', [3, 5, 7])
+@pytest.mark.parametrize('sigma', [0.8, 1.0, 2.0])
+def test_numpy_matches_reference(rgb_image, ksize, sigma):
+    kernel = make_gaussian_kernel(ksize, sigma)
+    expected = np.asarray(apply_gaussian_reference(rgb_image, kernel))
+    assert np.array_equal(np.asarray(apply_gaussian(rgb_image, kernel, mode='numpy')), expected)
+    assert np.array_equal(gaussian_blur_array(np.asarray(rgb_image), kernel, separable=False), expected)
+
+
+def test_non_separable_kernel_matches_reference(rgb_image):
+    kernel = [[0.0, 0.2, 0.0], [0.2, 0.2, 0.2], [0.0, 0.2, 0.0]]
+    assert split_separable_kernel(kernel) is None
+    expected = np.asarray(apply_gaussian_reference(rgb_image, kernel))
+    assert np.array_equal(np.asarray(apply_gaussian(rgb_image, kernel)), expected)
+    with pytest.raises(ValueError):
+        gaussian_blur_array(np.asarray(rgb_image), kernel, separable=True)
+
+
+def test_grayscale_array_matches_per_channel(rgb_image):
+    kernel = make_gaussian_kernel(5, 1.0)
+    arr = np.asarray(rgb_image)
+    blurred = gaussian_blur_array(arr, kernel)
+    assert np.array_equal(gaussian_blur_array(arr[:, :, 1], kernel), blurred[:, :, 1])
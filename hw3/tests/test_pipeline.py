@@ -0,0 +1,61 @@
+"""pipeline.py：記憶體內流程與逐支腳本的純 Python 參考實作逐像素相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from pipeline import INTERMEDIATES, rgb_to_gray, run_sharpen_pipeline
+from sobel import sobel_edge_detection, pixels_to_image
+from gaussian import make_gaussian_kernel, apply_gaussian_reference
+from normalize_edge import normalize_edge_map
+from laplacian import laplacian_edge_detection, normalize_to_255
+from laplacian_add import add_laplacian
+from apply_weight_sharpenA import apply_weight_fusion
+from apply_weight_sharpenB import apply_resultB
+
+
+def _reference(orig, tmp_path, ksize, sigma, threshold, gamma):
+    """依 README 的順序執行各腳本的參考實作，中間結果以 PNG（無損）傳遞"""
+    w, h = orig.size
+    gray = orig.convert('L')
+    pixels = [[gray.getpixel((x, y)) for x in range(w)] for y in range(h)]
+
+    edge1 = pixels_to_image(sobel_edge_detection(pixels, w, h), w, h)
+    smooth1 = apply_gaussian_reference(edge1.convert('RGB'), make_gaussian_kernel(ksize, sigma)).convert('L')
+    smooth1.save(tmp_path / 'smooth1.png')
+    normalize_edge_map(str(tmp_path / 'smooth1.png'), str(tmp_path / 'weight.png'), threshold)
+    weight = Image.open(tmp_path / 'weight.png').convert('L')
+    edge2 = pixels_to_image(normalize_to_255(laplacian_edge_detection(pixels, w, h), w, h), w, h)
+    sharp2 = add_laplacian(orig, edge2)
+    return {
+        'edge1': edge1, 'smooth1': smooth1, 'weight': weight, 'edge2': edge2, 'sharp2': sharp2,
+        'resultA': apply_weight_fusion(orig, sharp2, weight),
+        'resultB': apply_resultB(orig, edge2, weight, gamma),
+    }
+
+
+@pytest.mark.parametrize('ksize, sigma, threshold, gamma', [(5, 1.0, 0.0, 1.0), (3, 0.8, 0.2, 1.5)])
+def test_pipeline_matches_scripts(tmp_path, ksize, sigma, threshold, gamma):
+    rng = np.random.default_rng(4)
+    orig = rng.integers(0, 256, (18, 25, 3), dtype=np.uint8)
+    expected = _reference(Image.fromarray(orig, 'RGB'), tmp_path, ksize, sigma, threshold, gamma)
+    results = run_sharpen_pipeline(orig, ksize, sigma, threshold, gamma, keep=INTERMEDIATES)
+    for name, image in expected.items():
+        assert np.array_equal(results[name], np.asarray(image)), name
+
+
+def test_buffer_reuse_does_not_change_results():
+    orig = np.random.default_rng(5).integers(0, 256, (16, 16, 3), dtype=np.uint8)
+    full = run_sharpen_pipeline(orig, keep=INTERMEDIATES)
+    lean = run_sharpen_pipeline(orig)
+    assert set(lean) == {'resultA', 'resultB'}
+    assert np.array_equal(lean['resultA'], full['resultA'])
+    assert np.array_equal(lean['resultB'], full['resultB'])
+
+
+def test_rgb_to_gray_matches_pillow():
+    orig = np.random.default_rng(6).integers(0, 256, (9, 11, 3), dtype=np.uint8)
+    assert np.array_equal(rgb_to_gray(orig), np.asarray(Image.fromarray(orig, 'RGB').convert('L')))
@@ -0,0 +1,42 @@
+"""sobel.py：sobel_gradients 與純 Python 參考實作 sobel_edge_detection 相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from sobel import sobel_edge_detection, sobel_gradients
+
+
+def _reference(gray, maxval):
+    h, w = gray.shape
+    return np.array(sobel_edge_detection(gray.tolist(), w, h, maxval), dtype=np.int64)
+
+
+@pytest.mark.parametrize('maxval', [255, 128])
+def test_matches_reference_uint8(maxval):
+    gray = np.random.default_rng(1).integers(0, 256, (19, 27), dtype=np.uint8)
+    edge = sobel_gradients(gray, maxval=maxval)
+    assert edge.dtype == np.uint8
+    assert np.array_equal(edge, _reference(gray, maxval))
+
+
+def test_large_maxval_does_not_wrap():
+    gray = np.random.default_rng(2).integers(0, 4096, (17, 21), dtype=np.uint16)
+    edge = sobel_gradients(gray, maxval=4095)
+    assert edge.dtype == np.uint16
+    assert edge.max() > 255
+    assert np.array_equal(edge, _reference(gray, 4095))
+
+
+def test_return_all_consistent():
+    gray = np.random.default_rng(3).integers(0, 256, (12, 15), dtype=np.uint8)
+    gx, gy, magnitude, orientation = sobel_gradients(gray, return_all=True)
+    assert np.array_equal(magnitude, sobel_gradients(gray))
+    assert np.all(gx[0] == 0) and np.all(gy[:, -1] == 0)
+    np.testing.assert_allclose(orientation, np.arctan2(gy, gx), rtol=1e-6)
+
+
+def test_tiny_image_is_zero():
+    assert not sobel_gradients(np.full((2, 5), 200, dtype=np.uint8)).any()
@@ -10,22 +10,115 @@ import cv2
 import numpy as np
 import argparse
 import sys
+from collections import Counter
+from numpy.lib.stride_tricks import sliding_window_view
 
-def adaptive_median_filter(img: np.ndarray, s_max: int) -> np.ndarray:
+from image_io import imread, imwrite
+from tiling import filter_in_strips
+
+# 批次模式每塊最多複製的視窗元素數
+_CHUNK_ELEMS = 1 << 22
+
+METHODS = ('batched', 'reference')
+
+def adaptive_median_filter(img: np.ndarray, s_max: int, method: str = 'batched',
+                           return_counts: bool = False, workers: int = 1):
     """
     自適應中值濾波器 (輸入單通道灰階影像)
     img    : np.ndarray, 灰階影像
-    s_max  : int, 最大視窗邊長 (必須為奇數)
-    回傳   : np.ndarray, 除躁後的灰階影像
+    s_max  : int, 最大視窗邊長 (必須為 >= 3 的奇數)
+    method : 'batched'（預設，整張影像按視窗大小分批處理）或 'reference'（逐像素迴圈）
+    return_counts : 是否一併回傳視窗大小使用次數 (Counter)
+    workers: 行程數；> 1 時以 s_max // 2 為 halo 分條帶平行處理，結果與單核心相同
+    回傳   : np.ndarray, 除躁後的灰階影像；return_counts=True 時為 (影像, 次數)
     """
+    if s_max < 3 or s_max % 2 == 0:
+        raise ValueError("s_max 必須為大於等於 3 的奇數")
+    if method == 'batched':
+        engine = adaptive_median_batched
+    elif method == 'reference':
+        engine = adaptive_median_reference
+    else:
+        raise ValueError(f"未知的 method：{method}")
+
+    if workers != 1:
+        output, sizes = filter_in_strips(
+            engine, img, halo=s_max // 2, workers=workers,
+            out_dtypes=(img.dtype, np.uint16), s_max=s_max
+        )
+    else:
+        output, sizes = engine(img, s_max)
+
+    if return_counts:
+        return output, window_size_counts(sizes)
+    return output
 
-    from collections import Counter
-    counts = Counter()
+def window_size_counts(sizes: np.ndarray) -> Counter:
+    """
+    由逐像素視窗大小圖統計各視窗大小的使用次數
+    （s_max + 2 代表到最大視窗仍未通過 Step A、直接以中值替代）
+    """
+    values, freq = np.unique(sizes, return_counts=True)
+    return Counter({int(v): int(n) for v, n in zip(values, freq)})
 
-    # Padding：以最大視窗半徑作零填充
+def adaptive_median_batched(img: np.ndarray, s_max: int):
+    """
+    批次版自適應中值濾波：對每個視窗大小 3..s_max，
+    一次計算所有「尚未決定」像素的 z_min / z_med / z_max，
+    通過 z_min < z_med < z_max 的像素即定案，其餘留到下一個視窗大小。
+    視窗位置與原實作相同（左上角固定於 padded[i, j]），結果完全一致。
+    回傳 (output, sizes)，sizes 為每個像素最後使用的視窗大小
+    """
+    pad = s_max // 2
+    padded = np.pad(img, pad_width=pad, mode='reflect')
+    output = img.copy()
+    sizes = np.zeros(img.shape, dtype=np.uint16)
+    rows, cols = img.shape
+
+    pending = np.arange(rows * cols)
+    for window_size in range(3, s_max + 1, 2):
+        if pending.size == 0:
+            break
+        area = window_size * window_size
+        mid = area // 2
+        view = sliding_window_view(padded, (window_size, window_size))
+        last = window_size + 2 > s_max
+        # 分塊處理，避免一次複製過多視窗
+        chunk = max(1, _CHUNK_ELEMS // area)
+        still = []
+        for start in range(0, pending.size, chunk):
+            idx = pending[start:start + chunk]
+            ii, jj = np.divmod(idx, cols)
+            local = view[ii, jj].reshape(idx.size, area)
+            z_min = local.min(axis=1)
+            z_max = local.max(axis=1)
+            z_med = np.partition(local, mid, axis=1)[:, mid]
+
+            # Step A: 中值介於最小值與最大值之間即定案（Step B 的結果同為中值）
+            done = (z_min < z_med) & (z_med < z_max)
+            output[ii[done], jj[done]] = z_med[done]
+            sizes[ii[done], jj[done]] = window_size
+            if last:
+                # 超過最大視窗時，直接以中值替代
+                rest = ~done
+                output[ii[rest], jj[rest]] = z_med[rest]
+                sizes[ii[rest], jj[rest]] = window_size + 2
+            else:
+                still.append(idx[~done])
+        pending = np.concatenate(still) if still else pending[:0]
+
+    return output, sizes
+
+def adaptive_median_reference(img: np.ndarray, s_max: int):
+    """
+    逐像素迴圈的原始實作（作為對照組）
+    回傳 (output, sizes)，sizes 為每個像素最後使用的視窗大小
+    """
+    # Padding：以最大視窗半徑作反射填充
     pad = s_max // 2
     padded = np.pad(img, pad_width=pad, mode='reflect')
     output = img.copy()
+    sizes = np.zeros(img.shape, dtype=np.uint16)
     rows, cols = img.shape
 
     for i in range(rows):
@@ -40,29 +133,21 @@ def adaptive_median_filter(img: np.ndarray, s_max: int) -> np.ndarray:
                 z_max = local.max()
                 z_xy  = padded[i + half, j + half]
 
-                # 新增：計算非噪點個數
-                vals = local.flatten()
-                good = np.count_nonzero((vals != 0) & (vals != 255))                
-
-                # Step A: 檢查中值是否在最小值與最大值之間and good >= 21
+                # Step A: 檢查中值是否在最小值與最大值之間
                 if z_min < z_med < z_max :
                     # Step B: 檢查當前像素是否等於中值
                     output[i, j] = z_med if z_xy != z_med else z_xy
-                    counts[window_size] += 1
+                    sizes[i, j] = window_size
                     break
                 else:
                     window_size += 2  # 每次擴增視窗邊長 2
                     if window_size > s_max:
                         # 超過最大視窗時，直接以中值替代
                         output[i, j] = z_med
-                        counts[window_size] += 1
-                        break    
-
-    print("視窗大小使用次數：")
-    for size in sorted(counts):
-        print(f"{size}x{size}: {counts[size]} 次")         
+                        sizes[i, j] = window_size
+                        break
 
-    return output
+    return output, sizes
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -75,26 +160,45 @@ def parse_args():
         "-m", "--max_window", type=int, default=31,
         help="最大視窗邊長 (預設 31，必須為奇數)"
     )
+    parser.add_argument(
+        "--method", choices=METHODS, default="batched",
+        help="batched（預設，按視窗大小分批）或 reference（逐像素迴圈）"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=1,
+        help="平行處理的行程數 (預設 1；0 表示使用全部 CPU)"
+    )
     return parser.parse_args()
 
 def main():
     args = parse_args()
 
     # 以灰階讀取
-    img = cv2.imread(args.input_path, cv2.IMREAD_GRAYSCALE)
+    img = imread(args.input_path, cv2.IMREAD_GRAYSCALE)
     if img is None:
         print(f"無法讀取影像：{args.input_path}", file=sys.stderr)
         sys.exit(1)
 
     # 檢查 max_window 是否為奇數
-    if args.max_window % 2 == 0:
-        print("錯誤：-m/--max_window 必須為奇數", file=sys.stderr)
+    if args.max_window % 2 == 0 or args.max_window < 3:
+        print("錯誤：-m/--max_window 必須為大於等於 3 的奇數", file=sys.stderr)
+        sys.exit(1)
+
+    if args.workers < 0:
+        print("錯誤：-j/--workers 必須 >= 0", file=sys.stderr)
         sys.exit(1)
 
-    denoised = adaptive_median_filter(img, args.max_window)
+    denoised, counts = adaptive_median_filter(
+        img, args.max_window, method=args.method, return_counts=True,
+        workers=args.workers or None
+    )
+
+    print("視窗大小使用次數：")
+    for size in sorted(counts):
+        print(f"{size}x{size}: {counts[size]} 次")
 
     # 儲存結果（灰階）
-    success = cv2.imwrite(args.output_path, denoised)
+    success = imwrite(args.output_path, denoised)
     if not success:
         print(f"儲存影像失敗：{args.output_path}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,54 @@
+'''
+hw4 各程式共用的影像讀寫，介面與 cv2.imread / cv2.imwrite 相同（彩色為 BGR 順序）。
+
+.pgm / .ppm（二進位 P5/P6）經由專案根目錄的 netpbm.py 以 np.memmap 直接映射，
+不解碼也不複製；彩色 PPM 以反轉通道軸的 view 轉成 BGR。其他格式照舊交給 cv2。
+'''
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from netpbm import is_netpbm, read_netpbm, write_netpbm
+
+def imread(path: str, flags: int = cv2.IMREAD_COLOR):
+    """
+    同 cv2.imread：讀取失敗時回傳 None。
+
+    8 位元 P5/P6 在 flags 為 IMREAD_UNCHANGED，或通道數已符合
+    IMREAD_GRAYSCALE / IMREAD_COLOR 時回傳唯讀 memmap（彩色為 BGR view）；
+    需要轉換通道時以 cv2.cvtColor 產生新陣列。
+    """
+    if not is_netpbm(path):
+        return cv2.imread(path, flags)
+    try:
+        arr = read_netpbm(path)
+    except (OSError, ValueError):
+        return cv2.imread(path, flags)
+    if arr.dtype != np.uint8:
+        # 16 位元為大端序，交給 cv2 轉成原生位元組順序與所需深度
+        return cv2.imread(path, flags)
+
+    bgr = arr[:, :, ::-1] if arr.ndim == 3 else arr
+    if flags == cv2.IMREAD_GRAYSCALE and arr.ndim == 3:
+        return cv2.cvtColor(np.ascontiguousarray(arr), cv2.COLOR_RGB2GRAY)
+    if flags == cv2.IMREAD_COLOR and arr.ndim == 2:
+        return cv2.cvtColor(np.asarray(arr), cv2.COLOR_GRAY2BGR)
+    return bgr
+
+def imwrite(path: str, img: np.ndarray, params=None) -> bool:
+    """
+    同 cv2.imwrite：成功回傳 True。
+    副檔名為 .pgm / .ppm 時直接寫成二進位 P5/P6（BGR 轉回 RGB），不經過編碼器。
+    """
+    if not is_netpbm(path) or (img.ndim == 3 and img.shape[2] not in (1, 3)):
+        return cv2.imwrite(path, img, params or [])
+    if img.ndim == 3 and img.shape[2] == 1:
+        img = img[:, :, 0]
+    try:
+        write_netpbm(path, img[:, :, ::-1] if img.ndim == 3 else img)
+    except (OSError, ValueError):
+        return False
+    return True
@@ -5,19 +5,47 @@ python median_filter.py /Users/young/Documents/nchu-2025-spring/DIP/hw4/output/n
 '''
 import cv2
 import numpy as np
+from collections import deque
 
-def manual_median_filter(img: np.ndarray, ksize: int = 3) -> np.ndarray:
+from image_io import imread, imwrite
+from tiling import filter_in_strips
+
+METHODS = ('auto', 'histogram', 'reference')
+
+def manual_median_filter(img: np.ndarray, ksize: int = 3, method: str = 'auto',
+                         workers: int = 1) -> np.ndarray:
     """
     對輸入的影像陣列做中值濾波（純手動實作，不用 cv2.medianBlur）。
     
     參數：
     - img: 輸入影像，形狀為 (H, W) 或 (H, W, C)
     - ksize: 濾波視窗大小 (必須為正奇數，且 >= 3)
+    - method: 'histogram'（欄直方圖，每像素常數時間，僅限 uint8）、
+              'reference'（逐像素 np.median）、
+              'auto'（uint8 用 histogram，其餘用 reference）
+    - workers: 行程數；> 1 時以 ksize // 2 為 halo 分條帶平行處理，結果與單核心相同
     
     回傳：
     - filtered: 同尺寸的中值濾波後影像
     """
     assert ksize % 2 == 1 and ksize >= 3, "ksize 必須為大於等於 3 的奇數"
+    if method not in METHODS:
+        raise ValueError(f"未知的 method：{method}")
+    if method == 'auto':
+        method = 'histogram' if img.dtype == np.uint8 else 'reference'
+    if workers != 1:
+        return filter_in_strips(manual_median_filter, img, halo=ksize // 2,
+                                workers=workers, ksize=ksize, method=method)
+    if method == 'histogram':
+        if img.dtype != np.uint8:
+            raise ValueError("histogram 模式只支援 uint8 影像")
+        return histogram_median_filter(img, ksize)
+    return reference_median_filter(img, ksize)
+
+def reference_median_filter(img: np.ndarray, ksize: int = 3) -> np.ndarray:
+    """
+    逐像素、逐通道以 np.median 計算中值（原始實作，作為對照組）。
+    """
     pad = ksize // 2
     
     # 若是灰階 (H, W)，加一個 channel 維度
@@ -42,20 +70,72 @@ def manual_median_filter(img: np.ndarray, ksize: int = 3) -> np.ndarray:
         out = out[:, :, 0]
     return out
 
-def median_denoise_cv2_io(input_path: str, output_path: str, ksize: int = 3) -> None:
+def _column_histograms(column: np.ndarray, ksize: int) -> np.ndarray:
+    """
+    計算單一欄 (H + ksize - 1,) 在每個輸出列的 ksize 高直方圖。
+    以 one-hot 累加後做 ksize 間距差分，成本與 ksize 無關。
+    回傳 (H, 256) int32
+    """
+    n = column.shape[0]
+    cum = np.zeros((n + 1, 256), dtype=np.int32)
+    cum[np.arange(1, n + 1), column] = 1
+    np.cumsum(cum, axis=0, out=cum)
+    return cum[ksize:] - cum[:-ksize]
+
+def histogram_median_filter(img: np.ndarray, ksize: int = 3) -> np.ndarray:
+    """
+    Perreau / Huang 式欄直方圖中值濾波（uint8），每像素成本與 ksize 無關。
+
+    對每個通道由左至右掃描，所有列同時處理：
+    - 每一欄維護 ksize 高的欄直方圖
+    - 視窗直方圖 = 加入右側新欄、扣掉左側離開的欄
+    - 中值 = 累積次數首次達到 (ksize² + 1) / 2 的灰階值
+    邊界複製填充，結果與 reference_median_filter 完全相同。
+    """
+    pad = ksize // 2
+    squeeze = img.ndim == 2
+    if squeeze:
+        img = img[:, :, np.newaxis]
+    H, W, C = img.shape
+
+    padded = np.pad(img, ((pad,pad), (pad,pad), (0,0)), mode='edge')
+    out = np.empty_like(img)
+    rank = (ksize * ksize + 1) // 2
+
+    for c in range(C):
+        plane = padded[:, :, c]
+        # 初始視窗：前 ksize 欄
+        cols = deque(_column_histograms(plane[:, x], ksize) for x in range(ksize))
+        window = np.sum(cols, axis=0, dtype=np.int32)
+        for x in range(W):
+            if x > 0:
+                entering = _column_histograms(plane[:, x + ksize - 1], ksize)
+                window -= cols.popleft()
+                window += entering
+                cols.append(entering)
+            cdf = np.cumsum(window, axis=1)
+            out[:, x, c] = np.argmax(cdf >= rank, axis=1)
+
+    if squeeze:
+        out = out[:, :, 0]
+    return out
+
+def median_denoise_cv2_io(input_path: str, output_path: str, ksize: int = 3,
+                          method: str = 'auto', workers: int = 1) -> None:
     """
     讀取影像 (cv2)、做純手動中值濾波、儲存結果 (cv2)。
     """
     # 讀影像（BGR）
-    img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+    img = imread(input_path, cv2.IMREAD_UNCHANGED)
     if img is None:
         raise FileNotFoundError(f"找不到影像：{input_path}")
     
     # 執行純手動中值濾波
-    denoised = manual_median_filter(img, ksize=ksize).astype(np.uint8)
+    denoised = manual_median_filter(img, ksize=ksize, method=method,
+                                    workers=workers).astype(np.uint8)
     
     # 存檔
-    cv2.imwrite(output_path, denoised)
+    imwrite(output_path, denoised)
     print(f"已將去雜訊影像儲存至：{output_path}")
 
 if __name__ == "__main__":
@@ -68,9 +148,21 @@ if __name__ == "__main__":
         "-k", "--ksize", type=int, default=3,
         help="中值濾波視窗大小 (奇數，預設 3)"
     )
+    parser.add_argument(
+        "--method", choices=METHODS, default="auto",
+        help="auto（預設）/ histogram（欄直方圖，O(1)）/ reference（逐像素 np.median）"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=1,
+        help="平行處理的行程數 (預設 1；0 表示使用全部 CPU)"
+    )
     args = parser.parse_args()
     
     if args.ksize < 3 or args.ksize % 2 == 0:
         parser.error("ksize 必須為大於等於 3 的奇數")
     
-    median_denoise_cv2_io(args.input, args.output, args.ksize)
\ No newline at end of file
+    if args.workers < 0:
+        parser.error("workers 必須 >= 0")
+
+    median_denoise_cv2_io(args.input, args.output, args.ksize, args.method,
+                          args.workers or None)
\ No newline at end of file
@@ -6,6 +6,8 @@ python salt_and_pepper.py /Users/young/Documents/nchu-2025-spring/DIP/hw4/input/
 import cv2
 import numpy as np
 
+from image_io import imread, imwrite
+
 def add_salt_and_pepper_noise(img: np.ndarray, amount: float) -> np.ndarray:
     """
     在影像上加入椒鹽雜訊。
@@ -54,7 +56,7 @@ def sp_noise_cv2_io(input_path: str, output_path: str, amount: float = 0.05) ->
     - amount: 雜訊比例，預設 0.05 (5%)
     """
     # 讀影像（保留原本通道與深度）
-    img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+    img = imread(input_path, cv2.IMREAD_UNCHANGED)
     if img is None:
         raise FileNotFoundError(f"找不到影像：{input_path}")
 
@@ -62,7 +64,7 @@ def sp_noise_cv2_io(input_path: str, output_path: str, amount: float = 0.05) ->
     noisy = add_salt_and_pepper_noise(img, amount).astype(img.dtype)
 
     # 存檔
-    cv2.imwrite(output_path, noisy)
+    imwrite(output_path, noisy)
     print(f"已將含椒鹽雜訊影像儲存至：{output_path}")
 
 if __name__ == "__main__":
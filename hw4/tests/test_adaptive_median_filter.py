@@ -0,0 +1,51 @@
+"""adaptive_median_filter.py：依視窗大小分批的版本與逐像素參考實作相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import adaptive_median_filter as amf
+from adaptive_median_filter import (adaptive_median_batched, adaptive_median_filter,
+                                    adaptive_median_reference, window_size_counts)
+from salt_and_pepper import add_salt_and_pepper_noise
+
+
+def _noisy(shape, amount, seed):
+    np.random.seed(seed)
+    # 平滑的底圖加上椒鹽雜訊，讓各種視窗大小都會被用到
+    yy, xx = np.mgrid[:shape[0], :shape[1]]
+    base = ((yy * 7 + xx * 3) % 200 + 20).astype(np.uint8)
+    return add_salt_and_pepper_noise(base, amount)
+
+
+@pytest.mark.parametrize('s_max', [3, 5, 7])
+@pytest.mark.parametrize('amount', [0.1, 0.5])
+def test_batched_matches_reference(s_max, amount):
+    img = _noisy((23, 29), amount, s_max)
+    out, sizes = adaptive_median_batched(img, s_max)
+    ref_out, ref_sizes = adaptive_median_reference(img, s_max)
+    assert np.array_equal(out, ref_out)
+    assert np.array_equal(sizes, ref_sizes)
+
+
+def test_small_chunks_match_reference(monkeypatch):
+    # 分塊邊界落在待處理像素中間時結果不變
+    monkeypatch.setattr(amf, '_CHUNK_ELEMS', 100)
+    img = _noisy((17, 19), 0.5, 3)
+    assert np.array_equal(adaptive_median_batched(img, 7)[0], adaptive_median_reference(img, 7)[0])
+
+
+def test_counts():
+    img = _noisy((15, 16), 0.5, 4)
+    out, counts = adaptive_median_filter(img, 7, return_counts=True)
+    _, ref_sizes = adaptive_median_reference(img, 7)
+    assert counts == window_size_counts(ref_sizes)
+    assert sum(counts.values()) == img.size
+    assert set(counts) <= {3, 5, 7, 9}
+
+
+def test_invalid_s_max():
+    with pytest.raises(ValueError):
+        adaptive_median_filter(np.zeros((5, 5), np.uint8), 4)
@@ -0,0 +1,37 @@
+"""median_filter.py：欄直方圖中值濾波與逐像素 np.median 參考實作相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from median_filter import histogram_median_filter, manual_median_filter, reference_median_filter
+from salt_and_pepper import add_salt_and_pepper_noise
+
+
+def _noisy(shape, seed):
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)
+    return add_salt_and_pepper_noise(rng.integers(0, 256, shape, dtype=np.uint8), 0.2)
+
+
+@pytest.mark.parametrize('ksize', [3, 5, 7])
+@pytest.mark.parametrize('shape', [(21, 17), (13, 19, 3)])
+def test_histogram_matches_reference(ksize, shape):
+    img = _noisy(shape, ksize)
+    expected = reference_median_filter(img, ksize)
+    assert np.array_equal(histogram_median_filter(img, ksize), expected)
+    assert np.array_equal(manual_median_filter(img, ksize), expected)
+
+
+def test_window_larger_than_image():
+    img = _noisy((4, 5), 1)
+    assert np.array_equal(histogram_median_filter(img, 7), reference_median_filter(img, 7))
+
+
+def test_auto_falls_back_for_non_uint8():
+    img = _noisy((9, 9), 2).astype(np.uint16) * 3
+    assert np.array_equal(manual_median_filter(img, 3), reference_median_filter(img, 3))
+    with pytest.raises(ValueError):
+        manual_median_filter(img, 3, method='histogram')
@@ -0,0 +1,57 @@
+"""tiling.py：多行程分條帶執行的結果與單核心完全相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tiling import filter_in_strips, split_strips
+from median_filter import manual_median_filter, reference_median_filter
+from adaptive_median_filter import adaptive_median_filter, adaptive_median_reference
+from salt_and_pepper import add_salt_and_pepper_noise
+
+
+def _noisy(shape, seed):
+    np.random.seed(seed)
+    base = np.random.randint(0, 256, shape).astype(np.uint8)
+    return add_salt_and_pepper_noise(base, 0.3)
+
+
+@pytest.mark.parametrize('rows, n_strips', [(10, 3), (5, 8), (1, 4), (37, 16)])
+def test_split_strips_covers_rows(rows, n_strips):
+    strips = split_strips(rows, n_strips)
+    assert strips[0][0] == 0 and strips[-1][1] == rows
+    assert all(a[1] == b[0] for a, b in zip(strips, strips[1:]))
+    assert all(y1 > y0 for y0, y1 in strips)
+
+
+@pytest.mark.parametrize('ksize', [3, 7])
+@pytest.mark.parametrize('shape', [(41, 23), (30, 17, 3)])
+def test_median_workers_match_single(ksize, shape):
+    img = _noisy(shape, ksize)
+    expected = reference_median_filter(img, ksize)
+    assert np.array_equal(manual_median_filter(img, ksize, workers=1), expected)
+    assert np.array_equal(manual_median_filter(img, ksize, workers=4), expected)
+
+
+@pytest.mark.parametrize('s_max', [3, 7])
+def test_adaptive_workers_match_reference(s_max):
+    img = _noisy((45, 21), s_max)
+    ref_out, ref_sizes = adaptive_median_reference(img, s_max)
+    for workers in (1, 4):
+        out, counts = adaptive_median_filter(img, s_max, return_counts=True, workers=workers)
+        assert np.array_equal(out, ref_out)
+        assert sum(counts.values()) == img.size
+
+
+def test_multiple_outputs_and_dtypes():
+    img = _noisy((33, 12), 5)
+    out, sizes = filter_in_strips(_median_and_sizes, img, halo=1, workers=3,
+                                  out_dtypes=(img.dtype, np.uint16))
+    assert np.array_equal(out, reference_median_filter(img, 3))
+    assert sizes.dtype == np.uint16 and np.all(sizes == 3)
+
+
+def _median_and_sizes(strip):
+    return reference_median_filter(strip, 3), np.full(strip.shape, 3, dtype=np.uint16)
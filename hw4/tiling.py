@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tiling.py
+
+功能：
+  將影像切成水平條帶 (strip)，每條帶上下各多取 halo 列（= 濾波半徑），
+  交給行程池平行濾波，最後只把條帶的核心列拼回輸出。
+  輸入與輸出都放在 shared memory 中，子行程直接附掛使用，
+  行程之間只傳遞共享記憶體名稱與列範圍，影像本身不會被 pickle。
+  只要 halo 不小於濾波器實際讀到的鄰域，結果與單核心完全相同。
+"""
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# 每個 worker 平均分到的條帶數，讓較慢的條帶可以被其他 worker 分攤
+STRIPS_PER_WORKER = 4
+
+def split_strips(rows: int, n_strips: int):
+    """
+    將 [0, rows) 切成 n_strips 段連續列範圍
+    回傳 list of (y0, y1)
+    """
+    n_strips = max(1, min(n_strips, rows))
+    bounds = np.linspace(0, rows, n_strips + 1).astype(int)
+    return [(int(y0), int(y1)) for y0, y1 in zip(bounds[:-1], bounds[1:]) if y1 > y0]
+
+def _attach(spec):
+    """依 (name, shape, dtype) 附掛共享記憶體並包成 ndarray"""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _run_strip(func, kwargs, in_spec, out_specs, y0, y1, halo):
+    """
+    子行程：讀取 [y0 - halo, y1 + halo) 的條帶執行 func，
+    將核心列 [y0, y1) 寫入共享輸出
+    """
+    in_shm, src = _attach(in_spec)
+    opened = [in_shm]
+    try:
+        rows = src.shape[0]
+        top = max(0, y0 - halo)
+        bottom = min(rows, y1 + halo)
+        result = func(src[top:bottom], **kwargs)
+        if not isinstance(result, tuple):
+            result = (result,)
+        for spec, part in zip(out_specs, result):
+            shm, dst = _attach(spec)
+            opened.append(shm)
+            dst[y0:y1] = part[y0 - top : y1 - top]
+    finally:
+        for shm in opened:
+            shm.close()
+
+def filter_in_strips(func, img: np.ndarray, halo: int, workers=None,
+                     out_dtypes=None, **kwargs):
+    """
+    以多行程、分條帶方式執行 func(strip, **kwargs)。
+
+    參數：
+    - func: 模組層級的濾波函式，回傳與輸入同形狀的陣列，或多個陣列組成的 tuple
+    - img: 輸入影像 (H, W) 或 (H, W, C)
+    - halo: 條帶上下額外讀取的列數（濾波半徑）
+    - workers: 行程數，None 表示 os.cpu_count()
+    - out_dtypes: 各輸出陣列的 dtype（形狀皆與 img 相同），預設為 (img.dtype,)
+    - kwargs: 傳給 func 的其他參數
+
+    回傳：
+    - 單一輸出時回傳陣列，多個輸出時回傳 tuple
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if out_dtypes is None:
+        out_dtypes = (img.dtype,)
+
+    strips = split_strips(img.shape[0], workers * STRIPS_PER_WORKER)
+    if workers <= 1 or len(strips) <= 1:
+        return func(img, **kwargs)
+
+    blocks = []
+    try:
+        in_shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes))
+        blocks.append(in_shm)
+        np.ndarray(img.shape, dtype=img.dtype, buffer=in_shm.buf)[...] = img
+        in_spec = (in_shm.name, img.shape, img.dtype)
+
+        out_specs = []
+        for dtype in out_dtypes:
+            nbytes = int(np.prod(img.shape)) * np.dtype(dtype).itemsize
+            shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+            blocks.append(shm)
+            out_specs.append((shm.name, img.shape, np.dtype(dtype)))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_run_strip, func, kwargs, in_spec, out_specs, y0, y1, halo)
+                for y0, y1 in strips
+            ]
+            for fut in futures:
+                fut.result()
+
+        outputs = tuple(
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+            for shm, (_, shape, dtype) in zip(blocks[1:], out_specs)
+        )
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return outputs[0] if len(outputs) == 1 else outputs
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+morphology.py
+
+功能：
+  從 morphology.ipynb 抽出的二值形態學運算，可直接在批次流程中 import 使用。
+  錨點 (anchor)、SE 反射方式與輸出尺寸皆與 notebook 版本相同，
+  但不再逐像素、逐 SE 元素迴圈，而是對 SE 每個非零位移取整張影像的
+  位移視圖，做 OR（膨脹）/ AND（侵蝕）。
+
+  - dilation_binary : 膨脹，輸出 (H + h - 1, W + w - 1)
+  - erosion_binary  : 侵蝕，輸出 (H, W)
+  - opening_binary  : 先侵蝕再膨脹，輸出 (H, W)
+  - closing_binary  : 先膨脹再侵蝕，輸出 (H, W)
+  - hit_or_miss     : 擊中–擊不中轉換，輸出 (H, W)
+  - grey_dilation / grey_erosion : 平坦 SE 的灰階版本，幾何定義與二值版相同
+
+  大型 SE 改用 van Herk / Gil-Werman (vHGW) 滑動極值：
+  SE 先拆成水平線段的聯集，相同 (起點, 長度) 的連續列再合併成矩形，
+  每個矩形做一次水平 + 一次垂直 vHGW，每像素約 3 次比較，與 SE 長度無關。
+  矩形與直線 SE 只需一個矩形；三角形等任意 SE 的矩形再以長度為 2 的冪次的
+  重疊區間覆蓋，掃描長度只剩 log2(SE 尺寸) 種。
+
+  影像外部一律視為 0；若要避免邊界效應，請先如 notebook 般補 0。
+"""
+import numpy as np
+
+def make_triangle_se(side):
+    """建立邊長 side 的正三角形結構元素 (uint8 0/1)"""
+    h = int(round(np.sqrt(3)/2 * side))
+    se = np.zeros((h, side), dtype=np.uint8)
+    for r in range(h):
+        span = int(round((side/2) * (1 - r/h)))
+        left  = side//2 - span
+        right = side//2 + span
+        se[r, left:right+1] = 1
+    return se
+
+def make_rect_se(h, w):
+    """建立 h×w 的矩形結構元素"""
+    return np.ones((h, w), dtype=np.uint8)
+
+def make_line_se(length, direction='horizontal'):
+    """建立長度 length 的水平 ('horizontal') 或垂直 ('vertical') 線段結構元素"""
+    if direction == 'horizontal':
+        return np.ones((1, length), dtype=np.uint8)
+    if direction == 'vertical':
+        return np.ones((length, 1), dtype=np.uint8)
+    raise ValueError(f"未知的 direction：{direction}")
+
+def _se_offsets(se):
+    """SE 非零元素的 (u, v) 座標"""
+    return np.argwhere(np.asarray(se) != 0)
+
+def se_line_segments(se):
+    """
+    將 SE 拆成水平線段的聯集
+    回傳 list of (u, v0, length)：第 u 列從 v0 起連續 length 個非零元素
+    """
+    segments = []
+    for u, row in enumerate(np.asarray(se) != 0):
+        padded = np.concatenate(([False], row, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        for v0, v1 in zip(edges[::2], edges[1::2]):
+            segments.append((u, int(v0), int(v1 - v0)))
+    return segments
+
+def se_rectangles(se):
+    """
+    將水平線段中 (v0, length) 相同且列號連續者合併為矩形
+    回傳 list of (u0, rows, v0, length)
+    """
+    rects = []
+    open_rects = {}
+    for u, v0, length in se_line_segments(se):
+        key = (v0, length)
+        rect = open_rects.get(key)
+        if rect is not None and rect[0] + rect[1] == u:
+            rect[1] += 1
+        else:
+            rect = [u, 1, v0, length]
+            open_rects[key] = rect
+            rects.append(rect)
+    return [tuple(r) for r in rects]
+
+def _pow2_cover(start, length):
+    """
+    以至多兩段長度為 2 的冪次、可互相重疊的區間覆蓋 [start, start + length)
+    （極值運算允許重疊）；回傳 list of (start, length)
+    """
+    if length & (length - 1) == 0:
+        return [(start, length)]
+    p = 1 << (length.bit_length() - 1)
+    return [(start, p), (start + length - p, p)]
+
+def _vhgw_terms(se):
+    """
+    vHGW 路徑要累積的項目 list of (u0, rows, v0, length)。
+    每個矩形的寬、高都改以兩段 2 的冪次重疊區間覆蓋，
+    使水平 / 垂直 vHGW 的長度種類降到 log2(SE 尺寸) 個。
+    """
+    terms = []
+    for u0, rows, v0, length in se_rectangles(se):
+        for tu, trows in _pow2_cover(u0, rows):
+            for tv, tlen in _pow2_cover(v0, length):
+                terms.append((tu, trows, tv, tlen))
+    return terms
+
+def _identity(dtype, op):
+    """op 的單位元素：max 取型別最小值，min 取型別最大值"""
+    if dtype == bool:
+        return op is np.minimum
+    if np.issubdtype(dtype, np.floating):
+        return -np.inf if op is np.maximum else np.inf
+    info = np.iinfo(dtype)
+    return info.min if op is np.maximum else info.max
+
+def _block_prefix(blocks, op):
+    """
+    沿最後一軸（區塊內）做前綴極值。
+    區塊短時 ufunc.accumulate 的內層迴圈太短，改為逐位置的向量化運算。
+    """
+    length = blocks.shape[-1]
+    if length > 32:
+        return op.accumulate(blocks, axis=-1)
+    out = np.empty_like(blocks)
+    out[..., 0] = blocks[..., 0]
+    for k in range(1, length):
+        op(out[..., k - 1], blocks[..., k], out=out[..., k])
+    return out
+
+def running_extreme_1d(a: np.ndarray, length: int, axis: int, op) -> np.ndarray:
+    """
+    van Herk / Gil-Werman 滑動極值：out[x] = op(a[x : x + length])
+    沿 axis 切成長度 length 的區塊，計算區塊內前綴 g 與後綴 h，
+    out[x] = op(h[x], g[x + length - 1])，每個元素約 3 次比較。
+    op 為 np.maximum 或 np.minimum；輸出沿 axis 長度為 n - length + 1
+    """
+    if length == 1:
+        return a
+    is_bool = a.dtype == bool
+    if is_bool:
+        # uint8 的 accumulate 比 bool 快，兩者可直接互相 view
+        a = a.view(np.uint8)
+    a = np.moveaxis(a, axis, -1)
+    n = a.shape[-1]
+    out_n = n - length + 1
+    n_blocks = -(-n // length)
+    padded = np.full(a.shape[:-1] + (n_blocks * length,), _identity(a.dtype, op), dtype=a.dtype)
+    padded[..., :n] = a
+    block_shape = a.shape[:-1] + (n_blocks, length)
+
+    # 區塊內前綴 g；後綴 h 由反轉後的前綴再反轉取得（兩者皆不需額外複製）
+    g = _block_prefix(padded.reshape(block_shape), op).reshape(padded.shape)
+    h = _block_prefix(padded[..., ::-1].reshape(block_shape), op).reshape(padded.shape)[..., ::-1]
+    out = op(h[..., :out_n], g[..., length - 1 : length - 1 + out_n])
+    out = np.moveaxis(out, -1, axis)
+    return out.view(bool) if is_bool else out
+
+def running_max_1d(a: np.ndarray, length: int, axis: int = -1) -> np.ndarray:
+    """沿 axis 的長度 length 滑動最大值 (vHGW)"""
+    return running_extreme_1d(a, length, axis, np.maximum)
+
+def running_min_1d(a: np.ndarray, length: int, axis: int = -1) -> np.ndarray:
+    """沿 axis 的長度 length 滑動最小值 (vHGW)"""
+    return running_extreme_1d(a, length, axis, np.minimum)
+
+def _shift_extreme(padded, se, out_shape, op):
+    """out[i, j] = op_{se[u,v]≠0} padded[i + u, j + v]，逐一位移視圖累積"""
+    out_H, out_W = out_shape
+    out = np.full(out_shape, _identity(padded.dtype, op), dtype=padded.dtype)
+    for u, v in _se_offsets(se):
+        op(out, padded[u:u + out_H, v:v + out_W], out=out)
+    return out
+
+def _vhgw_extreme(padded, se, out_shape, op):
+    """與 _shift_extreme 相同結果，但以矩形分解 + vHGW 計算"""
+    out_H, out_W = out_shape
+    out = np.full(out_shape, _identity(padded.dtype, op), dtype=padded.dtype)
+    by_length = {}
+    for u0, rows, v0, length in _vhgw_terms(se):
+        by_length.setdefault(length, []).append((u0, rows, v0))
+
+    # 同一長度的水平結果只算一次，算完即釋放
+    for length, rects in by_length.items():
+        horiz = running_extreme_1d(padded, length, 1, op)
+        vert_cache = {}
+        for u0, rows, v0 in rects:
+            vert = vert_cache.get(rows)
+            if vert is None:
+                vert = vert_cache[rows] = running_extreme_1d(horiz, rows, 0, op)
+            op(out, vert[u0:u0 + out_H, v0:v0 + out_W], out=out)
+    return out
+
+def _vhgw_cost(se):
+    """
+    估計 vHGW 路徑的成本（以一次位移視圖運算為單位）；
+    每次 vHGW 掃描含配置與兩次累積，約折合 6 次位移運算
+    """
+    terms = _vhgw_terms(se)
+    passes = {length for _, _, _, length in terms if length > 1}
+    passes |= {(length, rows) for _, rows, _, length in terms if rows > 1}
+    return 6 * len(passes) + len(terms)
+
+def _flat_extreme(padded, se, out_shape, op, method):
+    """依 method ('shift' / 'vhgw' / 'auto') 計算平坦 SE 的滑動極值"""
+    if method == 'auto':
+        method = 'vhgw' if _vhgw_cost(se) < np.count_nonzero(se) else 'shift'
+    if method == 'shift':
+        return _shift_extreme(padded, se, out_shape, op)
+    if method == 'vhgw':
+        return _vhgw_extreme(padded, se, out_shape, op)
+    raise ValueError(f"未知的 method：{method}")
+
+def _dilation_padding(se, anchor):
+    """膨脹時的補邊寬度：索引 x = i - ax + u 對應 padded[i + u]"""
+    h, w = se.shape
+    ax, ay = anchor
+    return ((ax, 2 * (h - 1) - ax), (ay, 2 * (w - 1) - ay))
+
+def _erosion_padding(se, anchor):
+    """侵蝕時（反射 SE 與錨點後）的補邊寬度"""
+    h, w = se.shape
+    ax_ref = h - 1 - anchor[0]
+    ay_ref = w - 1 - anchor[1]
+    return ((ax_ref, h - 1 - ax_ref), (ay_ref, w - 1 - ay_ref))
+
+def dilation_binary(img: np.ndarray,
+                    se: np.ndarray,
+                    anchor: tuple[int,int],
+                    method: str = 'auto') -> np.ndarray:
+    """
+    二值膨脹：out[i, j] = OR_{se[u,v]≠0} img[i - ax + u, j - ay + v]（超出範圍視為 0）
+    只有值為 1 的像素視為前景，與 notebook 版本相同。
+    method: 'shift'（逐位移 OR）、'vhgw'（矩形分解 + vHGW）或 'auto'（依成本選擇）
+    回傳 (H + h - 1, W + w - 1) uint8
+    """
+    H, W = img.shape
+    h, w = se.shape
+
+    # 補 0 使所有位移都落在陣列內
+    fg = np.pad(img == 1, _dilation_padding(se, anchor),
+                mode='constant', constant_values=False)
+
+    out = _flat_extreme(fg, se, (H + h - 1, W + w - 1), np.maximum, method)
+    return out.astype(np.uint8)
+
+def erosion_binary(img: np.ndarray,
+                   se: np.ndarray,
+                   anchor: tuple[int,int],
+                   method: str = 'auto') -> np.ndarray:
+    """
+    二值侵蝕：以反射後的 SE 與錨點對補 0 的影像取 AND，非零即視為前景。
+    method: 'shift'（逐位移 AND）、'vhgw'（矩形分解 + vHGW）或 'auto'（依成本選擇）
+    回傳 (H, W) uint8
+    """
+    # 1. 反射 SE（錨點一併反射，見 _erosion_padding）
+    se_ref = np.flipud(np.fliplr(se))
+
+    # 2. 對原圖做 zero‐padding，使得輸出可以對應到所有 (i,j)
+    img_pad = np.pad(img != 0, _erosion_padding(se, anchor),
+                     mode='constant',
+                     constant_values=False)
+
+    # 3. 對反射後 SE 的所有位移取 AND
+    out = _flat_extreme(img_pad, se_ref, img.shape, np.minimum, method)
+    return out.astype(np.uint8)
+
+def grey_dilation(img: np.ndarray,
+                  se: np.ndarray,
+                  anchor: tuple[int,int],
+                  method: str = 'auto') -> np.ndarray:
+    """
+    平坦 SE 的灰階膨脹：幾何定義與 dilation_binary 相同，OR 改為 max，
+    影像外部視為 0。回傳 (H + h - 1, W + w - 1)，dtype 與輸入相同
+    """
+    H, W = img.shape
+    h, w = se.shape
+    padded = np.pad(img, _dilation_padding(se, anchor),
+                    mode='constant', constant_values=0)
+    return _flat_extreme(padded, se, (H + h - 1, W + w - 1), np.maximum, method)
+
+def grey_erosion(img: np.ndarray,
+                 se: np.ndarray,
+                 anchor: tuple[int,int],
+                 method: str = 'auto',
+                 border_value=0) -> np.ndarray:
+    """
+    平坦 SE 的灰階侵蝕：幾何定義與 erosion_binary 相同，AND 改為 min。
+    border_value: 影像外部的值，預設 0（與二值版一致）；
+                  傳入型別最大值可避免邊界被侵蝕。回傳 (H, W)
+    """
+    se_ref = np.flipud(np.fliplr(se))
+    padded = np.pad(img, _erosion_padding(se, anchor),
+                    mode='constant', constant_values=border_value)
+    return _flat_extreme(padded, se_ref, img.shape, np.minimum, method)
+
+def opening_binary(img: np.ndarray,
+                   se: np.ndarray,
+                   anchor: tuple[int,int]) -> np.ndarray:
+    """開運算：先侵蝕再膨脹，裁回輸入尺寸 (H, W)"""
+    H, W = img.shape
+    return dilation_binary(erosion_binary(img, se, anchor), se, anchor)[:H, :W]
+
+def closing_binary(img: np.ndarray,
+                   se: np.ndarray,
+                   anchor: tuple[int,int]) -> np.ndarray:
+    """閉運算：先膨脹再侵蝕（notebook 中的流程），裁回輸入尺寸 (H, W)"""
+    H, W = img.shape
+    return erosion_binary(dilation_binary(img, se, anchor), se, anchor)[:H, :W]
+
+def hit_or_miss(img: np.ndarray,
+                hit_se: np.ndarray,
+                miss_se: np.ndarray = None,
+                anchor: tuple[int,int] = (0, 0)) -> np.ndarray:
+    """
+    擊中–擊不中轉換：前景需符合 hit_se、背景需符合 miss_se。
+    SE 依原方向比對：out[i, j] = 1 當且僅當對所有 hit_se[u,v]≠0，
+    img[i - ax + u, j - ay + v] 為前景，且對所有 miss_se[u,v]≠0 該位置為背景。
+    miss_se 為 None 時取 hit_se 在同一外框內的補集。
+    兩個 SE 必須同尺寸並共用同一錨點；影像外部視為背景。
+    回傳 (H, W) uint8
+    """
+    hit_se = np.asarray(hit_se)
+    if miss_se is None:
+        miss_se = (hit_se == 0).astype(np.uint8)
+    miss_se = np.asarray(miss_se)
+    if hit_se.shape != miss_se.shape:
+        raise ValueError("hit_se 與 miss_se 尺寸必須相同")
+
+    # grey_erosion 以反射的 SE 比對；先反射 SE 與錨點，使兩次反射相消
+    h, w = hit_se.shape
+    anchor_ref = (h - 1 - anchor[0], w - 1 - anchor[1])
+    fg = (img != 0).astype(np.uint8)
+    hit = grey_erosion(fg, hit_se[::-1, ::-1], anchor_ref)
+    # 背景的補邊為 1：影像外部算作背景
+    miss = grey_erosion(1 - fg, miss_se[::-1, ::-1], anchor_ref, border_value=1)
+    return hit & miss
@@ -0,0 +1,75 @@
+"""morphology.py：二值形態學與逐像素定義相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from morphology import dilation_binary, erosion_binary, hit_or_miss
+
+
+def _hit_or_miss_reference(img, hit_se, miss_se, anchor):
+    """逐像素比對：SE 依原方向放在 (i - ax, j - ay)，影像外部視為背景"""
+    H, W = img.shape
+    ax, ay = anchor
+    out = np.zeros((H, W), dtype=np.uint8)
+    for i in range(H):
+        for j in range(W):
+            ok = True
+            for (u, v), hit in np.ndenumerate(hit_se):
+                y, x = i - ax + u, j - ay + v
+                value = img[y, x] != 0 if 0 <= y < H and 0 <= x < W else False
+                if (hit and not value) or (miss_se[u, v] and value):
+                    ok = False
+                    break
+            out[i, j] = ok
+    return out
+
+
+ASYMMETRIC_SE = np.array([[1, 1, 1],
+                          [1, 0, 0],
+                          [1, 0, 0]], dtype=np.uint8)
+
+
+@pytest.mark.parametrize('anchor', [(0, 0), (1, 1), (2, 1)])
+def test_hit_or_miss_finds_pattern_as_given(anchor):
+    img = np.zeros((9, 10), dtype=np.uint8)
+    img[2:5, 3:6] = ASYMMETRIC_SE
+    found = np.argwhere(hit_or_miss(img, ASYMMETRIC_SE, anchor=anchor))
+    assert found.tolist() == [[2 + anchor[0], 3 + anchor[1]]]
+    # 旋轉 180° 的圖樣不應被找到
+    rotated = np.zeros_like(img)
+    rotated[2:5, 3:6] = ASYMMETRIC_SE[::-1, ::-1]
+    assert not hit_or_miss(rotated, ASYMMETRIC_SE, anchor=anchor).any()
+
+
+def test_hit_or_miss_at_border():
+    img = np.zeros((6, 6), dtype=np.uint8)
+    img[0:3, 0:3] = ASYMMETRIC_SE
+    assert np.argwhere(hit_or_miss(img, ASYMMETRIC_SE)).tolist() == [[0, 0]]
+    # 右下角：背景部分超出影像也算擊不中成立
+    corner = np.array([[1, 0], [0, 0]], dtype=np.uint8)
+    img = np.zeros((5, 5), dtype=np.uint8)
+    img[4, 4] = 1
+    assert np.argwhere(hit_or_miss(img, corner)).tolist() == [[4, 4]]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_hit_or_miss_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    img = (rng.random((12, 14)) < 0.5).astype(np.uint8)
+    hit_se = (rng.random((3, 4)) < 0.4).astype(np.uint8)
+    miss_se = ((rng.random((3, 4)) < 0.4) & (hit_se == 0)).astype(np.uint8)
+    for anchor in [(0, 0), (1, 2), (2, 3)]:
+        assert np.array_equal(hit_or_miss(img, hit_se, miss_se, anchor),
+                              _hit_or_miss_reference(img, hit_se, miss_se, anchor))
+
+
+def test_erosion_is_dual_of_dilation_on_interior():
+    rng = np.random.default_rng(7)
+    img = (rng.random((15, 15)) < 0.6).astype(np.uint8)
+    se = np.ones((3, 3), dtype=np.uint8)
+    eroded = erosion_binary(img, se, (1, 1))
+    dilated_bg = dilation_binary(1 - img, se, (1, 1))[:15, :15]
+    assert np.array_equal(eroded[1:-1, 1:-1], 1 - dilated_bg[1:-1, 1:-1])
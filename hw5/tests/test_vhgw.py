@@ -0,0 +1,77 @@
+"""morphology.py：vHGW（矩形分解）路徑與逐位移路徑結果相同"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from morphology import (dilation_binary, erosion_binary, grey_dilation, grey_erosion,
+                        make_line_se, make_rect_se, make_triangle_se,
+                        running_max_1d, running_min_1d, se_rectangles)
+
+SES = {
+    'rect': make_rect_se(5, 7),
+    'hline': make_line_se(9, 'horizontal'),
+    'vline': make_line_se(6, 'vertical'),
+    'triangle': make_triangle_se(11),
+    'cross': np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]], dtype=np.uint8),
+}
+
+
+@pytest.mark.parametrize('length', [1, 2, 3, 5, 8, 33, 40])
+def test_running_extreme_matches_naive(length):
+    a = np.random.default_rng(length).integers(0, 256, (4, 50), dtype=np.uint8)
+    n = a.shape[1] - length + 1
+    naive_max = np.stack([a[:, x:x + length].max(axis=1) for x in range(n)], axis=1)
+    naive_min = np.stack([a[:, x:x + length].min(axis=1) for x in range(n)], axis=1)
+    assert np.array_equal(running_max_1d(a, length), naive_max)
+    assert np.array_equal(running_min_1d(a, length), naive_min)
+    assert np.array_equal(running_max_1d(a.T, length, axis=0), naive_max.T)
+
+
+def test_running_extreme_bool():
+    a = np.random.default_rng(0).random((3, 20)) < 0.5
+    out = running_max_1d(a, 4)
+    assert out.dtype == bool
+    assert np.array_equal(out, running_max_1d(a.astype(np.uint8), 4).astype(bool))
+
+
+@pytest.mark.parametrize('name', SES)
+def test_rectangles_cover_se(name):
+    se = SES[name]
+    rebuilt = np.zeros_like(se)
+    for u0, rows, v0, length in se_rectangles(se):
+        rebuilt[u0:u0 + rows, v0:v0 + length] += 1
+    assert np.array_equal(rebuilt, se)
+
+
+@pytest.mark.parametrize('name', SES)
+def test_binary_vhgw_matches_shift(name):
+    se = SES[name]
+    img = (np.random.default_rng(1).random((31, 37)) < 0.55).astype(np.uint8)
+    for anchor in [(0, 0), (se.shape[0] // 2, se.shape[1] // 2), (se.shape[0] - 1, 0)]:
+        assert np.array_equal(dilation_binary(img, se, anchor, method='vhgw'),
+                              dilation_binary(img, se, anchor, method='shift'))
+        assert np.array_equal(erosion_binary(img, se, anchor, method='vhgw'),
+                              erosion_binary(img, se, anchor, method='shift'))
+
+
+@pytest.mark.parametrize('name', SES)
+@pytest.mark.parametrize('dtype', [np.uint8, np.float32])
+def test_grey_vhgw_matches_shift(name, dtype):
+    se = SES[name]
+    img = (np.random.default_rng(2).random((26, 29)) * 255).astype(dtype)
+    anchor = (se.shape[0] // 2, se.shape[1] // 2)
+    assert np.array_equal(grey_dilation(img, se, anchor, method='vhgw'),
+                          grey_dilation(img, se, anchor, method='shift'))
+    for border in (0, 255):
+        assert np.array_equal(grey_erosion(img, se, anchor, method='vhgw', border_value=border),
+                              grey_erosion(img, se, anchor, method='shift', border_value=border))
+
+
+def test_auto_matches_shift():
+    se = make_triangle_se(21)
+    img = (np.random.default_rng(3).random((40, 45)) < 0.7).astype(np.uint8)
+    anchor = (se.shape[0] // 2, se.shape[1] // 2)
+    assert np.array_equal(erosion_binary(img, se, anchor), erosion_binary(img, se, anchor, method='shift'))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+netpbm.py
+
+功能：
+  二進位 PGM (P5) / PPM (P6) 的零複製讀寫，供各作業之間傳遞未壓縮的中間結果。
+    - read_netpbm   只解析檔頭，像素資料以唯讀 np.memmap 映射，不解碼也不複製
+    - create_netpbm 寫好檔頭並回傳可寫入的 np.memmap，直接在檔案上產生結果
+    - write_netpbm  檔頭加上一次寫出陣列的原始位元組
+  最大值 ≤ 255 時為 uint8，否則為 16 位元大端序 ('>u2')，與 Netpbm 規格相同。
+  通道順序為 RGB；灰階為 (H, W)，彩色為 (H, W, 3)。
+
+使用：
+  各作業資料夾的程式以相對路徑匯入本模組（專案根目錄加入 sys.path）：
+    from netpbm import is_netpbm, read_netpbm, write_netpbm
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# 視為 Netpbm 的副檔名
+NETPBM_EXTS = ('.pgm', '.ppm', '.pnm')
+
+# 二進位格式與其通道數
+_CHANNELS = {b'P5': 1, b'P6': 3}
+
+# 檔頭最多讀取的位元組數（含註解）
+_HEADER_BYTES = 4096
+
+NetpbmHeader = namedtuple('NetpbmHeader', ['magic', 'width', 'height', 'maxval', 'offset'])
+
+
+def is_netpbm(path: str) -> bool:
+    """依副檔名判斷是否為 Netpbm 檔"""
+    return os.path.splitext(path)[1].lower() in NETPBM_EXTS
+
+
+def parse_header(head: bytes):
+    """
+    解析 Netpbm 檔頭（magic、寬、高、最大值，可含 # 註解）
+
+    參數:
+    - head: 檔案開頭的位元組
+
+    回傳:
+    - NetpbmHeader，offset 為像素資料起點；magic 為 P2/P3/P5/P6 以外或檔頭不完整時回傳 None
+    """
+    magic = head[:2]
+    if magic not in (b'P2', b'P3', b'P5', b'P6'):
+        return None
+    fields = []
+    pos = 2
+    while len(fields) < 3:
+        # 略過空白與註解
+        while pos < len(head) and head[pos:pos + 1].isspace():
+            pos += 1
+        if pos >= len(head):
+            return None
+        if head[pos:pos + 1] == b'#':
+            end = head.find(b'\n', pos)
+            if end < 0:
+                return None
+            pos = end + 1
+            continue
+        start = pos
+        while pos < len(head) and head[pos:pos + 1].isdigit():
+            pos += 1
+        if start == pos:
+            return None
+        fields.append(int(head[start:pos]))
+    # 最大值之後恰好一個空白字元，接著就是像素資料
+    width, height, maxval = fields
+    return NetpbmHeader(magic, width, height, maxval, pos + 1)
+
+
+def read_header(path: str):
+    """讀取並解析檔頭，格式不符時回傳 None"""
+    with open(path, 'rb') as f:
+        return parse_header(f.read(_HEADER_BYTES))
+
+
+def _dtype(maxval: int):
+    return np.dtype(np.uint8) if maxval <= 255 else np.dtype('>u2')
+
+
+def _shape(height: int, width: int, channels: int):
+    return (height, width) if channels == 1 else (height, width, channels)
+
+
+def read_netpbm(path: str, mode: str = 'r'):
+    """
+    以 np.memmap 映射 P5/P6 檔的像素資料
+
+    參數:
+    - path: 檔案路徑
+    - mode: 'r'（唯讀，預設）、'r+'（就地修改）或 'c'（寫入時複製）
+
+    回傳:
+    - memmap，(H, W) 或 (H, W, 3)，dtype 為 uint8 或 '>u2'
+
+    文字格式 (P2/P3) 無法映射，與檔頭錯誤一樣丟出 ValueError。
+    """
+    header = read_header(path)
+    if header is None:
+        raise ValueError(f'不是 Netpbm 檔：{path}')
+    channels = _CHANNELS.get(header.magic)
+    if channels is None:
+        raise ValueError(f'不支援的 Netpbm 格式 {header.magic.decode()}（只支援 P5/P6）：{path}')
+    return np.memmap(path, dtype=_dtype(header.maxval), mode=mode, offset=header.offset,
+                     shape=_shape(header.height, header.width, channels))
+
+
+def _header_bytes(height: int, width: int, channels: int, maxval: int) -> bytes:
+    magic = {1: 'P5', 3: 'P6'}.get(channels)
+    if magic is None:
+        raise ValueError(f'Netpbm 只支援 1 或 3 個通道，收到 {channels}')
+    return f'{magic}\n{width} {height}\n{maxval}\n'.encode('ascii')
+
+
+def _channels_of(shape):
+    if len(shape) == 2:
+        return 1
+    if len(shape) == 3:
+        return shape[2]
+    raise ValueError(f'影像必須為 (H, W) 或 (H, W, C)，收到 {shape}')
+
+
+def create_netpbm(path: str, shape, maxval: int = 255):
+    """
+    建立 P5/P6 檔並回傳可寫入的 np.memmap（未寫入的像素為 0）
+
+    參數:
+    - path: 輸出路徑
+    - shape: (H, W) 或 (H, W, 3)
+    - maxval: 最大值，> 255 時使用 16 位元
+    """
+    height, width = shape[:2]
+    channels = _channels_of(shape)
+    header = _header_bytes(height, width, channels, maxval)
+    dtype = _dtype(maxval)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + height * width * channels * dtype.itemsize)
+    return np.memmap(path, dtype=dtype, mode='r+', offset=len(header),
+                     shape=_shape(height, width, channels))
+
+
+def write_netpbm(path: str, arr: np.ndarray, maxval: int = None):
+    """
+    將 uint8 / uint16 陣列寫成 P5/P6
+
+    參數:
+    - path: 輸出路徑
+    - arr: (H, W) 或 (H, W, 3)，RGB 順序
+    - maxval: 最大值，預設 uint8 為 255、uint16 為 65535
+    """
+    arr = np.asarray(arr)
+    if arr.dtype.kind != 'u' or arr.dtype.itemsize > 2:
+        raise ValueError(f'Netpbm 只支援 uint8 / uint16，收到 {arr.dtype}')
+    if maxval is None:
+        maxval = 255 if arr.dtype.itemsize == 1 else 65535
+    height, width = arr.shape[:2]
+    header = _header_bytes(height, width, _channels_of(arr.shape), maxval)
+    data = np.ascontiguousarray(arr, dtype=_dtype(maxval))
+    with open(path, 'wb') as f:
+        f.write(header)
+        data.tofile(f)